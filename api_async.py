@@ -0,0 +1,174 @@
+"""
+Async read-only JSON API for student-facing data.
+
+Runs on Quart + aiomysql with its own connection pool, deployed next to the
+sync app (see Procfile `api:`). Put it behind the same domain as app:app and
+route /api/student/ to it: it reads the same signed session cookie
+(same SECRET_KEY), so students stay logged in. A request waiting on MySQL
+only parks a coroutine, so result-day spikes do not pin gunicorn workers
+that staff marking pages need.
+
+    hypercorn api_async:app --bind 0.0.0.0:8001
+
+All numbers come from attendance_calc, the same rules the sync pages use.
+"""
+import hashlib
+
+import aiomysql
+from quart import Quart, jsonify, request, session
+
+import packed_attendance
+from attendance_calc import (ATTENDANCE_THRESHOLD, STUDENT_COUNTS_QUERY, effective_percentage,
+                             periods_needed_for_threshold)
+from config import Config
+
+app = Quart(__name__)
+app.config.from_object(Config)
+
+# Part of every ETag, so a release that changes a payload is not answered with 304
+with open(__file__, 'rb') as _source:
+    API_VERSION = hashlib.sha1(_source.read()).hexdigest()
+
+HISTORY_DEFAULT_PAGE = 100
+HISTORY_MAX_PAGE = 500
+
+@app.before_serving
+async def create_pool():
+    app.db_pool = await aiomysql.create_pool(
+        host=app.config['DB_HOST'],
+        user=app.config['DB_USER'],
+        password=app.config['DB_PASSWORD'],
+        db=app.config['DB_NAME'],
+        port=app.config['DB_PORT'],
+        minsize=app.config['ASYNC_DB_POOL_MIN'],
+        maxsize=app.config['ASYNC_DB_POOL_MAX'],
+        autocommit=True,
+        cursorclass=aiomysql.DictCursor
+    )
+
+@app.after_serving
+async def close_pool():
+    app.db_pool.close()
+    await app.db_pool.wait_closed()
+
+async def fetch_student(cursor):
+    """The logged-in student plus an ETag over everything the API returns for them."""
+    if session.get('role') != 'student' or 'user_id' not in session:
+        return None, None
+
+    stored = ("s.total_periods, s.attended_periods, s.effective_percentage,"
+              if app.config['STORED_PERCENTAGES'] else "")
+    await cursor.execute(f"""
+        SELECT s.id, s.register_no, s.name, s.admin_override_percentage, {stored}
+               (SELECT MAX(c.seq) FROM attendance_changes c WHERE c.student_id = s.id) as data_seq,
+               (SELECT v.version FROM data_versions v WHERE v.name = 'subjects') as subjects_version
+        FROM students s
+        WHERE s.user_id = %s
+    """, (session['user_id'],))
+    student = await cursor.fetchone()
+    if not student:
+        return None, None
+
+    data_seq = student.pop('data_seq')
+    subjects_version = student.pop('subjects_version') # History shows subject codes and names
+    version = repr((request.endpoint, request.query_string, sorted(student.items()), data_seq, subjects_version,
+                    API_VERSION))
+    return student, hashlib.sha1(version.encode('utf-8')).hexdigest()
+
+async def conditional_json(payload, etag):
+    response = jsonify(payload) if payload is not None else await app.make_response(('', 304))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+@app.route('/api/student/percentage')
+async def student_percentage():
+    async with app.db_pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            student, etag = await fetch_student(cursor)
+            if not student:
+                return jsonify({'error': 'Unauthorized'}), 401
+            if request.if_none_match.contains(etag):
+                return await conditional_json(None, etag)
+
+            if app.config['STORED_PERCENTAGES']:
+                attended_periods, total_periods = student['attended_periods'], student['total_periods']
+            elif app.config['ATTENDANCE_STORAGE'] == 'packed':
+                await cursor.execute(packed_attendance.STUDENT_VECTORS_QUERY, (student['id'],))
+                vector_rows = await cursor.fetchall()
+                await cursor.execute(packed_attendance.UNPACKED_COUNTS_QUERY, (student['id'],))
+                attended_periods, total_periods = packed_attendance.counts_from_vectors(
+                    vector_rows, await cursor.fetchone())
+            else:
+                await cursor.execute(STUDENT_COUNTS_QUERY, (student['id'],))
+                counts = await cursor.fetchone()
+                attended_periods = int(counts['attended_periods'])
+                total_periods = int(counts['total_periods'])
+
+    override = student['admin_override_percentage']
+    if app.config['STORED_PERCENTAGES']:
+        percentage = float(student['effective_percentage'])
+    else:
+        percentage = effective_percentage(override, attended_periods, total_periods)
+
+    return await conditional_json({
+        'register_no': student['register_no'],
+        'name': student['name'],
+        'percentage': percentage,
+        'override': override is not None,
+        'attended_periods': attended_periods,
+        'total_periods': total_periods,
+        'eligible': percentage >= ATTENDANCE_THRESHOLD,
+        'periods_needed': None if override is not None
+                          else periods_needed_for_threshold(attended_periods, total_periods),
+    }, etag)
+
+@app.route('/api/student/history')
+async def student_history():
+    try:
+        limit = int(request.args.get('limit', HISTORY_DEFAULT_PAGE))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'Invalid paging parameters'}), 400
+    limit = max(1, min(limit, HISTORY_MAX_PAGE))
+    offset = max(0, offset)
+
+    async with app.db_pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            student, etag = await fetch_student(cursor)
+            if not student:
+                return jsonify({'error': 'Unauthorized'}), 401
+            if request.if_none_match.contains(etag):
+                return await conditional_json(None, etag)
+
+            if app.config['ATTENDANCE_STORAGE'] == 'packed':
+                # Vectors and leftover rows are merged in Python, then paged
+                await cursor.execute(packed_attendance.STUDENT_VECTORS_QUERY, (student['id'],))
+                vector_rows = await cursor.fetchall()
+                await cursor.execute(packed_attendance.UNPACKED_HISTORY_QUERY, (student['id'],))
+                history = packed_attendance.history_from_vectors(vector_rows, await cursor.fetchall())
+                rows = history[offset:offset + limit + 1]
+            else:
+                # Same query as student_attendance_history, one page at a time
+                await cursor.execute("""
+                    SELECT a.date, a.status, s.name as subject_name, s.code as subject_code
+                    FROM attendance a
+                    JOIN subjects s ON a.subject_id = s.id
+                    WHERE a.student_id = %s
+                    ORDER BY a.date DESC
+                    LIMIT %s OFFSET %s
+                """, (student['id'], limit + 1, offset))
+                rows = await cursor.fetchall()
+
+    has_more = len(rows) > limit
+    return await conditional_json({
+        'history': [{
+            'date': r['date'].isoformat(),
+            'status': r['status'],
+            'subject_code': r['subject_code'],
+            'subject_name': r['subject_name'],
+        } for r in rows[:limit]],
+        'has_more': has_more,
+        'next_offset': offset + limit if has_more else None,
+    }, etag)
@@ -1,37 +1,211 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, g
+from flask import (Flask, render_template, request, redirect, url_for, flash, session, g, jsonify, make_response,
+                   Response, send_file, send_from_directory, has_request_context)
 import mysql.connector
+import mysql.connector.pooling
 from werkzeug.security import generate_password_hash, check_password_hash
+from itsdangerous import URLSafeSerializer, BadSignature
 import functools
+import hashlib
+import hmac
+import click
 from config import Config
+from attendance_calc import (ATTENDANCE_THRESHOLD, percentage_from_counts,
+                             periods_needed_for_threshold)
+import packed_attendance
+import queries
+import request_log
+import request_profiler
+import result_cache
+import compact_rows
+import db_routing
+import sqlite_backend
+import seed_synthetic
+import stored_percentages
+import sql_timing
+import template_cache
+import write_queue
+import background_jobs
+from template_cache import LazyRows
 import os
+import csv
+import io
+import zlib
+import multiprocessing
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import defaultdict
+from datetime import datetime, timedelta
 
 app = Flask(__name__)
-app.config.from_object(Config)
-app.config["SECRET_KEY"] = os.getenv(
-    "SECRET_KEY",
-    "mohanraj$attendance@system#2026!secure"
-)
+app.config.from_object(Config) # SECRET_KEY comes from Config (shared with api_async)
+template_cache.init_app(app) # {% cache %} fragments, bytecode cache, render-time stats
+request_log.init_app(app) # Server-Timing header and JSON request log
 
 # Database Helper Functions
+def connect_db(host=None, port=None, **options):
+    # Standalone connection (CLI commands and worker processes have no request context)
+    if app.config['DB_BACKEND'] == 'sqlite':
+        return sqlite_backend.connect(app.config['SQLITE_PATH'])
+    return mysql.connector.connect(
+        host=host or app.config['DB_HOST'],
+        user=app.config['DB_USER'],
+        password=app.config['DB_PASSWORD'],
+        database=app.config['DB_NAME'],
+        port=port or app.config['DB_PORT'],
+        autocommit=True,
+        **options
+    )
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def connect_pooled():
+    """Request connection from this worker's pool (DB_POOL_SIZE > 0), else a new one."""
+    global _db_pool
+    if not app.config['DB_POOL_SIZE'] or app.config['DB_BACKEND'] != 'mysql':
+        return connect_db()
+    with _db_pool_lock:
+        if _db_pool is None:
+            _db_pool = mysql.connector.pooling.MySQLConnectionPool(
+                pool_name='attendance',
+                pool_size=app.config['DB_POOL_SIZE'],
+                pool_reset_session=False, # Keeps the connection's prepared statements (queries.py)
+                host=app.config['DB_HOST'],
+                user=app.config['DB_USER'],
+                password=app.config['DB_PASSWORD'],
+                database=app.config['DB_NAME'],
+                port=app.config['DB_PORT'],
+                autocommit=True
+            )
+    try:
+        return _db_pool.get_connection()
+    except mysql.connector.errors.PoolError:
+        return connect_db() # More concurrent requests than pooled connections
+
+replica_router = None
+if app.config['DB_REPLICAS'] and app.config['DB_BACKEND'] == 'mysql':
+    replica_router = db_routing.ReplicaRouter(
+        db_routing.parse_replicas(app.config['DB_REPLICAS'], app.config['DB_PORT']),
+        max_lag=app.config['REPLICA_MAX_LAG_SECONDS'],
+        sticky_seconds=app.config['REPLICA_STICKY_SECONDS'],
+        check_interval=app.config['REPLICA_CHECK_INTERVAL'])
+
+def connect_replica(host, port):
+    db = connect_db(host, port)
+    # A view wrongly marked @replica_reads fails loudly instead of writing to a replica
+    cursor = db.cursor()
+    cursor.execute("SET SESSION TRANSACTION READ ONLY")
+    cursor.close()
+    return db
+
+def seconds_since_write():
+    last_write = session.get('last_write_at')
+    return time.time() - last_write if last_write else None
+
+def connect_read_db():
+    """Replica connection when one is usable for the current user, else the primary."""
+    if replica_router:
+        db, replica = replica_router.connect(connect_replica, seconds_since_write())
+        if db is not None:
+            g.db_route = f"replica {replica[0]}:{replica[1]}"
+            return db
+    g.db_route = 'primary'
+    return connect_pooled()
+
+def replica_reads(view):
+    # Read-only views: get_db() may hand out a replica connection
+    @functools.wraps(view)
+    def wrapped_view(**kwargs):
+        g.replica_reads = True
+        return view(**kwargs)
+    return wrapped_view
+
 def get_db():
     if 'db' not in g:
-        g.db = mysql.connector.connect(
-            host=app.config['DB_HOST'],
-            user=app.config['DB_USER'],
-            password=app.config['DB_PASSWORD'],
-            database=app.config['DB_NAME'],
-            port=app.config['DB_PORT'],
-            autocommit=True
-        )
+        started = time.perf_counter()
+        g.db = connect_read_db() if g.get('replica_reads') else connect_pooled()
+        g.db_connect_ms = (time.perf_counter() - started) * 1000.0
+        if g.get('sql_stats') is not None:
+            sql_timing.instrument(g.db)
         g.cursor = g.db.cursor(dictionary=True) # Return rows as dictionaries
     return g.db, g.cursor
 
+def get_queries():
+    # Repeated statements, prepared once per connection (queries.STATEMENTS)
+    if 'queries' not in g:
+        db, _ = get_db()
+        g.queries = queries.Queries(db, prepared=app.config['DB_PREPARED_STATEMENTS'])
+    return g.queries
+
+def fetch_rows(query, params=()):
+    """Rows of a large read-only list: compact tuple rows (COMPACT_ROWS) or dicts."""
+    db, cursor = get_db()
+    if app.config['COMPACT_ROWS']:
+        return compact_rows.fetchall(db, query, params)
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+@app.after_request
+def remember_write(response):
+    # Read-your-writes: POSTs are the only requests that change data
+    if replica_router and request.method == 'POST' and 'user_id' in session:
+        session['last_write_at'] = time.time()
+    if app.debug and g.get('db_route'):
+        response.headers['X-DB-Route'] = g.db_route
+    return response
+
 @app.teardown_appcontext
 def close_db(error):
     db = g.pop('db', None)
     if db is not None:
+        # A pooled connection goes back to the pool: leave nothing open on it
+        if db.in_transaction:
+            db.rollback()
+        if getattr(db, 'unread_result', False):
+            db.consume_results()
         db.close()
 
+# Request profiling (admins only): ?profile=1 or X-Profile: 1 samples this request
+@app.before_request
+def start_profile():
+    if not app.config['PROFILE_DIR'] or session.get('role') != 'admin':
+        return
+    if request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1':
+        sql_timing.begin(log=True)
+        g.profiler = request_profiler.SamplingProfiler(app.config['PROFILE_INTERVAL_MS'] / 1000.0)
+
+@app.after_request
+def save_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler:
+        profiler.stop()
+        name = request_profiler.save(app.config['PROFILE_DIR'], app.config['PROFILE_KEEP'], profiler,
+                                     g.sql_log, request.endpoint, request.method, request.full_path,
+                                     response.status_code)
+        response.headers['X-Profile'] = name
+    return response
+
+@app.teardown_request
+def discard_profile(error):
+    # The view raised: after_request did not run, stop the sampler anyway
+    profiler = g.pop('profiler', None)
+    if profiler:
+        profiler.stop()
+
+# Data version stamps: keys of cached template fragments ({% cache %}).
+# Every write to students / staff / departments / subjects bumps its stamp.
+def bump_data_version(cursor, *names):
+    cursor.executemany("""
+        INSERT INTO data_versions (name, version) VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1
+    """, [(name,) for name in names])
+    if 'subjects' in names:
+        clear_student_results() # Cached breakdowns show subject codes and names
+
+def fetch_data_versions():
+    return defaultdict(int, {r['name']: r['version'] for r in get_queries().all('data_versions')})
+
 # Auth Decorators
 def login_required(view):
     @functools.wraps(view)
@@ -56,6 +230,18 @@ def role_required(role):
         return wrapped_view
     return decorator
 
+def api_auth_required(view):
+    # JSON endpoints for downstream systems: Bearer SYNC_API_TOKEN, or a logged-in admin
+    @functools.wraps(view)
+    def wrapped_view(**kwargs):
+        token = app.config['SYNC_API_TOKEN']
+        if token and hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+            return view(**kwargs)
+        if session.get('role') == 'admin':
+            return view(**kwargs)
+        return jsonify({'error': 'Unauthorized'}), 401
+    return wrapped_view
+
 # --- Routes ---
 
 @app.route('/')
@@ -77,8 +263,7 @@ def login():
         
         try:
             db, cursor = get_db()
-            cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
-            user = cursor.fetchone()
+            user = get_queries().one('user_by_username', (username,))
             
             if user:
                 if check_password_hash(user['password_hash'], password):
@@ -148,6 +333,42 @@ def admin_dashboard():
                            class_login_count=class_login_count, 
                            dept_count=dept_count)
 
+@app.route('/admin/render-stats')
+@login_required
+@role_required('admin')
+def admin_render_stats():
+    # Per worker process: each gunicorn worker keeps its own stats and fragment cache
+    return render_template('admin_render_stats.html',
+                           stats=template_cache.render_stats(),
+                           fragment_cache=app.jinja_env.fragment_cache.stats(),
+                           result_cache=student_results.stats() if student_results else None,
+                           bytecode_dir=app.config['TEMPLATE_BYTECODE_DIR'],
+                           worker_pid=os.getpid())
+
+@app.route('/admin/profiles')
+@login_required
+@role_required('admin')
+def admin_profiles():
+    endpoint = request.args.get('route') or None
+    profiles = request_profiler.list_profiles(app.config['PROFILE_DIR'], endpoint)
+    frames, samples = request_profiler.combined_hot_frames(app.config['PROFILE_DIR'], profiles) \
+        if endpoint else ([], 0)
+    return render_template('admin_profiles.html', profiles=profiles, endpoint=endpoint,
+                           frames=frames, samples=samples, profile_dir=app.config['PROFILE_DIR'])
+
+@app.route('/admin/profiles/<name>')
+@login_required
+@role_required('admin')
+def admin_profile_detail(name):
+    profile = request_profiler.load(app.config['PROFILE_DIR'], name)
+    if not profile:
+        flash("Profile not found (old profiles are removed after PROFILE_KEEP newer ones).", "danger")
+        return redirect(url_for('admin_profiles'))
+    if request.args.get('format') == 'folded':
+        return send_from_directory(app.config['PROFILE_DIR'], profile['name'] + '.folded',
+                                   as_attachment=True, mimetype='text/plain')
+    return render_template('admin_profile_detail.html', profile=profile)
+
 # -- DEPARTMENTS --
 @app.route('/admin/departments', methods=('GET', 'POST'))
 @login_required
@@ -159,14 +380,15 @@ def manage_departments():
         code = request.form['code']
         try:
             cursor.execute("INSERT INTO departments (name, code) VALUES (%s, %s)", (name, code))
+            bump_data_version(cursor, 'departments')
             flash('Department added successfully.', 'success')
             return redirect(url_for('manage_departments'))
         except mysql.connector.Error as err:
             flash(f"Error: {err}", "danger")
     
-    cursor.execute("SELECT * FROM departments")
-    departments = cursor.fetchall()
-    return render_template('admin_manage_departments.html', departments=departments)
+    departments = LazyRows(fetch_rows, "SELECT * FROM departments")
+    return render_template('admin_manage_departments.html', departments=departments,
+                           versions=fetch_data_versions())
 
 @app.route('/admin/departments/edit/<int:dept_id>', methods=('GET', 'POST'))
 @login_required
@@ -179,6 +401,7 @@ def edit_department(dept_id):
         code = request.form['code']
         try:
             cursor.execute("UPDATE departments SET name = %s, code = %s WHERE id = %s", (name, code, dept_id))
+            bump_data_version(cursor, 'departments')
             flash('Department updated successfully.', 'success')
             return redirect(url_for('manage_departments'))
         except mysql.connector.Error as err:
@@ -219,6 +442,7 @@ def delete_department(dept_id):
 
     try:
         cursor.execute("DELETE FROM departments WHERE id = %s", (dept_id,))
+        bump_data_version(cursor, 'departments')
         flash('Department deleted.', 'success')
     except mysql.connector.Error as err:
         flash(f"Error: {err}", "danger")
@@ -242,18 +466,19 @@ def manage_staff():
         try:
              # Create Staff Profile (No User Account Created)
             cursor.execute("INSERT INTO staff (name, department_id) VALUES (%s, %s)", (name, dept_id))
+            bump_data_version(cursor, 'staff')
             flash('Staff member added successfully.', 'success')
             return redirect(url_for('manage_staff'))
         except mysql.connector.Error as err:
             flash(f"Error: {err}", "danger")
             
-    cursor.execute("""
+    staff_list = LazyRows(fetch_rows, """
         SELECT s.*, d.name as dept_name 
         FROM staff s 
         LEFT JOIN departments d ON s.department_id = d.id
     """)
-    staff_list = cursor.fetchall()
-    return render_template('admin_manage_staff.html', staff_list=staff_list, departments=departments)
+    return render_template('admin_manage_staff.html', staff_list=staff_list, departments=departments,
+                           versions=fetch_data_versions())
 
 @app.route('/admin/staff/edit/<int:staff_id>', methods=('GET', 'POST'))
 @login_required
@@ -268,6 +493,7 @@ def edit_staff(staff_id):
         try:
             # Update Profile
             cursor.execute("UPDATE staff SET name = %s, department_id = %s WHERE id = %s", (name, dept_id, staff_id))
+            bump_data_version(cursor, 'staff')
             flash('Staff profile updated successfully.', 'success')
             return redirect(url_for('manage_staff'))
             
@@ -310,6 +536,7 @@ def delete_staff(staff_id):
         res = cursor.fetchone()
         
         cursor.execute("DELETE FROM staff WHERE id = %s", (staff_id,))
+        bump_data_version(cursor, 'staff', 'subjects') # subjects.staff_id is SET NULL
         
         # Optional: Cleanup User if it exists and was a staff user
         if res and res['user_id']:
@@ -359,18 +586,19 @@ def manage_students():
                 VALUES (%s, %s, %s, %s, %s, %s)
             """, (user_id, register_no, name, dept_id, year, batch))
             
+            bump_data_version(cursor, 'students')
             flash('Student added successfully.', 'success')
             return redirect(url_for('manage_students'))
         except mysql.connector.Error as err:
              flash(f"Error: {err}", "danger")
 
-    cursor.execute("""
+    students = LazyRows(fetch_rows, """
         SELECT s.*, d.name as dept_name 
         FROM students s 
         LEFT JOIN departments d ON s.department_id = d.id
     """)
-    students = cursor.fetchall()
-    return render_template('admin_manage_students.html', students=students, departments=departments)
+    return render_template('admin_manage_students.html', students=students, departments=departments,
+                           versions=fetch_data_versions())
 
 @app.route('/admin/students/edit/<int:student_id>', methods=('GET', 'POST'))
 @login_required
@@ -405,6 +633,7 @@ def edit_student(student_id):
                 hashed = generate_password_hash(password)
                 cursor.execute("UPDATE users SET password_hash = %s WHERE id = %s", (hashed, user_id))
                 
+            bump_data_version(cursor, 'students')
             flash('Student profile updated successfully.', 'success')
             return redirect(url_for('manage_students'))
             
@@ -442,6 +671,7 @@ def delete_student(student_id):
         if res:
             user_id = res['user_id']
             cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+            bump_data_version(cursor, 'students')
             flash('Student deleted.', 'success')
         else:
             flash('Student user mapping not found.', 'danger')
@@ -480,19 +710,20 @@ def manage_subjects():
                 INSERT INTO subjects (name, code, department_id, year, batch, staff_id)
                 VALUES (%s, %s, %s, %s, %s, %s)
             """, (name, code, dept_id, year, batch, staff_id))
+            bump_data_version(cursor, 'subjects')
             flash('Subject added successfully.', 'success')
             return redirect(url_for('manage_subjects'))
         except mysql.connector.Error as err:
              flash(f"Error: {err}", "danger")
 
-    cursor.execute("""
+    subjects = LazyRows(fetch_rows, """
         SELECT sub.*, d.name as dept_name, s.name as staff_name
         FROM subjects sub
         LEFT JOIN departments d ON sub.department_id = d.id
         LEFT JOIN staff s ON sub.staff_id = s.id
     """)
-    subjects = cursor.fetchall()
-    return render_template('admin_manage_subjects.html', subjects=subjects, departments=departments, staff_list=staff_list)
+    return render_template('admin_manage_subjects.html', subjects=subjects, departments=departments, staff_list=staff_list,
+                           versions=fetch_data_versions())
 
 @app.route('/admin/subjects/edit/<int:sub_id>', methods=('GET', 'POST'))
 @login_required
@@ -516,6 +747,7 @@ def edit_subject(sub_id):
                 UPDATE subjects SET name=%s, code=%s, department_id=%s, year=%s, batch=%s, staff_id=%s
                 WHERE id=%s
             """, (name, code, dept_id, year, batch, staff_id, sub_id))
+            bump_data_version(cursor, 'subjects')
             flash('Subject updated successfully.', 'success')
             return redirect(url_for('manage_subjects'))
         except mysql.connector.Error as err:
@@ -547,6 +779,7 @@ def delete_subject(sub_id):
         
     try:
         cursor.execute("DELETE FROM subjects WHERE id = %s", (sub_id,))
+        bump_data_version(cursor, 'subjects')
         flash('Subject deleted.', 'success')
     except mysql.connector.Error as err:
         flash(f"Error: {err}", "danger")
@@ -598,14 +831,11 @@ def staff_dashboard():
     db, cursor = get_db()
     
     # Get Staff ID from User ID
-    cursor.execute("SELECT id FROM staff WHERE user_id = %s", (session['user_id'],))
-    staff = cursor.fetchone()
+    staff_id = get_queries().value('staff_id_for_user', (session['user_id'],))
     
-    if not staff:
+    if not staff_id:
         flash("Staff profile not found.", "danger")
         return redirect(url_for('logout'))
-        
-    staff_id = staff['id']
     
     # Get Assigned Subjects
     cursor.execute("""
@@ -618,21 +848,22 @@ def staff_dashboard():
     
     return render_template('staff_dashboard.html', subjects=subjects)
 
-@app.route('/staff/mark/<int:subject_id>', methods=('GET', 'POST'))
-@login_required
-@role_required('staff')
-def mark_attendance(subject_id):
-    db, cursor = get_db()
-    
+def staff_home():
+    return url_for('class_dashboard') if session.get('is_class_login') else url_for('staff_dashboard')
+
+def fetch_markable_subject(cursor, subject_id):
+    """
+    Returns (subject, None) if the logged-in staff (or class login) may mark this
+    subject, otherwise (None, redirect response) with the reason flashed.
+    """
     # Modified Authorization Logic for Class Login
     if session.get('is_class_login'):
         # Check if subject belongs to this class
-        cursor.execute("SELECT * FROM subjects WHERE id = %s", (subject_id,))
-        subject = cursor.fetchone()
+        subject = get_queries().one('subject', (subject_id,))
         
         if not subject:
              flash("Subject not found.", "danger")
-             return redirect(url_for('class_dashboard'))
+             return None, redirect(url_for('class_dashboard'))
 
         # Verify Subject Matches Class Login Credentials
         # Subject 'batch' col stores Batch (I Batch, II Batch)
@@ -640,75 +871,273 @@ def mark_attendance(subject_id):
             subject['year'] != session['year'] or 
             subject['batch'] != session['batch']):
             flash("Access denied. This subject does not belong to your class login.", "danger")
-            return redirect(url_for('class_dashboard'))
+            return None, redirect(url_for('class_dashboard'))
             
     else:
         # Standard Staff Login Check
         # Get Staff ID
-        cursor.execute("SELECT id FROM staff WHERE user_id = %s", (session['user_id'],))
-        staff = cursor.fetchone()
-        if not staff:
+        staff_id = get_queries().value('staff_id_for_user', (session['user_id'],))
+        if not staff_id:
              flash("Staff profile not found.", "danger")
-             return redirect(url_for('logout'))
-        staff_id = staff['id']
+             return None, redirect(url_for('logout'))
         
         # Verify Subject Assignment
-        cursor.execute("SELECT * FROM subjects WHERE id = %s AND staff_id = %s", (subject_id, staff_id))
-        subject = cursor.fetchone()
+        subject = get_queries().one('staff_subject', (subject_id, staff_id))
         
         if not subject:
             flash("Access denied. You are not assigned to this subject.", "danger")
-            return redirect(url_for('staff_dashboard'))
+            return None, redirect(url_for('staff_dashboard'))
+
+    return subject, None
+
+def fetch_class_students(subject):
+    # Students of this subject's class (Dept, Year, Batch)
+    return get_queries().all('class_students', (subject['department_id'], subject['year'], subject['batch']))
+
+# Compact mark submissions: default_status + exceptions ("<student_id>:<code>,...")
+# + roster_version, expanded server-side against the class roster
+MARK_STATUS_CODES = {'P': 'Present', 'A': 'Absent', 'O': 'On Duty'}
+MARK_STATUSES = set(MARK_STATUS_CODES.values())
+
+_roster_cache = {}
+
+def roster_version(student_ids):
+    return hashlib.sha1(",".join(str(sid) for sid in sorted(student_ids)).encode('ascii')).hexdigest()[:16]
+
+def fetch_class_roster(subject, refresh=False):
+    """
+    Student ids + version of a subject's class, kept per worker for ROSTER_CACHE_TTL
+    seconds. An entry is only reused while the shared 'students' data version is
+    unchanged, so a write in any worker or job process is seen on the next request;
+    a version mismatch in a submission still reloads before rejecting.
+    """
+    key = (subject['department_id'], subject['year'], subject['batch'])
+    students_version = get_queries().value('data_version', ('students',), cast=int, default=0)
+    cached = _roster_cache.get(key)
+    if (not refresh and cached and cached['students_version'] == students_version and
+            time.time() - cached['loaded_at'] < app.config['ROSTER_CACHE_TTL']):
+        return cached
+
+    student_ids = sorted(get_queries().column('class_roster_ids', key, cast=int))
+    roster = {'student_ids': student_ids, 'version': roster_version(student_ids), 'loaded_at': time.time(),
+              'students_version': students_version}
+    _roster_cache[key] = roster
+    return roster
+
+def expand_mark_statuses(form, roster_student_ids, suffix=''):
+    """
+    {student_id: status} for every student on the roster, or (None, error).
+    Compact form: default_status for everyone, overridden by exceptions.
+    Full form: one status_<id><suffix> field per student; a missing or unknown
+    status is an error instead of silently storing NULL.
+    """
+    if 'default_status' in form:
+        default_status = form['default_status']
+        if default_status not in MARK_STATUSES:
+            return None, "Invalid default status."
+        statuses = dict.fromkeys(roster_student_ids, default_status)
+        for item in filter(None, form.get('exceptions', '').split(',')):
+            sid, _, code = item.partition(':')
+            if not sid.isdigit() or int(sid) not in statuses or code not in MARK_STATUS_CODES:
+                return None, f"Invalid exception '{item}'."
+            statuses[int(sid)] = MARK_STATUS_CODES[code]
+        return statuses, None
+
+    statuses = {}
+    for sid in roster_student_ids:
+        status = form.get(f"status_{sid}{suffix}")
+        if status not in MARK_STATUSES:
+            return None, "Every student needs a status. Reload the page and mark again."
+        statuses[sid] = status
+    return statuses, None
+
+def fetch_marked_dates(cursor, subject_id, dates):
+    """Which of these dates already have attendance for the subject (one query for all dates)."""
+    placeholders = ", ".join(["%s"] * len(dates))
+    query = f"SELECT DISTINCT date FROM attendance WHERE subject_id = %s AND date IN ({placeholders})"
+    params = [subject_id] + list(dates)
+    if packed_storage():
+        query += f" UNION SELECT date FROM attendance_sessions WHERE subject_id = %s AND date IN ({placeholders})"
+        params += [subject_id] + list(dates)
+    cursor.execute(query, params)
+    return sorted(str(r['date']) for r in cursor.fetchall())
+
+def insert_attendance(db, cursor, rows):
+    """Writes (student_id, subject_id, date, status) rows in one transaction, one multi-row INSERT."""
+    db.start_transaction()
+    try:
+        # Student id order: the percentage triggers lock each student's row, and the same
+        # order in every transaction keeps concurrent submissions from deadlocking
+        cursor.executemany("""
+            INSERT INTO attendance (student_id, subject_id, date, status)
+            VALUES (%s, %s, %s, %s)
+        """, sorted(rows))
+        db.commit()
+    except mysql.connector.Error:
+        db.rollback()
+        raise
+
+# Submissions go through the write-behind queue when WRITE_QUEUE is on (write_queue.py)
+attendance_queue = write_queue.WriteQueue(app.config['WRITE_QUEUE_PATH']) if app.config['WRITE_QUEUE'] else None
+
+def save_attendance(db, cursor, subject_id, dates, rows):
+    """
+    Stores validated (student_id, subject_id, date, status) rows. Returns True once
+    committed, False when the queue holds them but the writer has not answered within
+    WRITE_QUEUE_ACK_TIMEOUT. Raises write_queue.SubmissionRejected or mysql.connector.Error.
+    """
+    if not attendance_queue:
+        insert_attendance(db, cursor, rows)
+        invalidate_student_results({r[0] for r in rows})
+        return True
+
+    queued = attendance_queue.queued_dates(subject_id, dates)
+    if queued:
+        raise write_queue.SubmissionRejected(
+            f"Attendance for this subject on {', '.join(queued)} is already being saved.")
+    submission_id = attendance_queue.enqueue(subject_id, dates, [(sid, date, status) for sid, _, date, status in rows],
+                                             session.get('user_id'))
+    state, error = attendance_queue.wait(submission_id, app.config['WRITE_QUEUE_ACK_TIMEOUT'])
+    if state == 'failed':
+        raise write_queue.SubmissionRejected(error)
+    return state == 'committed'
+
+@app.route('/staff/mark/<int:subject_id>', methods=('GET', 'POST'))
+@login_required
+@role_required('staff')
+def mark_attendance(subject_id):
+    db, cursor = get_db()
+    
+    subject, denied = fetch_markable_subject(cursor, subject_id)
+    if denied:
+        return denied
         
     if request.method == 'POST':
         date = request.form['date']
         
         # FEATURE 2: Check limit - Prevent Duplicate Submission
-        cursor.execute("SELECT COUNT(*) as count FROM attendance WHERE subject_id = %s AND date = %s", (subject_id, date))
-        existing_records = cursor.fetchone()['count']
-        
-        if existing_records > 0:
+        if fetch_marked_dates(cursor, subject_id, [date]):
              flash(f"Attendance already marked for this subject on {date}. Modification not allowed.", "danger")
-             return redirect(url_for('class_dashboard') if session.get('is_class_login') else url_for('staff_dashboard'))
-
-        # Get list of students for this subject's class again to be safe
-        cursor.execute("""
-            SELECT id FROM students 
-            WHERE department_id = %s AND current_year = %s AND batch = %s
-        """, (subject['department_id'], subject['year'], subject['batch']))
-        students = cursor.fetchall()
+             return redirect(staff_home())
+
+        # Expand against the (cached) roster; reject pages loaded before the class list changed
+        roster = fetch_class_roster(subject)
+        if request.form.get('roster_version') != roster['version']:
+            roster = fetch_class_roster(subject, refresh=True)
+        if 'roster_version' in request.form and request.form['roster_version'] != roster['version']:
+            flash("The class list changed after this page was loaded. Please mark attendance again.", "danger")
+            return redirect(url_for('mark_attendance', subject_id=subject_id))
+
+        statuses, error = expand_mark_statuses(request.form, roster['student_ids'])
+        if error:
+            flash(error, "danger")
+            return redirect(url_for('mark_attendance', subject_id=subject_id))
         
         try:
-            for student in students:
-                sid = student['id']
-                status_key = f"status_{sid}"
-                status = request.form.get(status_key) # 'Present', 'Absent', 'On Duty'
-                
-                # Insert Only - No Update
-                cursor.execute("""
-                    INSERT INTO attendance (student_id, subject_id, date, status)
-                    VALUES (%s, %s, %s, %s)
-                """, (sid, subject_id, date, status))
+            # Insert Only - No Update
+            committed = save_attendance(db, cursor, subject_id, [date], [
+                (sid, subject_id, date, status) # 'Present', 'Absent', 'On Duty'
+                for sid, status in statuses.items()
+            ])
             
-            flash(f"Attendance marked for {date}.", "success")
-            return redirect(url_for('class_dashboard') if session.get('is_class_login') else url_for('staff_dashboard'))
+            if committed:
+                flash(f"Attendance marked for {date}.", "success")
+            else:
+                flash(f"Attendance for {date} is queued and will be saved shortly.", "warning")
+            return redirect(staff_home())
+        except write_queue.SubmissionRejected as err:
+            flash(str(err), "danger")
+            return redirect(staff_home())
         except mysql.connector.Error as err:
             flash(f"Error marking attendance: {err}", "danger")
 
     # Get Students for this Subject (Dept, Year, Section)
-    cursor.execute("""
-        SELECT * FROM students 
-        WHERE department_id = %s AND current_year = %s AND batch = %s
-        ORDER BY register_no
-    """, (subject['department_id'], subject['year'], subject['batch']))
-    students = cursor.fetchall()
-    
-    return render_template('staff_mark_attendance.html', subject=subject, students=students)
+    students = fetch_class_students(subject)
+    
+    return render_template('staff_mark_attendance.html', subject=subject, students=students,
+                           roster_version=roster_version([student['id'] for student in students]))
+
+# Catch-up marking: several dates of one subject in a single submission
+BATCH_MARK_MAX_DATES = 7
+
+def parse_batch_dates(values):
+    """Distinct, valid YYYY-MM-DD dates in calendar order, or None if any value is invalid."""
+    from datetime import date as date_cls
+    dates = set()
+    for value in values:
+        value = value.strip()
+        if not value:
+            continue
+        try:
+            dates.add(date_cls.fromisoformat(value).isoformat())
+        except ValueError:
+            return None
+    return sorted(dates)
+
+@app.route('/staff/mark/<int:subject_id>/batch', methods=('GET', 'POST'))
+@login_required
+@role_required('staff')
+def mark_attendance_batch(subject_id):
+    db, cursor = get_db()
+
+    subject, denied = fetch_markable_subject(cursor, subject_id)
+    if denied:
+        return denied
+
+    source = request.form if request.method == 'POST' else request.args
+    dates = parse_batch_dates(source.getlist('dates'))
+    if dates is None:
+        flash("Invalid date. Use the date pickers.", "danger")
+        return redirect(url_for('mark_attendance_batch', subject_id=subject_id))
+    if len(dates) > BATCH_MARK_MAX_DATES:
+        flash(f"At most {BATCH_MARK_MAX_DATES} dates can be marked in one submission.", "danger")
+        return redirect(url_for('mark_attendance_batch', subject_id=subject_id))
+
+    # Step 1: pick the dates
+    if not dates:
+        return render_template('staff_mark_attendance_batch.html', subject=subject, dates=[], students=[],
+                               max_dates=BATCH_MARK_MAX_DATES)
+
+    # All dates validated against existing sessions in one query
+    already_marked = fetch_marked_dates(cursor, subject_id, dates)
+    if already_marked:
+        flash(f"Attendance already marked on {', '.join(already_marked)}. Modification not allowed.", "danger")
+        return redirect(url_for('mark_attendance_batch', subject_id=subject_id))
+
+    students = fetch_class_students(subject)
+
+    if request.method == 'POST':
+        student_ids = [student['id'] for student in students]
+        rows = []
+        for date in dates:
+            statuses, error = expand_mark_statuses(request.form, student_ids, suffix=f"_{date}")
+            if error:
+                flash(error, "danger")
+                return redirect(url_for('mark_attendance_batch', subject_id=subject_id))
+            rows.extend((sid, subject_id, date, status) for sid, status in statuses.items())
+
+        try:
+            # One transaction, one multi-row INSERT for every date x student
+            if save_attendance(db, cursor, subject_id, dates, rows):
+                flash(f"Attendance marked for {len(dates)} dates ({', '.join(dates)}).", "success")
+            else:
+                flash(f"Attendance for {', '.join(dates)} is queued and will be saved shortly.", "warning")
+            return redirect(staff_home())
+        except write_queue.SubmissionRejected as err:
+            flash(str(err), "danger")
+            return redirect(staff_home())
+        except mysql.connector.Error as err:
+            flash(f"Error marking attendance: {err}", "danger")
+
+    # Step 2: one status column per date
+    return render_template('staff_mark_attendance_batch.html', subject=subject, dates=dates, students=students,
+                           max_dates=BATCH_MARK_MAX_DATES)
 
 
 @app.route('/class/view-student-percentage/<int:subject_id>')
 @login_required
 @role_required('staff')
+@replica_reads
 def class_view_student_percentage(subject_id):
     # Strictly for Class Login
     if not session.get('is_class_login'):
@@ -737,17 +1166,12 @@ def class_view_student_percentage(subject_id):
         return redirect(url_for('class_dashboard'))
         
     # Get all students for this class
-    cursor.execute("""
-        SELECT * FROM students 
-        WHERE department_id = %s AND current_year = %s AND batch = %s
-        ORDER BY register_no
-    """, (subject['department_id'], subject['year'], subject['batch']))
-    students = cursor.fetchall()
+    students = fetch_class_students(subject)
     
     student_stats = []
     
     for student in students:
-        percentage = calculate_student_percentage(cursor, student['id'])
+        percentage = student_row_percentage(cursor, student)
         student_stats.append({
             'register_no': student['register_no'],
             'name': student['name'],
@@ -758,90 +1182,134 @@ def class_view_student_percentage(subject_id):
 
 
 # --- HELPER: ATTENDANCE CALCULATION ---
+# Calculation rules live in attendance_calc (shared with the async API tier)
+def packed_storage():
+    return app.config['ATTENDANCE_STORAGE'] == 'packed'
+
+def percentages_stored():
+    # students.effective_percentage and counts, kept by triggers (stored_percentages.py)
+    return app.config['STORED_PERCENTAGES']
+
+def fetch_attendance_counts(cursor, student_id):
+    if percentages_stored():
+        counts = get_queries().one('student_stored_counts', (student_id,))
+        return (int(counts['attended_periods']), int(counts['total_periods'])) if counts else (0, 0)
+    if packed_storage():
+        return packed_attendance.student_counts(cursor, student_id)
+    counts = get_queries().one('student_counts', (student_id,))
+    return int(counts['attended_periods']), int(counts['total_periods'])
+
+# Effective percentages and per-subject breakdowns, shared by the node's workers (result_cache.py)
+student_results = result_cache.SharedCache(
+    app.config['RESULT_CACHE_PATH'],
+    size_bytes=app.config['RESULT_CACHE_SIZE_MB'] << 20,
+    entry_bytes=app.config['RESULT_CACHE_ENTRY_BYTES'],
+    ttl=app.config['RESULT_CACHE_TTL']) if app.config['RESULT_CACHE'] else None
+
+def cached_student_result(kind, student_id, compute):
+    if not student_results:
+        return compute()
+    found, value, token = student_results.lookup(kind, student_id)
+    if found:
+        return value
+    value = compute()
+    # A replica may not have the write that invalidated the old value yet: do not keep what it says
+    if not str(g.get('db_route', '')).startswith('replica'):
+        student_results.store(kind, student_id, value, token)
+    return value
+
+def invalidate_student_results(student_ids):
+    # Call after the write commits, or a concurrent request may cache the old numbers again
+    if student_results:
+        student_results.invalidate(student_ids)
+
+def clear_student_results():
+    if student_results:
+        student_results.clear()
+
 def calculate_student_percentage(cursor, student_id):
+    """Effective percentage (override or calculated): the stored column, or through the shared result cache."""
+    if percentages_stored():
+        return get_queries().value('student_effective_percentage', (student_id,), cast=float, default=0.0)
+    return cached_student_result('percentage', student_id,
+                                 lambda: compute_student_percentage(cursor, student_id))
+
+def student_row_percentage(cursor, student):
+    """Same as calculate_student_percentage for a students row that is already loaded (SELECT s.*)."""
+    if percentages_stored():
+        return float(student['effective_percentage'])
+    return calculate_student_percentage(cursor, student['id'])
+
+def compute_student_percentage(cursor, student_id):
     """
-    Calculates overall attendance based on day-wise logic.
-    - Start: 100%
-    - All subjects Present/OD on a date: +1%
-    - All subjects Absent on a date: -2%
-    - Mixed: No change
+    Calculates overall attendance based on period-wise logic.
+    - Attended (Present/On Duty) periods / total periods
+    - No records: 0%
     - Clamped 0-100%
     
     UPDATED: Checks for admin_override_percentage first.
     """
     # 0. Check Override
-    cursor.execute("SELECT admin_override_percentage FROM students WHERE id = %s", (student_id,))
-    res = cursor.fetchone()
-    if res and res['admin_override_percentage'] is not None:
-         return float(res['admin_override_percentage'])
-
-    current_percentage = 100.0
-    
-    # 1. Fetch all attendance records for this student
-    cursor.execute("""
-        SELECT status 
-        FROM attendance 
-        WHERE student_id = %s
-    """, (student_id,))
-    all_records = cursor.fetchall()
-    
-    # 2. Period-Wise Calculation
-    total_periods = len(all_records)
-    attended_periods = 0
-    
-    if total_periods == 0:
-        return 0.0 # Default to 0% if no records (Strict Rule)
-        
-    for record in all_records:
-        if record['status'] in ['Present', 'On Duty']:
-            attended_periods += 1
-            
-    # Calculate Percentage
-    current_percentage = (attended_periods / total_periods) * 100.0
-    
-    # Round to 2 decimal places
-    current_percentage = round(current_percentage, 2)
-    
-    # Cap between 0 and 100
-    if current_percentage > 100: current_percentage = 100.0
-    if current_percentage < 0: current_percentage = 0.0
-    
-    return current_percentage
+    override = get_queries().value('student_override', (student_id,), cast=float)
+    if override is not None:
+         return override
+
+    # 1. Count this student's periods in the database instead of fetching every row
+    attended_periods, total_periods = fetch_attendance_counts(cursor, student_id)
+
+    return percentage_from_counts(attended_periods, total_periods)
+
+def fetch_subject_breakdown(cursor, student_id):
+    """[{'subject_code', 'subject_name', 'attended', 'total', 'percentage'}] by subject code (no override)."""
+    return cached_student_result('subjects', student_id,
+                                 lambda: compute_subject_breakdown(cursor, student_id))
+
+def compute_subject_breakdown(cursor, student_id):
+    if packed_storage():
+        counts = {}
+        for h in packed_attendance.student_history(cursor, student_id):
+            entry = counts.setdefault((h['subject_code'], h['subject_name']), [0, 0])
+            entry[0] += h['status'] in ('Present', 'On Duty')
+            entry[1] += 1
+        rows = [{'subject_code': code, 'subject_name': name, 'attended_periods': attended, 'total_periods': total}
+                for (code, name), (attended, total) in sorted(counts.items())]
+    else:
+        rows = get_queries().all('student_subject_counts', (student_id,))
+    breakdown = []
+    for r in rows:
+        attended, total = int(r['attended_periods']), int(r['total_periods'])
+        breakdown.append({'subject_code': r['subject_code'], 'subject_name': r['subject_name'],
+                          'attended': attended, 'total': total,
+                          'percentage': percentage_from_counts(attended, total)})
+    return breakdown
 
 
 @app.route('/staff/view-stats/<int:subject_id>')
 @login_required
 @role_required('staff')
+@replica_reads
 def staff_view_attendance_stats(subject_id):
     db, cursor = get_db()
     
     # Get Staff ID
-    cursor.execute("SELECT id FROM staff WHERE user_id = %s", (session['user_id'],))
-    staff = cursor.fetchone()
-    staff_id = staff['id']
+    staff_id = get_queries().value('staff_id_for_user', (session['user_id'],))
     
     # Verify Subject
-    cursor.execute("SELECT * FROM subjects WHERE id = %s AND staff_id = %s", (subject_id, staff_id))
-    subject = cursor.fetchone()
+    subject = get_queries().one('staff_subject', (subject_id, staff_id))
     
     if not subject:
         flash("Access denied.", "danger")
         return redirect(url_for('staff_dashboard'))
         
     # Get all students for this class
-    cursor.execute("""
-        SELECT * FROM students 
-        WHERE department_id = %s AND current_year = %s AND batch = %s
-        ORDER BY register_no
-    """, (subject['department_id'], subject['year'], subject['batch']))
-    students = cursor.fetchall()
+    students = fetch_class_students(subject)
     
     # Calculate Stats for each student using GLOBAL logic
     student_stats = []
     
     for student in students:
         # Helper automatically handles override now
-        percentage = calculate_student_percentage(cursor, student['id'])
+        percentage = student_row_percentage(cursor, student)
             
         student_stats.append({
             'register_no': student['register_no'],
@@ -854,35 +1322,26 @@ def staff_view_attendance_stats(subject_id):
 @app.route('/staff/view-stats/<int:subject_id>/export')
 @login_required
 @role_required('staff')
+@replica_reads
 def staff_export_attendance_stats(subject_id):
     db, cursor = get_db()
     import openpyxl
     from io import BytesIO
-    from flask import send_file
     
     # Reuse exact logic from view stats
     # Get Staff ID
-    cursor.execute("SELECT id FROM staff WHERE user_id = %s", (session['user_id'],))
-    staff = cursor.fetchone()
-    if not staff: return redirect(url_for('login'))
-    
-    staff_id = staff['id']
+    staff_id = get_queries().value('staff_id_for_user', (session['user_id'],))
+    if not staff_id: return redirect(url_for('login'))
     
     # Verify Subject (Scope check)
-    cursor.execute("SELECT * FROM subjects WHERE id = %s AND staff_id = %s", (subject_id, staff_id))
-    subject = cursor.fetchone()
+    subject = get_queries().one('staff_subject', (subject_id, staff_id))
     
     if not subject:
         flash("Access denied.", "danger")
         return redirect(url_for('staff_dashboard'))
         
     # Get all students for this class
-    cursor.execute("""
-        SELECT * FROM students 
-        WHERE department_id = %s AND current_year = %s AND batch = %s
-        ORDER BY register_no
-    """, (subject['department_id'], subject['year'], subject['batch']))
-    students = cursor.fetchall()
+    students = fetch_class_students(subject)
     
     # Create Excel
     wb = openpyxl.Workbook()
@@ -895,7 +1354,7 @@ def staff_export_attendance_stats(subject_id):
     # Data
     for student in students:
         # STRICTLY REUSE CALCULATE FUNCTION
-        percentage = calculate_student_percentage(cursor, student['id'])
+        percentage = student_row_percentage(cursor, student)
         ws.append([student['register_no'], f"{round(percentage, 1)}%"])
         
     # Save to buffer
@@ -961,6 +1420,12 @@ def admin_attendance_correction():
             
             attendance_records = cursor.fetchall()
 
+            # Packed sessions keep their statuses in the session's status vector
+            packed_statuses = packed_attendance.session_statuses(cursor, subject_id, date) if packed_storage() else None
+            if packed_statuses is not None:
+                for rec in attendance_records:
+                    rec['status'] = packed_statuses.get(rec['student_id'])
+
     return render_template('admin_attendance_correction.html', 
                            departments=departments,
                            subjects=subjects, 
@@ -981,8 +1446,17 @@ def admin_update_attendance():
     if not subject_id or not date:
         flash("Missing subject or date information.", "danger")
         return redirect(url_for('admin_attendance_correction'))
-        
+
+    student_ids = [key.split('_')[1] for key in request.form if key.startswith('status_')]
     try:
+        if packed_storage() and packed_attendance.session_exists(cursor, subject_id, date):
+            updates = {key.split('_')[1]: request.form[key] for key in request.form if key.startswith('status_')}
+            missing = packed_attendance.update_session_statuses(db, cursor, subject_id, date, updates)
+            if missing:
+                flash(f"{len(missing)} student(s) were not on the roll for this archived session and were not updated.", "warning")
+            flash("Attendance updated successfully.", "success")
+            return redirect(url_for('admin_attendance_correction'))
+
         # Loop through form data to find status updates
         # Form keys: status_{student_id}
         # Iterate over all keys in request.form
@@ -1002,6 +1476,9 @@ def admin_update_attendance():
         flash("Attendance updated successfully.", "success")
     except mysql.connector.Error as err:
         flash(f"Error updating attendance: {err}", "danger")
+    finally:
+        # Autocommit: rows written before an error are committed too
+        invalidate_student_results(student_ids)
         
     return redirect(url_for('admin_attendance_correction'))
 
@@ -1022,64 +1499,49 @@ def admin_student_percentage():
     # Filter Logic
     dept_id = request.args.get('department_id')
     year = request.args.get('year')
+    student_id = request.args.get('student_id')
+    # The stored counts only exist from migration 10 on
+    counts = ", s.attended_periods, s.total_periods" if percentages_stored() else ""
     
+    # One student picked from the search box
+    if student_id:
+         cursor.execute("""
+            SELECT s.id, s.register_no, s.name, s.admin_override_percentage, s.department_id, s.current_year{counts}
+            FROM students s
+            WHERE s.id = %s
+         """.format(counts=counts), (student_id,))
+         students = cursor.fetchall()
+         if students:
+             dept_id = str(students[0]['department_id'])
+             year = str(students[0]['current_year'])
     # If filtered, fetch students
-    if dept_id and year:
+    elif dept_id and year:
          cursor.execute("""
-            SELECT s.id, s.register_no, s.name, s.admin_override_percentage 
+            SELECT s.id, s.register_no, s.name, s.admin_override_percentage{counts}
             FROM students s
             WHERE s.department_id = %s AND s.current_year = %s
             ORDER BY s.register_no
-         """, (dept_id, year))
+         """.format(counts=counts), (dept_id, year))
          students = cursor.fetchall()
+    else:
+         students = []
          
-         # Calculate current calculated vs override
-         for s in students:
-             calculated = calculate_student_percentage(cursor, s['id'])
-             # Note: calculate_student_percentage uses override if set. 
-             # We want to show "System Calculated" vs "Override".
-             # So we need to Bypass the override check manually for display?
-             # Or we just show "Current Effective Percentage" and "Override Value".
-             
-             # Re-calculating RAW system percentage (ignoring override for display purposes)
-             # Duplicate logic or modify helper?
-             # Let's modify helper to take 'ignore_override' arg? NO, simplest is just copy-paste logic OR
-             # Since calculate_student_percentage returns FINAL, if we want RAW, we need to manually doing it or
-             # temporarily set override to None. That's messy.
-             
-             # Let's DRY. Modify helper slightly to accept optional flag? 
-             # Or just trust the admin knows that if Override is set, it IS the percentage.
-             # User prompt: "Calculated Attendance Percentage (read-only)" AND "Editable Field: Admin Override Percentage".
-             # Implies showing what system *thinks* it is vs what Admin sets.
-             
-             # Let's inline the RAW calculation for this specific Admin view so we show the true calculated value.
-             
-             current_system_percentage = 100.0
-             cursor.execute("""SELECT status FROM attendance WHERE student_id = %s""", (s['id'],))
-             recs = cursor.fetchall()
-             
-             total_periods = len(recs)
-             attended_periods = 0
-             
-             if total_periods > 0:
-                 for r in recs:
-                     if r['status'] in ['Present', 'On Duty']: 
-                        attended_periods += 1
-                 current_system_percentage = (attended_periods / total_periods) * 100.0
-                 current_system_percentage = round(current_system_percentage, 2)
-             else:
-                 current_system_percentage = 0.0
-                 
-             if current_system_percentage > 100: current_system_percentage = 100.0
-             if current_system_percentage < 0: current_system_percentage = 0.0
-             
-             students_data.append({
-                 'id': s['id'],
-                 'register_no': s['register_no'],
-                 'name': s['name'],
-                 'calculated': round(current_system_percentage, 1),
-                 'override': s['admin_override_percentage']
-             })
+    # Calculate current calculated vs override
+    for s in students:
+        # Show the RAW system percentage (ignoring override) next to the override value
+        if counts:
+            attended_periods, total_periods = s['attended_periods'], s['total_periods']
+        else:
+            attended_periods, total_periods = fetch_attendance_counts(cursor, s['id'])
+        current_system_percentage = percentage_from_counts(attended_periods, total_periods)
+        
+        students_data.append({
+            'id': s['id'],
+            'register_no': s['register_no'],
+            'name': s['name'],
+            'calculated': round(current_system_percentage, 1),
+            'override': s['admin_override_percentage']
+        })
 
     return render_template('admin_student_percentage.html', 
                            departments=departments, 
@@ -1098,6 +1560,7 @@ def admin_student_percentage_update():
     
     # Process updates
     # Form: override_{student_id}
+    student_ids = [key.split('_')[1] for key in request.form if key.startswith('override_')]
     try:
         for key in request.form:
              if key.startswith('override_'):
@@ -1120,6 +1583,8 @@ def admin_student_percentage_update():
         flash("Percentages updated successfully.", "success")
     except mysql.connector.Error as err:
         flash(f"Error: {err}", "danger")
+    finally:
+        invalidate_student_results(student_ids)
         
     return redirect(url_for('admin_student_percentage', department_id=dept_id, year=year))
 
@@ -1130,179 +1595,207 @@ def admin_student_percentage_update():
 def admin_reset_attendance():
     db, cursor = get_db()
     
-    # 1. Fetch Students
-    cursor.execute("""
-        SELECT s.id, s.register_no, s.name, d.code as dept_name 
-        FROM students s
-        LEFT JOIN departments d ON s.department_id = d.id
-        ORDER BY s.register_no
-    """)
-    students = cursor.fetchall()
-
-    # 2. Fetch Departments
-    cursor.execute("SELECT * FROM departments ORDER BY name")
-    departments = cursor.fetchall()
-
-    # 3. Fetch Subjects
-    cursor.execute("""
-        SELECT s.*, d.code as dept_name 
-        FROM subjects s
-        LEFT JOIN departments d ON s.department_id = d.id 
-        ORDER BY s.code
-    """)
-    subjects = cursor.fetchall()
-
-    # 4. Fetch Staff
-    cursor.execute("SELECT * FROM staff ORDER BY name")
-    staff_list = cursor.fetchall()
+    # Student, subject and staff pickers search /api/search as you type;
+    # only the (short) department list is rendered into the page.
+    # It is only queried when its cached <select> fragment is stale.
+    departments = LazyRows(fetch_rows, "SELECT * FROM departments ORDER BY name")
     
     return render_template('admin_reset_attendance.html', 
-                           students=students,
                            departments=departments,
-                           subjects=subjects,
-                           staff_list=staff_list)
+                           versions=fetch_data_versions())
 
-@app.route('/admin/reset-attendance/action', methods=['POST'])
-@login_required
-@role_required('admin')
-def admin_reset_attendance_action():
-    db, cursor = get_db()
-    action = request.form.get('action')
-    
-    try:
-        # --- SECTION 1: Clear ALL Attendance ---
-        if action == 'clear_all':
-            cursor.execute("DELETE FROM attendance")
-            flash("All attendance records have been permanently deleted.", "success")
-            print(f"ADMIN ACTION: All attendance records deleted by user {session.get('username')}")
+# Actions that can touch most of the attendance table: queued as a job with BACKGROUND_JOBS=1
+BACKGROUND_RESET_ACTIONS = ('clear_all', 'delete_department_attendance', 'delete_subject_attendance',
+                            'delete_staff_attendance', 'delete_department_full')
+
+RESET_TARGET_FIELDS = ('student_id', 'department_id', 'subject_id', 'staff_id')
+
+def log_admin_action(action, username, target):
+    """Records a destructive admin action on the request log line, or on its own line from a job."""
+    entry = {'action': action, 'username': username, **target}
+    if has_request_context():
+        g.admin_action = entry
+    else:
+        request_log.log_event(app, admin_action=entry)
+
+def delete_department_student_attendance(cursor, dept_id, chunk=500):
+    """
+    Deletes the attendance of a department's students. The stored-percentage
+    triggers update students, and MySQL refuses (error 1442) a trigger that
+    writes a table its statement reads, so the ids are fetched first instead
+    of joining students in the DELETE.
+    """
+    cursor.execute("SELECT id FROM students WHERE department_id = %s", (dept_id,))
+    student_ids = [row['id'] for row in cursor.fetchall()]
+    for i in range(0, len(student_ids), chunk):
+        ids = student_ids[i:i + chunk]
+        cursor.execute("DELETE FROM attendance WHERE student_id IN (%s)" % ','.join(['%s'] * len(ids)), tuple(ids))
+
+def reset_attendance(db, cursor, action, form, username=None):
+    """Runs one reset-attendance action and commits it. Returns (message, flash category)."""
+    # --- SECTION 1: Clear ALL Attendance ---
+    if action == 'clear_all':
+        cursor.execute("DELETE FROM attendance")
+        result = ("All attendance records have been permanently deleted.", "success")
+
+    # --- SECTION 2: Clear ONE Student Attendance ---
+    elif action == 'clear_student':
+        student_id = form.get('student_id')
+        if student_id:
+            cursor.execute("DELETE FROM attendance WHERE student_id = %s", (student_id,))
+            result = ("Attendance records for the selected student have been deleted.", "success")
+        else:
+            result = ("No student selected.", "warning")
+
+    # --- SECTION 3: Clear Department Attendance ---
+    elif action == 'delete_department_attendance':
+        dept_id = form.get('department_id')
+        if dept_id:
+            # Delete attendance for students belonging to this department
+            delete_department_student_attendance(cursor, dept_id)
+            result = ("Department attendance cleared successfully.", "success")
+        else:
+            result = ("No department selected.", "warning")
+
+    # --- SECTION 4: Clear Subject Attendance ---
+    elif action == 'delete_subject_attendance':
+        subject_id = form.get('subject_id')
+        if subject_id:
+            cursor.execute("DELETE FROM attendance WHERE subject_id = %s", (subject_id,))
+            result = ("Subject attendance cleared successfully.", "success")
+        else:
+            result = ("No subject selected.", "warning")
+
+    # --- SECTION 5: Clear Staff Attendance handled by Staff ---
+    elif action == 'delete_staff_attendance':
+        staff_id = form.get('staff_id')
+        if staff_id:
+            # 1. Find subjects assigned to this staff
+            cursor.execute("SELECT id FROM subjects WHERE staff_id = %s", (staff_id,))
+            subjects = cursor.fetchall()
             
-        # --- SECTION 2: Clear ONE Student Attendance ---
-        elif action == 'clear_student':
-            student_id = request.form.get('student_id')
-            if student_id:
-                cursor.execute("DELETE FROM attendance WHERE student_id = %s", (student_id,))
-                flash("Attendance records for the selected student have been deleted.", "success")
+            if subjects:
+                subject_ids = [s['id'] for s in subjects]
+                # Mysql connector formatting for IN clause requires manual handling or executemany? 
+                # Simpler to loop or format string for this destructive action?
+                # Safer: string formatting with tuples.
+                format_strings = ','.join(['%s'] * len(subject_ids))
+                query = "DELETE FROM attendance WHERE subject_id IN (%s)" % format_strings
+                cursor.execute(query, tuple(subject_ids))
+                result = ("Staff attendance records cleared successfully.", "success")
             else:
-                flash("No student selected.", "warning")
-
-        # --- SECTION 3: Clear Department Attendance ---
-        elif action == 'delete_department_attendance':
-            dept_id = request.form.get('department_id')
-            if dept_id:
-                # Delete attendance for students belonging to this department
+                result = ("No subjects found for this staff.", "info")
+        else:
+            result = ("No staff selected.", "warning")
+
+    # --- SECTION 6: Delete Student (Full Data) ---
+    elif action == 'delete_student_full':
+        student_id = form.get('student_id')
+        if student_id:
+            # Delete attendance explicitly: ON DELETE CASCADE would skip the
+            # change-feed triggers, so downstream systems would miss the deletions.
+            cursor.execute("DELETE FROM attendance WHERE student_id = %s", (student_id,))
+            cursor.execute("DELETE FROM students WHERE id = %s", (student_id,))
+            bump_data_version(cursor, 'students')
+            result = ("Student and their attendance deleted successfully.", "success")
+        else:
+            result = ("No student selected.", "warning")
+
+    # --- SECTION 7: Delete Department (Full Data) ---
+    elif action == 'delete_department_full':
+        dept_id = form.get('department_id')
+        if dept_id:
+            try:
+                # Transactional Order:
+                # 1. Delete Attendance of students in Dept
+                delete_department_student_attendance(cursor, dept_id)
+                
+                # 1b. Attendance of other students in this Dept's subjects (explicit, not cascaded)
                 cursor.execute("""
                     DELETE a FROM attendance a 
-                    JOIN students s ON a.student_id = s.id 
-                    WHERE s.department_id = %s
+                    JOIN subjects sub ON a.subject_id = sub.id 
+                    WHERE sub.department_id = %s
                 """, (dept_id,))
-                flash("Department attendance cleared successfully.", "success")
-            else:
-                flash("No department selected.", "warning")
-
-        # --- SECTION 4: Clear Subject Attendance ---
-        elif action == 'delete_subject_attendance':
-            subject_id = request.form.get('subject_id')
-            if subject_id:
-                cursor.execute("DELETE FROM attendance WHERE subject_id = %s", (subject_id,))
-                flash("Subject attendance cleared successfully.", "success")
-            else:
-                flash("No subject selected.", "warning")
-
-        # --- SECTION 5: Clear Staff Attendance handled by Staff ---
-        elif action == 'delete_staff_attendance':
-            staff_id = request.form.get('staff_id')
-            if staff_id:
-                # 1. Find subjects assigned to this staff
-                cursor.execute("SELECT id FROM subjects WHERE staff_id = %s", (staff_id,))
-                subjects = cursor.fetchall()
                 
-                if subjects:
-                    subject_ids = [s['id'] for s in subjects]
-                    # Mysql connector formatting for IN clause requires manual handling or executemany? 
-                    # Simpler to loop or format string for this destructive action?
-                    # Safer: string formatting with tuples.
-                    format_strings = ','.join(['%s'] * len(subject_ids))
-                    query = "DELETE FROM attendance WHERE subject_id IN (%s)" % format_strings
-                    cursor.execute(query, tuple(subject_ids))
-                    flash("Staff attendance records cleared successfully.", "success")
-                else:
-                    flash("No subjects found for this staff.", "info")
-            else:
-                flash("No staff selected.", "warning")
-
-        # --- SECTION 6: Delete Student (Full Data) ---
-        elif action == 'delete_student_full':
-            student_id = request.form.get('student_id')
-            if student_id:
-                # Attendance cascades on delete, but we can be explicit if needed. 
-                # ON DELETE CASCADE is defined in schema.
-                cursor.execute("DELETE FROM students WHERE id = %s", (student_id,))
-                flash("Student and their attendance deleted successfully.", "success")
-            else:
-                flash("No student selected.", "warning")
-
-        # --- SECTION 7: Delete Department (Full Data) ---
-        elif action == 'delete_department_full':
-            dept_id = request.form.get('department_id')
-            if dept_id:
-                try:
-                    # Transactional Order:
-                    # 1. Delete Attendance of students in Dept
-                    cursor.execute("""
-                        DELETE a FROM attendance a 
-                        JOIN students s ON a.student_id = s.id 
-                        WHERE s.department_id = %s
-                    """, (dept_id,))
-                    
-                    # 2. Delete Students
-                    cursor.execute("DELETE FROM students WHERE department_id = %s", (dept_id,))
-                    
-                    # 3. Delete Subjects
-                    cursor.execute("DELETE FROM subjects WHERE department_id = %s", (dept_id,))
-                    
-                    # 4. Set Staff Department to NULL
-                    cursor.execute("UPDATE staff SET department_id = NULL WHERE department_id = %s", (dept_id,))
-                    
-                    # 5. Delete Department
-                    cursor.execute("DELETE FROM departments WHERE id = %s", (dept_id,))
-                    
-                    db.commit() # Commit Explicitly
-                    flash("Department and all related data deleted successfully.", "success")
-                    
-                except Exception as e:
-                    db.rollback()
-                    raise e # Re-raise to be caught by outer except
-            else:
-                flash("No department selected.", "warning")
-
-        # --- SECTION 8: Delete Staff (Academic Staff Only) ---
-        elif action == 'delete_staff':
-            staff_id = request.form.get('staff_id')
-            if staff_id:
-                # Subjects.staff_id will set to NULL via CASCADE/SET NULL in schema
-                cursor.execute("DELETE FROM staff WHERE id = %s", (staff_id,))
-                flash("Staff record deleted successfully (User login remains).", "success")
-            else:
-                flash("No staff selected.", "warning")
-
-        # --- SECTION 9: Delete Subject (Full) ---
-        elif action == 'delete_subject':
-            subject_id = request.form.get('subject_id')
-            if subject_id:
-                cursor.execute("DELETE FROM subjects WHERE id = %s", (subject_id,))
-                flash("Subject deleted successfully.", "success")
-            else:
-                flash("No subject selected.", "warning")
-
+                # 2. Delete Students
+                cursor.execute("DELETE FROM students WHERE department_id = %s", (dept_id,))
+                
+                # 3. Delete Subjects
+                cursor.execute("DELETE FROM subjects WHERE department_id = %s", (dept_id,))
+                
+                # 4. Set Staff Department to NULL
+                cursor.execute("UPDATE staff SET department_id = NULL WHERE department_id = %s", (dept_id,))
+                
+                # 5. Delete Department
+                cursor.execute("DELETE FROM departments WHERE id = %s", (dept_id,))
+                
+                bump_data_version(cursor, 'students', 'subjects', 'staff', 'departments')
+                db.commit() # Commit Explicitly
+                result = ("Department and all related data deleted successfully.", "success")
+                
+            except Exception as e:
+                db.rollback()
+                raise e # Re-raise to be caught by the caller
         else:
-             flash("Invalid action.", "danger")
-        
-        # Global Commit for non-explicit commits (if autocommit is off, but typically Flask-MySQL connector might auto-commit or we need to ensure)
-        # The 'get_db' doesn't seem to imply auto-commit based on other code using db.commit() in some places.
-        # But 'DELETE' without transaction block might auto-commit in some configs. 
-        # Safest is to commit for all modifying actions.
-        db.commit()
+            result = ("No department selected.", "warning")
+
+    # --- SECTION 8: Delete Staff (Academic Staff Only) ---
+    elif action == 'delete_staff':
+        staff_id = form.get('staff_id')
+        if staff_id:
+            # Subjects.staff_id will set to NULL via CASCADE/SET NULL in schema
+            cursor.execute("DELETE FROM staff WHERE id = %s", (staff_id,))
+            bump_data_version(cursor, 'staff', 'subjects')
+            result = ("Staff record deleted successfully (User login remains).", "success")
+        else:
+            result = ("No staff selected.", "warning")
+
+    # --- SECTION 9: Delete Subject (Full) ---
+    elif action == 'delete_subject':
+        subject_id = form.get('subject_id')
+        if subject_id:
+            # Explicit so the change-feed triggers see the deleted attendance
+            cursor.execute("DELETE FROM attendance WHERE subject_id = %s", (subject_id,))
+            cursor.execute("DELETE FROM subjects WHERE id = %s", (subject_id,))
+            bump_data_version(cursor, 'subjects')
+            result = ("Subject deleted successfully.", "success")
+        else:
+            result = ("No subject selected.", "warning")
 
+    else:
+        return ("Invalid action.", "danger")
+    
+    # Global Commit for non-explicit commits (if autocommit is off, but typically Flask-MySQL connector might auto-commit or we need to ensure)
+    # The 'get_db' doesn't seem to imply auto-commit based on other code using db.commit() in some places.
+    # But 'DELETE' without transaction block might auto-commit in some configs. 
+    # Safest is to commit for all modifying actions.
+    db.commit()
+    if result[1] == 'success':
+        log_admin_action(action, username, {key: form.get(key) for key in RESET_TARGET_FIELDS if form.get(key)})
+
+    # Cached percentages of the students whose attendance is gone (after the commit)
+    if action in ('clear_student', 'delete_student_full'):
+        invalidate_student_results([form.get('student_id')])
+    elif action in ('clear_all', 'delete_department_attendance', 'delete_subject_attendance',
+                    'delete_staff_attendance', 'delete_department_full', 'delete_subject'):
+        clear_student_results()
+    return result
+
+@app.route('/admin/reset-attendance/action', methods=['POST'])
+@login_required
+@role_required('admin')
+def admin_reset_attendance_action():
+    db, cursor = get_db()
+    action = request.form.get('action')
+
+    if app.config['BACKGROUND_JOBS'] and action in BACKGROUND_RESET_ACTIONS:
+        params = {key: request.form.get(key) for key in ('action',) + RESET_TARGET_FIELDS}
+        params['username'] = session.get('username')
+        return enqueue_job('reset_attendance', params)
+    
+    try:
+        message, category = reset_attendance(db, cursor, action, request.form, session.get('username'))
+        flash(message, category)
     except mysql.connector.Error as err:
         db.rollback()
         flash(f"Database Error: {err}", "danger")
@@ -1312,9 +1805,101 @@ def admin_reset_attendance_action():
         
     return redirect(url_for('admin_reset_attendance'))
 
+# --- ADMIN: RECORD SEARCH (TYPEAHEAD PICKERS) ---
+# Prefix matches only (LIKE 'abc%'), so every branch is a range scan on an index:
+# students.register_no (unique), idx_students_name, idx_subjects_code,
+# idx_subjects_name, idx_staff_name.
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 50
+
+def like_prefix(term):
+    # Escape LIKE wildcards so user input only ever matches literally
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+def search_records(cursor, record_type, term, limit, department_id=None, year=None, batch=None):
+    prefix = like_prefix(term)
+
+    if record_type == 'student':
+        scope, scope_params = [], []
+        if department_id:
+            scope.append("department_id = %s")
+            scope_params.append(department_id)
+        if year:
+            scope.append("current_year = %s")
+            scope_params.append(year)
+        if batch:
+            scope.append("batch = %s")
+            scope_params.append(batch)
+        scope_sql = "".join(f" AND {cond}" for cond in scope)
+
+        # One indexed branch per column; UNION removes students matching both
+        cursor.execute(f"""
+            (SELECT id, register_no, name FROM students
+             WHERE register_no LIKE %s{scope_sql} ORDER BY register_no LIMIT %s)
+            UNION
+            (SELECT id, register_no, name FROM students
+             WHERE name LIKE %s{scope_sql} ORDER BY name LIMIT %s)
+            ORDER BY register_no
+            LIMIT %s
+        """, [prefix] + scope_params + [limit, prefix] + scope_params + [limit, limit])
+        return [{'id': r['id'], 'text': f"{r['register_no']} - {r['name']}",
+                 'register_no': r['register_no'], 'name': r['name']} for r in cursor.fetchall()]
+
+    if record_type == 'subject':
+        scope, scope_params = [], []
+        if department_id:
+            scope.append("department_id = %s")
+            scope_params.append(department_id)
+        if year:
+            scope.append("year = %s")
+            scope_params.append(year)
+        if batch:
+            scope.append("batch = %s")
+            scope_params.append(batch)
+        scope_sql = "".join(f" AND {cond}" for cond in scope)
+
+        cursor.execute(f"""
+            (SELECT id, code, name FROM subjects
+             WHERE code LIKE %s{scope_sql} ORDER BY code LIMIT %s)
+            UNION
+            (SELECT id, code, name FROM subjects
+             WHERE name LIKE %s{scope_sql} ORDER BY name LIMIT %s)
+            ORDER BY code
+            LIMIT %s
+        """, [prefix] + scope_params + [limit, prefix] + scope_params + [limit, limit])
+        return [{'id': r['id'], 'text': f"{r['code']} - {r['name']}",
+                 'code': r['code'], 'name': r['name']} for r in cursor.fetchall()]
+
+    # staff
+    query = "SELECT id, name FROM staff WHERE name LIKE %s"
+    params = [prefix]
+    if department_id:
+        query += " AND department_id = %s"
+        params.append(department_id)
+    cursor.execute(query + " ORDER BY name LIMIT %s", params + [limit])
+    return [{'id': r['id'], 'text': r['name'], 'name': r['name']} for r in cursor.fetchall()]
+
+@app.route('/api/search', methods=['GET'])
+@login_required
+@role_required('admin')
+@replica_reads
+def api_search():
+    record_type = request.args.get('type')
+    if record_type not in ('student', 'subject', 'staff'):
+        return jsonify({'error': "type must be 'student', 'subject' or 'staff'"}), 400
 
+    try:
+        limit = int(request.args.get('limit', SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
 
-    return redirect(url_for('admin_reset_attendance'))
+    db, cursor = get_db()
+    results = search_records(cursor, record_type, request.args.get('q', '').strip()[:100], limit,
+                             department_id=request.args.get('department_id') or None,
+                             year=request.args.get('year') or None,
+                             batch=request.args.get('batch') or None)
+    return jsonify({'results': results})
 
 # --- ADMIN: CLASS LOGINS ---
 @app.route('/admin/manage_class_logins', methods=('GET', 'POST'))
@@ -1393,6 +1978,7 @@ def delete_class_login(class_login_id):
 @app.route('/admin/attendance-overview', methods=['GET'])
 @login_required
 @role_required('admin')
+@replica_reads
 def admin_attendance_overview():
     db, cursor = get_db()
     
@@ -1427,7 +2013,7 @@ def admin_attendance_overview():
         
         # 4. Calculate Percentage loop
         for student in students:
-            percentage = calculate_student_percentage(cursor, student['id'])
+            percentage = student_row_percentage(cursor, student)
             # We convert row to dict to append percentage
             s_dict = dict(student) 
             s_dict['percentage'] = percentage
@@ -1440,53 +2026,898 @@ def admin_attendance_overview():
                            selected_year=year)
 
 
+# --- ADMIN: INSTITUTION ANALYTICS (ROLLUP) ---
+# One aggregate pass over attendance, grouped Department -> Year -> Batch -> Subject.
+# Subject rows average the per-subject percentage of each student; the higher levels
+# average each student's effective (override-aware) percentage exactly once.
+# Students without attendance rows count at 0% (or their override), as on the per-student pages.
+# `* 1.0`: SQLite hands back a whole DECIMAL like 85.00 as an integer and would divide as one.
+ANALYTICS_EFFECTIVE_COMPUTED = """COALESCE(MAX(s.admin_override_percentage),
+                        ROUND(SUM(SUM(a.status IN ('Present', 'On Duty'))) OVER w * 100.0
+                              / NULLIF(SUM(COUNT(a.id)) OVER w, 0), 2), 0)"""
+ANALYTICS_EFFECTIVE_STORED = "MAX(s.effective_percentage)"
+
+ANALYTICS_ROLLUP_QUERY = """
+    SELECT st.department_id, MAX(d.name) as dept_name,
+           st.current_year, st.batch,
+           ss.subject_id, MAX(sub.code) as subject_code, MAX(sub.name) as subject_name,
+           GROUPING(st.department_id) as g_dept,
+           GROUPING(st.current_year) as g_year,
+           GROUPING(st.batch) as g_batch,
+           GROUPING(ss.subject_id) as g_subject,
+           COUNT(DISTINCT ss.student_id) as student_count,
+           AVG(ss.subject_percentage) as avg_subject_percentage,
+           SUM(ss.subject_percentage < %s) as below_subject_count,
+           SUM(ss.effective_percentage * 1.0 / ss.subject_count) / COUNT(DISTINCT ss.student_id) as avg_student_percentage,
+           COUNT(DISTINCT CASE WHEN ss.effective_percentage < %s THEN ss.student_id END) as below_student_count
+    FROM (
+        SELECT s.id as student_id, a.subject_id,
+               SUM(a.status IN ('Present', 'On Duty')) * 100.0 / NULLIF(COUNT(a.id), 0) as subject_percentage,
+               {effective} as effective_percentage,
+               COUNT(*) OVER w as subject_count
+        FROM students s
+        LEFT JOIN attendance a ON a.student_id = s.id
+        GROUP BY s.id, a.subject_id
+        WINDOW w AS (PARTITION BY s.id)
+    ) ss
+    JOIN students st ON ss.student_id = st.id
+    JOIN departments d ON st.department_id = d.id
+    LEFT JOIN subjects sub ON ss.subject_id = sub.id
+    GROUP BY st.department_id, st.current_year, st.batch, ss.subject_id WITH ROLLUP
+"""
+
+_analytics_cache = {'rows': None, 'computed_at': 0.0}
+
+def fetch_analytics_rollup(refresh=False):
+    """Returns the rollup rows ordered so every subtotal precedes its children.
+
+    Results are kept per worker for ANALYTICS_CACHE_TTL seconds; a cache hit
+    does not touch the database at all.
+    """
+    now = time.time()
+    if (not refresh and _analytics_cache['rows'] is not None and
+            now - _analytics_cache['computed_at'] < app.config['ANALYTICS_CACHE_TTL']):
+        return _analytics_cache['rows'], _analytics_cache['computed_at']
+
+    db, cursor = get_db()
+    effective = ANALYTICS_EFFECTIVE_STORED if percentages_stored() else ANALYTICS_EFFECTIVE_COMPUTED
+    cursor.execute(ANALYTICS_ROLLUP_QUERY.format(effective=effective), (ATTENDANCE_THRESHOLD, ATTENDANCE_THRESHOLD))
+    rows = []
+    for r in cursor.fetchall():
+        if r['g_dept']: level = 'total'
+        elif r['g_year']: level = 'department'
+        elif r['g_batch']: level = 'year'
+        elif r['g_subject']: level = 'batch'
+        else: level = 'subject'
+
+        if level == 'subject' and r['subject_id'] is None:
+            continue # Students without attendance: only counted in the levels above
+        if level == 'subject':
+            average = r['avg_subject_percentage']
+            below = r['below_subject_count']
+        else:
+            average = r['avg_student_percentage']
+            below = r['below_student_count']
+
+        rows.append({
+            'level': level,
+            'dept_name': r['dept_name'],
+            'year': r['current_year'],
+            'batch': r['batch'],
+            'subject_code': r['subject_code'],
+            'subject_name': r['subject_name'],
+            'student_count': r['student_count'],
+            'average': round(float(average or 0), 1),
+            'below_count': int(below or 0),
+            # Sort key: a rolled-up (NULL) column sorts before the detail rows under it
+            '_key': (r['g_dept'] == 0, r['dept_name'] or '',
+                     r['g_year'] == 0, r['current_year'] or 0,
+                     r['g_batch'] == 0, r['batch'] or '',
+                     r['g_subject'] == 0, r['subject_code'] or ''),
+        })
+    rows.sort(key=lambda row: row['_key'])
+
+    _analytics_cache['rows'] = rows
+    _analytics_cache['computed_at'] = now
+    return rows, now
+
+@app.route('/admin/analytics', methods=['GET'])
+@login_required
+@role_required('admin')
+@replica_reads
+def admin_analytics():
+    rows, computed_at = fetch_analytics_rollup(refresh=bool(request.args.get('refresh')))
+
+    return render_template('admin_analytics.html',
+                           rows=rows,
+                           threshold=ATTENDANCE_THRESHOLD,
+                           computed_at=time.strftime('%d-%m-%Y %H:%M:%S', time.localtime(computed_at)),
+                           cache_ttl=app.config['ANALYTICS_CACHE_TTL'])
+
+
+# --- ADMIN: TERM SNAPSHOTS (FROZEN HISTORY) ---
+# Freezes raw, override and effective percentage for every student in one
+# INSERT ... SELECT pass. Later corrections, overrides or resets never touch it.
+TERM_SNAPSHOT_QUERY = """
+    INSERT INTO term_snapshots
+        (term_id, student_id, register_no, name, department_id, current_year, batch,
+         total_periods, attended_periods, raw_percentage, override_percentage, effective_percentage)
+    SELECT %s, s.id, s.register_no, s.name, s.department_id, s.current_year, s.batch,
+           t.total_periods, t.attended_periods, t.raw_percentage,
+           s.admin_override_percentage,
+           COALESCE(s.admin_override_percentage, t.raw_percentage)
+    FROM students s
+    JOIN (
+        SELECT s2.id as student_id,
+               COUNT(a.id) as total_periods,
+               COALESCE(SUM(a.status IN ('Present', 'On Duty')), 0) as attended_periods,
+               CASE WHEN COUNT(a.id) = 0 THEN 0
+                    ELSE ROUND(SUM(a.status IN ('Present', 'On Duty')) * 100.0 / COUNT(a.id), 2)
+               END as raw_percentage
+        FROM students s2
+        LEFT JOIN attendance a ON a.student_id = s2.id AND a.date BETWEEN %s AND %s
+        GROUP BY s2.id
+    ) t ON t.student_id = s.id
+"""
+
+def snapshot_term(db, cursor, term_id, start_date, end_date):
+    """Replaces the snapshot of one term atomically. Returns the number of students frozen."""
+    db.start_transaction()
+    try:
+        cursor.execute("DELETE FROM term_snapshots WHERE term_id = %s", (term_id,))
+        cursor.execute(TERM_SNAPSHOT_QUERY, (term_id, start_date, end_date))
+        frozen = cursor.rowcount
+        cursor.execute("UPDATE terms SET snapshot_at = CURRENT_TIMESTAMP WHERE id = %s", (term_id,))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return frozen
+
+def fetch_term_snapshot(term_id, dept_id=None, year=None):
+    query = """
+        SELECT ts.*, d.name as dept_name
+        FROM term_snapshots ts
+        LEFT JOIN departments d ON ts.department_id = d.id
+        WHERE ts.term_id = %s
+    """
+    params = [term_id]
+
+    if dept_id:
+        query += " AND ts.department_id = %s"
+        params.append(dept_id)
+    if year:
+        query += " AND ts.current_year = %s"
+        params.append(year)
+
+    query += " ORDER BY ts.register_no"
+    return fetch_rows(query, tuple(params))
+
+@app.route('/admin/term-snapshots', methods=['GET'])
+@login_required
+@role_required('admin')
+@replica_reads
+def admin_term_snapshots():
+    db, cursor = get_db()
+
+    cursor.execute("SELECT * FROM terms ORDER BY start_date DESC")
+    terms = cursor.fetchall()
+
+    cursor.execute("SELECT * FROM departments ORDER BY name")
+    departments = cursor.fetchall()
+
+    term_id = request.args.get('term_id')
+    dept_id = request.args.get('department_id')
+    year = request.args.get('year')
+
+    selected_term = None
+    snapshot = []
+    if term_id:
+        selected_term = next((t for t in terms if str(t['id']) == term_id), None)
+        if selected_term:
+            snapshot = fetch_term_snapshot(term_id, dept_id, year)
+
+    return render_template('admin_term_snapshots.html',
+                           terms=terms,
+                           departments=departments,
+                           selected_term=selected_term,
+                           selected_dept=dept_id,
+                           selected_year=year,
+                           snapshot=snapshot,
+                           threshold=ATTENDANCE_THRESHOLD)
+
+@app.route('/admin/term-snapshots/<int:term_id>/export')
+@login_required
+@role_required('admin')
+@replica_reads
+def admin_export_term_snapshot(term_id):
+    db, cursor = get_db()
+    import openpyxl
+    from io import BytesIO
+
+    cursor.execute("SELECT * FROM terms WHERE id = %s", (term_id,))
+    term = cursor.fetchone()
+    if not term or term['snapshot_at'] is None:
+        flash("No snapshot exists for this term.", "danger")
+        return redirect(url_for('admin_term_snapshots'))
+
+    snapshot = fetch_term_snapshot(term_id,
+                                   request.args.get('department_id'), request.args.get('year'))
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Term Snapshot"
+
+    ws.append(["Register No", "Name", "Department", "Year", "Batch", "Total Periods",
+               "Attended Periods", "Calculated %", "Override %", "Effective %"])
+    for row in snapshot:
+        ws.append([row['register_no'], row['name'], row['dept_name'], row['current_year'], row['batch'],
+                   row['total_periods'], row['attended_periods'], float(row['raw_percentage']),
+                   row['override_percentage'], float(row['effective_percentage'])])
+
+    buffer = BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+
+    filename = f"Attendance_Term_{term['name']}.xlsx"
+    return send_file(buffer, as_attachment=True, download_name=filename, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+
+# --- ADMIN: EXAM ELIGIBILITY (BATCH COMPUTATION) ---
+def compute_department_eligibility(dept_id):
+    """
+    Worker task: recomputes the eligibility rows of one department partition
+    (dept_id None = students without a department). Runs in its own process,
+    so it opens its own connection. Returns (students, shortfall).
+    """
+    db = connect_db()
+    cursor = db.cursor(dictionary=True)
+    try:
+        if percentages_stored():
+            query = """
+                SELECT s.id, s.department_id, s.current_year, s.batch, s.admin_override_percentage,
+                       s.total_periods, s.attended_periods
+                FROM students s
+            """
+            group = ""
+        else:
+            query = """
+                SELECT s.id, s.department_id, s.current_year, s.batch, s.admin_override_percentage,
+                       COUNT(a.id) as total_periods,
+                       COALESCE(SUM(a.status IN ('Present', 'On Duty')), 0) as attended_periods
+                FROM students s
+                LEFT JOIN attendance a ON a.student_id = s.id
+            """
+            group = " GROUP BY s.id"
+        if dept_id is None:
+            cursor.execute(query + " WHERE s.department_id IS NULL" + group)
+        else:
+            cursor.execute(query + " WHERE s.department_id = %s" + group, (dept_id,))
+        students = cursor.fetchall()
+
+        rows = []
+        shortfall = 0
+        for s in students:
+            attended_periods = int(s['attended_periods'])
+            total_periods = int(s['total_periods'])
+            override = s['admin_override_percentage']
+
+            # Same rules as calculate_student_percentage, from the same counts
+            if override is not None:
+                effective = float(override)
+                periods_needed = None
+            else:
+                effective = percentage_from_counts(attended_periods, total_periods)
+                periods_needed = periods_needed_for_threshold(attended_periods, total_periods)
+
+            is_eligible = effective >= ATTENDANCE_THRESHOLD
+            if not is_eligible:
+                shortfall += 1
+
+            rows.append((s['id'], s['department_id'], s['current_year'], s['batch'],
+                         total_periods, attended_periods, override, effective,
+                         is_eligible, periods_needed))
+
+        db.start_transaction()
+        if dept_id is None:
+            cursor.execute("DELETE FROM eligibility WHERE department_id IS NULL")
+        else:
+            cursor.execute("DELETE FROM eligibility WHERE department_id = %s", (dept_id,))
+
+        # executemany collapses this into multi-row INSERTs; chunk to bound packet size
+        for i in range(0, len(rows), 1000):
+            cursor.executemany("""
+                INSERT INTO eligibility (student_id, department_id, current_year, batch, total_periods,
+                                         attended_periods, override_percentage, effective_percentage,
+                                         is_eligible, periods_needed)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE department_id = VALUES(department_id), current_year = VALUES(current_year),
+                    batch = VALUES(batch), total_periods = VALUES(total_periods),
+                    attended_periods = VALUES(attended_periods), override_percentage = VALUES(override_percentage),
+                    effective_percentage = VALUES(effective_percentage), is_eligible = VALUES(is_eligible),
+                    periods_needed = VALUES(periods_needed), computed_at = CURRENT_TIMESTAMP
+            """, rows[i:i + 1000])
+        db.commit()
+
+        return len(rows), shortfall
+    except Exception:
+        if db.in_transaction:
+            db.rollback()
+        raise
+    finally:
+        cursor.close()
+        db.close()
+
+def compute_eligibility(max_workers=None, progress=None):
+    """
+    Partitions students by department and computes each partition in a process pool.
+    progress(done, total) is called as partitions finish.
+    """
+    db = connect_db()
+    cursor = db.cursor()
+    cursor.execute("SELECT DISTINCT department_id FROM students")
+    partitions = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    db.close()
+
+    if not partitions:
+        return 0, 0
+
+    workers = max_workers or app.config['ELIGIBILITY_WORKERS'] or os.cpu_count() or 1
+    # 'spawn' so children never inherit the parent's open MySQL sockets
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(partitions)), mp_context=context) as pool:
+        results = []
+        for future in as_completed([pool.submit(compute_department_eligibility, p) for p in partitions]):
+            results.append(future.result())
+            if progress:
+                progress(len(results), len(partitions))
+
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+@app.route('/admin/eligibility', methods=['GET'])
+@login_required
+@role_required('admin')
+@replica_reads
+def admin_eligibility():
+    db, cursor = get_db()
+
+    cursor.execute("SELECT * FROM departments ORDER BY name")
+    departments = cursor.fetchall()
+
+    dept_id = request.args.get('department_id')
+    year = request.args.get('year')
+    batch = request.args.get('batch')
+    show = request.args.get('show', 'shortfall')
+
+    query = """
+        SELECT e.*, s.register_no, s.name, d.name as dept_name
+        FROM eligibility e
+        JOIN students s ON e.student_id = s.id
+        LEFT JOIN departments d ON e.department_id = d.id
+        WHERE 1 = 1
+    """
+    params = []
+
+    if dept_id:
+        query += " AND e.department_id = %s"
+        params.append(dept_id)
+    if year:
+        query += " AND e.current_year = %s"
+        params.append(year)
+    if batch:
+        query += " AND e.batch = %s"
+        params.append(batch)
+    if show != 'all':
+        query += " AND e.is_eligible = FALSE"
+
+    query += " ORDER BY e.effective_percentage, s.register_no"
+    results = fetch_rows(query, tuple(params))
+
+    cursor.execute("""
+        SELECT MAX(computed_at) as computed_at, COUNT(*) as total,
+               COALESCE(SUM(is_eligible = FALSE), 0) as shortfall
+        FROM eligibility
+    """)
+    summary = cursor.fetchone()
+
+    return render_template('admin_eligibility.html',
+                           departments=departments,
+                           results=results,
+                           summary=summary,
+                           selected_dept=dept_id,
+                           selected_year=year,
+                           selected_batch=batch,
+                           show=show,
+                           threshold=ATTENDANCE_THRESHOLD)
+
+@app.route('/admin/eligibility/compute', methods=['POST'])
+@login_required
+@role_required('admin')
+def admin_compute_eligibility():
+    if app.config['BACKGROUND_JOBS']:
+        return enqueue_job('compute_eligibility', {})
+    try:
+        total, shortfall = compute_eligibility()
+        flash(f"Eligibility computed for {total} students. {shortfall} below {ATTENDANCE_THRESHOLD:g}%.", "success")
+    except mysql.connector.Error as err:
+        flash(f"Database Error: {err}", "danger")
+
+    return redirect(url_for('admin_eligibility'))
+
+
+# --- ADMIN: RAW ATTENDANCE EXPORT (STREAMING CSV) ---
+ATTENDANCE_EXPORT_HEADER = ["Attendance ID", "Date", "Status", "Marked At", "Register No", "Student Name",
+                            "Department", "Year", "Batch", "Subject Code", "Subject Name"]
+
+def stream_attendance_csv(db, where, params, compress=False, chunk_rows=2000, progress=None):
+    """
+    Yields the export as CSV (optionally gzip) chunks. Takes its own connection (closed
+    when the stream ends) and reads through an unbuffered cursor, so rows are pulled from
+    the server chunk by chunk and worker memory stays flat regardless of the table size.
+    progress(rows) is called with the number of rows written so far.
+    """
+    try:
+        cursor = db.cursor()  # Unbuffered: rows stay on the server until fetched
+        # A slow client must not make the server abort the result stream
+        cursor.execute("SET SESSION net_write_timeout = 3600")
+        cursor.execute("""
+            SELECT a.id, a.date, a.status, a.marked_at, st.register_no, st.name,
+                   d.code, st.current_year, st.batch, sub.code, sub.name
+            FROM attendance a
+            JOIN students st ON a.student_id = st.id
+            JOIN subjects sub ON a.subject_id = sub.id
+            LEFT JOIN departments d ON st.department_id = d.id
+        """ + where, params)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits 31 = gzip container
+
+        writer.writerow(ATTENDANCE_EXPORT_HEADER)
+        written = 0
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            writer.writerows(rows)
+            written += len(rows)
+            if progress:
+                progress(written)
+            chunk = buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+            if compressor:
+                chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+            yield chunk
+
+        tail = buffer.getvalue().encode('utf-8')
+        if compressor:
+            yield compressor.compress(tail) + compressor.flush()
+        elif tail:
+            yield tail
+    finally:
+        # Closing the connection also discards any unread rows if the client disconnected
+        db.close()
+
+@app.route('/admin/export/attendance', methods=['GET'])
+@login_required
+@role_required('admin')
+def admin_export_attendance():
+    db, cursor = get_db()
+
+    cursor.execute("SELECT * FROM departments ORDER BY name")
+    departments = cursor.fetchall()
+
+    cursor.execute("SELECT * FROM terms ORDER BY start_date DESC")
+    terms = cursor.fetchall()
+
+    return render_template('admin_export_attendance.html', departments=departments, terms=terms,
+                           background_jobs=app.config['BACKGROUND_JOBS'])
+
+def attendance_export_filter(cursor, args):
+    """
+    WHERE clause and params for the export form's filters (department_id, term_id,
+    from_date, to_date). Raises ValueError with a message for the admin.
+    """
+    from datetime import date as date_cls
+
+    dept_id = args.get('department_id')
+    term_id = args.get('term_id')
+    from_date = args.get('from_date')
+    to_date = args.get('to_date')
+
+    try:
+        from_date = date_cls.fromisoformat(from_date) if from_date else None
+        to_date = date_cls.fromisoformat(to_date) if to_date else None
+    except ValueError:
+        raise ValueError("Invalid date range.")
+
+    conditions = []
+    params = []
+
+    if term_id:
+        cursor.execute("SELECT * FROM terms WHERE id = %s", (term_id,))
+        term = cursor.fetchone()
+        if not term:
+            raise ValueError("Term not found.")
+        # The term narrows any explicit range
+        from_date = max(from_date, term['start_date']) if from_date else term['start_date']
+        to_date = min(to_date, term['end_date']) if to_date else term['end_date']
+
+    if dept_id:
+        conditions.append("st.department_id = %s")
+        params.append(dept_id)
+    if from_date:
+        conditions.append("a.date >= %s")
+        params.append(from_date)
+    if to_date:
+        conditions.append("a.date <= %s")
+        params.append(to_date)
+
+    where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+    return where, tuple(params)
+
+def attendance_export_filename(compress):
+    return f"attendance_export_{time.strftime('%Y%m%d_%H%M%S')}.csv" + (".gz" if compress else "")
+
+@app.route('/admin/export/attendance/download', methods=['GET'])
+@login_required
+@role_required('admin')
+@replica_reads
+def admin_export_attendance_download():
+    compress = request.args.get('gzip') == '1'
+
+    # Validate everything up front: errors cannot be reported once streaming has started
+    db, cursor = get_db()
+    try:
+        where, params = attendance_export_filter(cursor, request.args)
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for('admin_export_attendance'))
+
+    filename = attendance_export_filename(compress)
+    mimetype = 'application/gzip' if compress else 'text/csv'
+
+    return Response(stream_attendance_csv(connect_read_db(), where, params, compress),
+                    mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"',
+                             'X-Accel-Buffering': 'no'})
+
+@app.route('/admin/export/attendance/background', methods=['POST'])
+@login_required
+@role_required('admin')
+def admin_export_attendance_background():
+    db, cursor = get_db()
+    try:
+        attendance_export_filter(cursor, request.form)
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for('admin_export_attendance'))
+    # The job resolves the term itself, so it exports whatever the term covers when it runs
+    return enqueue_job('attendance_export', {key: request.form.get(key) for key in
+                                             ('department_id', 'term_id', 'from_date', 'to_date', 'gzip')})
+
+
+# --- ADMIN: BACKGROUND JOBS ---
+# Work that can outlive a request runs in `flask worker` (background_jobs.py).
+# Handlers run in the worker's pool processes, with the job's own connection.
+def enqueue_job(job_type, params, **options):
+    """Queues a job and sends the admin to its status page."""
+    db, cursor = get_db()
+    job_id = background_jobs.enqueue(cursor, job_type, params, created_by=session.get('user_id'), **options)
+    flash(f"{background_jobs.label(job_type)} queued as job #{job_id}.", "success")
+    return redirect(url_for('admin_job', job_id=job_id))
+
+def run_background_job(job_id):
+    # Pool process entry point; top level so 'spawn' children can import it
+    return background_jobs.run(connect_db(), job_id, app.config['JOB_RESULTS_DIR'])
+
+@background_jobs.handler('attendance_export', "Attendance export")
+def attendance_export_job(job):
+    where, params = attendance_export_filter(job.cursor, job.params)
+    job.cursor.execute("SELECT COUNT(*) as count FROM attendance a JOIN students st ON a.student_id = st.id" + where,
+                       params)
+    total = job.cursor.fetchone()['count']
+    job.progress(0, total, force=True)
+
+    compress = job.params.get('gzip') == '1'
+    written = [0]
+    def progress(rows):
+        written[0] = rows
+        job.progress(rows, total, f"{rows} of {total} rows")
+
+    with open(job.result_path(attendance_export_filename(compress)), 'wb') as f:
+        for chunk in stream_attendance_csv(connect_db(), where, params, compress, progress=progress):
+            f.write(chunk)
+    return f"{written[0]} attendance rows exported."
+
+@background_jobs.handler('compute_eligibility', "Eligibility recompute")
+def compute_eligibility_job(job):
+    total, shortfall = compute_eligibility(
+        progress=lambda done, parts: job.progress(done, parts, f"{done} of {parts} departments", force=True))
+    return f"Eligibility computed for {total} students. {shortfall} below {ATTENDANCE_THRESHOLD:g}%."
+
+@background_jobs.handler('repair_percentages', "Stored percentage repair")
+def repair_percentages_job(job):
+    drift = stored_percentages.check(job.db, job.cursor, repair=True,
+                                     progress=lambda line: job.progress(message=line))
+    invalidate_student_results([d['id'] for d in drift])
+    return f"{len(drift)} drifted students repaired."
+
+@background_jobs.handler('reset_attendance', "Attendance reset")
+def reset_attendance_job(job):
+    job.progress(message="Deleting", force=True)
+    message, category = reset_attendance(job.db, job.cursor, job.params['action'], job.params,
+                                         job.params.get('username'))
+    if category == 'danger':
+        raise ValueError(message)
+    return message
+
+# Jobs an admin can start from the jobs page (the others are started from their own pages)
+MAINTENANCE_JOBS = ('compute_eligibility', 'repair_percentages')
+
+@app.route('/admin/jobs')
+@login_required
+@role_required('admin')
+def admin_jobs():
+    db, cursor = get_db()
+    cursor.execute("""
+        SELECT j.*, u.username
+        FROM jobs j
+        LEFT JOIN users u ON j.created_by = u.id
+        ORDER BY j.id DESC
+        LIMIT 100
+    """)
+    jobs = cursor.fetchall()
+    cursor.execute("SELECT state, COUNT(*) as count FROM jobs GROUP BY state")
+    counts = {r['state']: r['count'] for r in cursor.fetchall()}
+    return render_template('admin_jobs.html', jobs=jobs, counts=counts, label=background_jobs.label,
+                           maintenance_jobs=MAINTENANCE_JOBS, enabled=app.config['BACKGROUND_JOBS'])
+
+@app.route('/admin/jobs/start', methods=['POST'])
+@login_required
+@role_required('admin')
+def admin_start_job():
+    job_type = request.form.get('job_type')
+    if job_type not in MAINTENANCE_JOBS:
+        flash("Unknown job.", "danger")
+        return redirect(url_for('admin_jobs'))
+    return enqueue_job(job_type, {})
+
+@app.route('/admin/jobs/<int:job_id>')
+@login_required
+@role_required('admin')
+def admin_job(job_id):
+    db, cursor = get_db()
+    job = background_jobs.fetch(cursor, job_id)
+    if not job:
+        flash("Job not found (finished jobs are removed after JOB_KEEP_DAYS).", "danger")
+        return redirect(url_for('admin_jobs'))
+    return render_template('admin_job.html', job=background_jobs.status(job))
+
+@app.route('/admin/jobs/<int:job_id>/status')
+@login_required
+@role_required('admin')
+def admin_job_status(job_id):
+    db, cursor = get_db()
+    job = background_jobs.fetch(cursor, job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(background_jobs.status(job))
+
+@app.route('/admin/jobs/<int:job_id>/download')
+@login_required
+@role_required('admin')
+def admin_job_download(job_id):
+    db, cursor = get_db()
+    job = background_jobs.fetch(cursor, job_id)
+    path = background_jobs.result_file(app.config['JOB_RESULTS_DIR'], job) if job else None
+    if not path:
+        flash("No result file: the job has not finished, was purged, or ran on a node without this JOB_RESULTS_DIR.",
+              "danger")
+        return redirect(url_for('admin_jobs'))
+    return send_file(path, as_attachment=True, download_name=job['result_file'])
+
+
+# --- SYNC API: ATTENDANCE CHANGE FEED ---
+# Downstream systems poll with the cursor from the previous page and receive only
+# the inserts, corrections and deletions logged since then (seq is the PK, so each
+# page is a short range scan no matter how large the table grows).
+#
+# seq is assigned when a row is inserted, not when its transaction commits: a
+# long transaction can still hold seq N while N+1 is already visible. A page
+# therefore ends before the first gap in seq, unless the row after the gap is
+# older than CHANGE_FEED_SETTLE_SECONDS (longer than any write transaction), in
+# which case the missing seq was rolled back or never used. Consumers keep
+# polling with the cursor they got: held-back changes arrive on a later page,
+# and changes are never skipped. They may lag by up to CHANGE_FEED_SETTLE_SECONDS.
+CHANGE_FEED_DEFAULT_PAGE = 500
+CHANGE_FEED_MAX_PAGE = 5000
+
+def change_feed_serializer():
+    return URLSafeSerializer(app.config['SECRET_KEY'], salt='attendance-change-feed')
+
+def change_feed_settled_before(cursor):
+    """Database time before which no uncommitted change can still appear."""
+    cursor.execute("SELECT CURRENT_TIMESTAMP as now")
+    now = cursor.fetchone()['now']
+    if isinstance(now, str): # SQLite returns the text form
+        now = datetime.fromisoformat(now)
+    return now - timedelta(seconds=app.config['CHANGE_FEED_SETTLE_SECONDS'])
+
+@app.route('/api/attendance/changes', methods=['GET'])
+@api_auth_required
+def api_attendance_changes():
+    db, cursor = get_db()
+    serializer = change_feed_serializer()
+
+    try:
+        limit = int(request.args.get('limit', CHANGE_FEED_DEFAULT_PAGE))
+    except ValueError:
+        limit = CHANGE_FEED_DEFAULT_PAGE
+    limit = max(1, min(limit, CHANGE_FEED_MAX_PAGE))
+
+    cursor_token = request.args.get('cursor')
+    if cursor_token == 'head':
+        # Start following from now (after an initial full export): the newest settled change,
+        # so a change still in an open transaction below it cannot be skipped
+        settled_before = change_feed_settled_before(cursor)
+        cursor.execute("SELECT seq, changed_at FROM attendance_changes ORDER BY seq DESC LIMIT %s",
+                       (CHANGE_FEED_MAX_PAGE,))
+        head = 0
+        for r in cursor.fetchall():
+            if r['changed_at'] <= settled_before:
+                head = r['seq']
+                break
+            head = r['seq'] - 1
+        return jsonify({'changes': [], 'next_cursor': serializer.dumps(int(head)), 'has_more': False})
+
+    after_seq = 0
+    if cursor_token:
+        try:
+            after_seq = int(serializer.loads(cursor_token))
+        except (BadSignature, ValueError, TypeError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+    cursor.execute("""
+        SELECT seq, attendance_id, student_id, subject_id, date, status, change_type, changed_at
+        FROM attendance_changes
+        WHERE seq > %s
+        ORDER BY seq
+        LIMIT %s
+    """, (after_seq, limit + 1))
+    rows = cursor.fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Stop before an unsettled gap: the missing seq may belong to a transaction that has not committed
+    settled_before = None
+    expected = after_seq + 1
+    for i, r in enumerate(rows):
+        if r['seq'] != expected:
+            if settled_before is None:
+                settled_before = change_feed_settled_before(cursor)
+            if r['changed_at'] > settled_before:
+                rows = rows[:i]
+                has_more = False
+                break
+        expected = r['seq'] + 1
+
+    changes = [{
+        'type': r['change_type'],
+        'attendance_id': r['attendance_id'],
+        'student_id': r['student_id'],
+        'subject_id': r['subject_id'],
+        'date': r['date'].isoformat(),
+        'status': r['status'],
+        'changed_at': r['changed_at'].isoformat() if r['changed_at'] else None,
+    } for r in rows]
+
+    next_seq = rows[-1]['seq'] if rows else after_seq
+    return jsonify({'changes': changes, 'next_cursor': serializer.dumps(int(next_seq)), 'has_more': has_more})
+
+
 # --- STUDENT ROUTES ---
+# Conditional GET: the student row, the latest change-feed seq for that student
+# (one indexed lookup), the subjects data version (codes and names on the pages) and
+# the deployed templates identify everything these pages show. Corrections, deletions,
+# override edits, subject renames and releases all change it, so an unchanged page is
+# answered with 304 before any attendance is loaded or any template is rendered.
+def _render_version():
+    # Digest of this module and every template: a release changes every student ETag
+    digest = hashlib.sha1()
+    paths = [os.path.abspath(__file__)]
+    for root, _, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        paths.extend(os.path.join(root, name) for name in files)
+    for path in sorted(paths):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+RENDER_VERSION = _render_version()
+
+def fetch_student_with_etag(cursor):
+    student = get_queries().one('student_for_user', (session['user_id'],))
+    if not student:
+        return None, None
+
+    data_seq = student.pop('data_seq')
+    subjects_version = student.pop('subjects_version')
+    version = repr((request.endpoint, sorted(student.items()), data_seq, subjects_version, RENDER_VERSION))
+    return student, hashlib.sha1(version.encode('utf-8')).hexdigest()
+
+def is_not_modified(etag):
+    # Pending flash messages must be rendered, so never short-circuit them
+    return '_flashes' not in session and request.if_none_match.contains(etag)
+
+def student_conditional_response(response, etag):
+    response = make_response(response)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
 @app.route('/student')
 @login_required
 @role_required('student')
+@replica_reads
 def student_dashboard():
     db, cursor = get_db()
     
-    # Get Student ID
-    cursor.execute("SELECT * FROM students WHERE user_id = %s", (session['user_id'],))
-    student = cursor.fetchone()
+    # Get Student ID (and the data version of everything shown on this page)
+    student, etag = fetch_student_with_etag(cursor)
     
     if not student:
         flash("Student profile not found.", "danger")
         return redirect(url_for('logout'))
+
+    if is_not_modified(etag):
+        return student_conditional_response(('', 304), etag)
         
     # Use Global Calculation Helper
-    current_percentage = calculate_student_percentage(cursor, student['id'])
+    current_percentage = student_row_percentage(cursor, student)
     
-    return render_template('student_dashboard.html', 
-                           student=student, 
-                           overall_percentage=current_percentage)
+    return student_conditional_response(render_template('student_dashboard.html', 
+                                                        student=student, 
+                                                        overall_percentage=current_percentage,
+                                                        subjects=fetch_subject_breakdown(cursor, student['id'])),
+                                        etag)
 
 @app.route('/student/attendance-history')
 @login_required
 @role_required('student')
+@replica_reads
 def student_attendance_history():
     db, cursor = get_db()
     
-    # Get Student ID
-    cursor.execute("SELECT * FROM students WHERE user_id = %s", (session['user_id'],))
-    student = cursor.fetchone()
+    # Get Student ID (and the data version of everything shown on this page)
+    student, etag = fetch_student_with_etag(cursor)
     
     if not student:
         flash("Student profile not found.", "danger")
         return redirect(url_for('logout'))
 
+    if is_not_modified(etag):
+        return student_conditional_response(('', 304), etag)
+
     # Fetch Detailed History (Date Descending)
-    cursor.execute("""
-        SELECT a.date, a.status, s.name as subject_name, s.code as subject_code
-        FROM attendance a
-        JOIN subjects s ON a.subject_id = s.id
-        WHERE a.student_id = %s
-        ORDER BY a.date DESC
-    """, (student['id'],))
-    history = cursor.fetchall()
+    if packed_storage():
+        history = packed_attendance.student_history(cursor, student['id'])
+    else:
+        history = fetch_rows("""
+            SELECT a.date, a.status, s.name as subject_name, s.code as subject_code
+            FROM attendance a
+            JOIN subjects s ON a.subject_id = s.id
+            WHERE a.student_id = %s
+            ORDER BY a.date DESC
+        """, (student['id'],))
     
-    return render_template('student_attendance_history.html', student=student, history=history)
+    return student_conditional_response(render_template('student_attendance_history.html',
+                                                        student=student, history=history), etag)
 
 # --- CLI Command to Seed Admin ---
 # Helper to create an admin user manually if DB is empty
@@ -1509,5 +2940,270 @@ def init_db_command():
     except Exception as e:
         print(f"Error: {e}")
 
+@app.cli.command('snapshot-term')
+@click.argument('name')
+@click.argument('start_date')
+@click.argument('end_date')
+@click.option('--force', is_flag=True, help='Replace an existing snapshot of this term.')
+def snapshot_term_command(name, start_date, end_date, force):
+    """Freezes every student's percentage for the term NAME (dates as YYYY-MM-DD)."""
+    try:
+        db, cursor = get_db()
+        cursor.execute("SELECT * FROM terms WHERE name = %s", (name,))
+        term = cursor.fetchone()
+
+        if term:
+            if term['snapshot_at'] is not None and not force:
+                print(f"Term '{name}' was already frozen at {term['snapshot_at']}. Use --force to replace it.")
+                return
+            cursor.execute("UPDATE terms SET start_date = %s, end_date = %s WHERE id = %s",
+                           (start_date, end_date, term['id']))
+            term_id = term['id']
+        else:
+            cursor.execute("INSERT INTO terms (name, start_date, end_date) VALUES (%s, %s, %s)",
+                           (name, start_date, end_date))
+            term_id = cursor.lastrowid
+
+        frozen = snapshot_term(db, cursor, term_id, start_date, end_date)
+        print(f"Term '{name}' frozen: {frozen} students.")
+    except Exception as e:
+        print(f"Error: {e}")
+
+@app.cli.command('compute-eligibility')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: ELIGIBILITY_WORKERS or CPU count).')
+def compute_eligibility_command(workers):
+    """Recomputes exam eligibility for every student, one department per worker."""
+    try:
+        started = time.time()
+        total, shortfall = compute_eligibility(workers)
+        print(f"Eligibility computed for {total} students in {time.time() - started:.1f}s. "
+              f"{shortfall} below {ATTENDANCE_THRESHOLD:g}%.")
+    except Exception as e:
+        print(f"Error: {e}")
+
+@app.cli.command('compile-templates')
+def compile_templates_command():
+    """Precompiles every template into TEMPLATE_BYTECODE_DIR (run at deploy, before workers start)."""
+    if not app.config['TEMPLATE_BYTECODE_DIR']:
+        print("TEMPLATE_BYTECODE_DIR is not set; nothing to do.")
+        return
+    started = time.time()
+    names = template_cache.compile_templates(app)
+    print(f"Compiled {len(names)} templates into {app.config['TEMPLATE_BYTECODE_DIR']} "
+          f"in {time.time() - started:.2f}s.")
+
+@app.cli.command('pack-attendance')
+@click.argument('before_date')
+def pack_attendance_command(before_date):
+    """Packs every session dated before BEFORE_DATE (YYYY-MM-DD) into status vectors; the rows are kept."""
+    try:
+        db, cursor = get_db()
+        cursor.execute("SELECT id, code FROM subjects ORDER BY id")
+        subjects = cursor.fetchall()
+
+        started = time.time()
+        total_sessions = 0
+        total_periods = 0
+        for sub in subjects:
+            sessions, periods = packed_attendance.pack_subject(db, cursor, sub['id'], before_date)
+            if sessions:
+                print(f"{sub['code']}: {sessions} sessions, {periods} student-periods")
+            total_sessions += sessions
+            total_periods += periods
+        print(f"Packed {total_sessions} sessions ({total_periods} student-periods) in {time.time() - started:.1f}s.")
+        print("Rows were kept; the packed sessions are now also served from status vectors.")
+    except Exception as e:
+        print(f"Error: {e}")
+
+@app.cli.command('attendance-storage-report')
+@click.option('--sample', type=int, default=200, help='Students to time per-student reads on.')
+def attendance_storage_report_command(sample):
+    """Shows table sizes and per-student read latency of the row and packed layouts (packing keeps the rows)."""
+    try:
+        db, cursor = get_db()
+        cursor.execute("SELECT id FROM students ORDER BY RAND() LIMIT %s", (sample,))
+        student_ids = [r['id'] for r in cursor.fetchall()]
+
+        report = packed_attendance.storage_report(cursor, app.config['DB_NAME'], student_ids)
+        cursor.execute("SELECT COUNT(*) as periods FROM attendance")
+        row_periods = cursor.fetchone()['periods']
+        cursor.execute("SELECT COALESCE(SUM(r.student_count), 0) as periods FROM attendance_sessions se "
+                       "JOIN attendance_rosters r ON se.roster_id = r.id")
+        packed_periods = int(cursor.fetchone()['periods'])
+
+        sizes = report['sizes']
+        row_bytes = sizes.get('attendance', {}).get('total_bytes') or 0
+        packed_bytes = sum(sizes.get(t, {}).get('total_bytes') or 0
+                           for t in ('attendance_sessions', 'attendance_rosters', 'attendance_roster_members'))
+
+        print(f"{'layout':8} {'student-periods':>16} {'bytes':>14} {'bytes/period':>13}")
+        print(f"{'rows':8} {row_periods:16d} {row_bytes:14d} {row_bytes / max(1, row_periods):13.1f}")
+        print(f"{'packed':8} {packed_periods:16d} {packed_bytes:14d} {packed_bytes / max(1, packed_periods):13.1f}")
+        print(f"Packing is additive: the rows are kept, so the packed tables add {packed_bytes} bytes "
+              f"to the {row_bytes} of the attendance table.")
+        print(f"Per-student counts over {len(student_ids)} students: "
+              f"rows {report['row_read_ms']:.2f} ms, packed {report['packed_read_ms']:.2f} ms")
+    except Exception as e:
+        print(f"Error: {e}")
+
+@app.cli.command('replica-status')
+def replica_status_command():
+    """Shows each configured read replica's lag and whether pages are routed to it."""
+    if not replica_router:
+        print("No replicas configured (MYSQL_REPLICAS is empty); all traffic uses the primary.")
+        return
+    for host, port, lag, error in replica_router.status(connect_replica):
+        if error:
+            print(f"{host}:{port}  unavailable ({error})")
+        else:
+            state = "in use" if replica_router.usable(lag, None) else \
+                f"skipped (over {replica_router.max_lag}s)"
+            print(f"{host}:{port}  {lag}s behind  {state}")
+
+def connect_db_retrying():
+    # Long-running CLI processes wait out database restarts instead of exiting
+    while True:
+        try:
+            db = connect_db()
+            return db, db.cursor(dictionary=True)
+        except mysql.connector.Error as err:
+            print(f"Database unavailable ({err}); retrying in 1s.")
+            time.sleep(1)
+
+@app.cli.command('attendance-writer')
+@click.option('--once', is_flag=True, help='Write what is queued now, then exit.')
+def attendance_writer_command(once):
+    """Writes queued mark submissions in group commits (run one per node with WRITE_QUEUE=1)."""
+    if not attendance_queue:
+        print("WRITE_QUEUE is off: the web workers write submissions directly.")
+        return
+
+    db, cursor = connect_db_retrying()
+    interrupted = attendance_queue.writing()
+    settled = write_queue.settle_interrupted(db, cursor, attendance_queue, fetch_marked_dates)
+    invalidate_student_results({row[0] for sub in interrupted for row in sub['rows']})
+    if settled:
+        print(f"{settled} submissions of an interrupted batch were already committed.")
+
+    idle = app.config['WRITE_QUEUE_IDLE_MS'] / 1000.0
+    purged_at = 0
+    while True:
+        batch = attendance_queue.claim(app.config['WRITE_QUEUE_BATCH'])
+        if not batch:
+            if once:
+                break
+            if time.time() - purged_at > 3600:
+                attendance_queue.purge(older_than=86400)
+                purged_at = time.time()
+            time.sleep(idle)
+            continue
+
+        started = time.perf_counter()
+        try:
+            results = write_queue.write_batch(db, cursor, batch, fetch_marked_dates)
+        except mysql.connector.Error as err:
+            attendance_queue.finish([(sub['id'], 'pending', None) for sub in batch])
+            print(f"Batch of {len(batch)} put back in the queue: {err}")
+            db, cursor = connect_db_retrying()
+            continue
+        # Before the submitters are answered: their next page must not show cached numbers
+        committed = {sid for sid, state, _ in results if state == 'committed'}
+        invalidate_student_results({row[0] for sub in batch if sub['id'] in committed for row in sub['rows']})
+        attendance_queue.finish(results)
+        failed = sum(1 for _, state, _ in results if state == 'failed')
+        print(f"Committed {len(batch) - failed} submissions ({sum(len(sub['rows']) for sub in batch)} rows, "
+              f"{failed} rejected) in {(time.perf_counter() - started) * 1000.0:.1f} ms.")
+
+@app.cli.command('result-cache')
+@click.option('--clear', is_flag=True, help='Drop every cached value first.')
+def result_cache_command(clear):
+    """Shows the shared result cache's size and hit ratio (RESULT_CACHE_PATH)."""
+    if not student_results:
+        print("RESULT_CACHE is off.")
+        return
+    if clear:
+        student_results.clear()
+        print("Cleared.")
+    stats = student_results.stats()
+    print(f"{stats['path']}: {stats['entries']} / {stats['slots']} entries, {stats['bytes'] / 1024:.1f} KB of values, "
+          f"{stats['size_bytes'] / (1 << 20):.1f} MB file")
+    print(f"hit ratio {stats['hit_ratio'] * 100:.1f}% ({stats['hits']} hits, {stats['misses']} misses), "
+          f"{stats['stores']} stores, {stats['evictions']} evictions, {stats['invalidations']} invalidations, "
+          f"{stats['too_large']} too large")
+
+@app.cli.command('worker')
+@click.option('--workers', type=int, default=None, help='Jobs run at once (default JOB_WORKERS).')
+@click.option('--once', is_flag=True, help='Run what is queued now, then exit.')
+def worker_command(workers, once):
+    """Runs queued background jobs (exports, recomputes, large deletes) in a process pool."""
+    worker = background_jobs.Worker(connect_db_retrying, run_background_job, app.config['JOB_RESULTS_DIR'],
+                                    workers=workers or app.config['JOB_WORKERS'],
+                                    retry_delay=app.config['JOB_RETRY_DELAY'],
+                                    stale_seconds=app.config['JOB_STALE_SECONDS'],
+                                    keep_days=app.config['JOB_KEEP_DAYS'])
+    print(f"Worker {worker.name}: {worker.workers} processes, results in {worker.results_dir}.")
+    worker.serve(once=once)
+
+@app.cli.command('check-percentages')
+@click.option('--repair', is_flag=True, help='Correct the drifted students as well.')
+def check_percentages_command(repair):
+    """Recounts every student and compares with the stored percentage columns (stored_percentages.py)."""
+    try:
+        db = connect_db()
+        cursor = db.cursor(dictionary=True)
+        drift = stored_percentages.check(db, cursor, repair=repair)
+        for d in drift:
+            print(f"{d['register_no']}: stored {d['stored'][0]}/{d['stored'][1]} = {d['stored'][2]:.2f}%, "
+                  f"actual {d['actual'][0]}/{d['actual'][1]} = {d['actual'][2]:.2f}%")
+        if drift and repair:
+            invalidate_student_results([d['id'] for d in drift])
+        print(f"{len(drift)} students drifted" + (", repaired." if repair and drift else "."))
+        db.close()
+    except Exception as e:
+        print(f"Error: {e}")
+
+@app.cli.command('seed-synthetic')
+@click.option('--size', type=click.Choice(sorted(seed_synthetic.PRESETS)), default='small',
+              help='small ~150k, medium ~1.7M, large ~50M attendance rows.')
+@click.option('--seed', 'seed_value', type=int, default=1, help='Random seed; same seed and sizes, same data.')
+@click.option('--departments', type=int, default=None)
+@click.option('--batches', type=int, default=None, help='Batches per (department, year).')
+@click.option('--students', type=int, default=None, help='Students per class.')
+@click.option('--subjects', type=int, default=None, help='Subjects per class.')
+@click.option('--periods', type=int, default=None, help='Periods per class per day.')
+@click.option('--days', type=int, default=None, help='School days of attendance.')
+@click.option('--end-date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Last school day (default today).')
+@click.option('--prefix', default='syn', help='Prefix of generated usernames and department codes.')
+@click.option('--password', default='synthetic', help='Password of every generated account.')
+@click.option('--out', 'out_dir', default='synthetic-data', help='Directory for the CSV files.')
+@click.option('--no-load', is_flag=True, help='Only write the CSV files.')
+def seed_synthetic_command(size, seed_value, departments, batches, students, subjects, periods, days,
+                           end_date, prefix, password, out_dir, no_load):
+    """Generates a synthetic institution as CSV files and bulk-loads it."""
+    try:
+        backend = app.config['DB_BACKEND']
+        db = connect_db(allow_local_infile=True) if backend == 'mysql' else connect_db()
+        cursor = db.cursor(dictionary=True)
+        cursor.execute("SELECT MAX(id) as id FROM students")
+        last_student_id = cursor.fetchone()['id'] or 0
+        started = time.time()
+        counts, method = seed_synthetic.seed(
+            db, cursor, backend, out_dir, seed_value, size, generate_password_hash(password), password,
+            prefix=prefix, end_date=end_date.date() if end_date else None, generate_only=no_load,
+            departments=departments, batches=batches, students=students, subjects=subjects,
+            periods=periods, days=days)
+        if method:
+            bump_data_version(cursor, 'departments', 'staff', 'subjects', 'students')
+            # The load runs without the attendance triggers: fill the new students' stored counts
+            stored_percentages.check(db, cursor, repair=True, first_id=last_student_id + 1,
+                                     chunk=10000, progress=lambda line: None)
+        print(", ".join(f"{count} {table}" for table, count in counts.items()))
+        print(f"{'Loaded with ' + method if method else 'Written'} in {time.time() - started:.1f}s. "
+              f"Accounts for loadtest.py: {os.path.join(out_dir, 'accounts.csv')}")
+        db.close()
+    except Exception as e:
+        print(f"Error: {e}")
+
 if __name__ == '__main__':
     app.run()
@@ -0,0 +1,46 @@
+import math
+
+# Attendance calculation rules shared by the Flask app (app.py) and the
+# async read-only API tier (api_async.py). Keep these free of any database
+# driver so both stacks compute exactly the same numbers.
+
+# Minimum effective percentage for exam eligibility (red below this in the overview)
+ATTENDANCE_THRESHOLD = 75.0
+
+# Per-student period counts (%s = student id). Works with any DB-API driver using %s.
+STUDENT_COUNTS_QUERY = """
+    SELECT COUNT(*) as total_periods,
+           COALESCE(SUM(status IN ('Present', 'On Duty')), 0) as attended_periods
+    FROM attendance
+    WHERE student_id = %s
+"""
+
+def percentage_from_counts(attended_periods, total_periods):
+    """
+    Period-wise percentage: attended (Present/On Duty) over total periods.
+    - No records: 0% (Strict Rule)
+    - Rounded to 2 decimal places, clamped 0-100%
+    """
+    if not total_periods:
+        return 0.0
+
+    current_percentage = round((attended_periods / total_periods) * 100.0, 2)
+
+    if current_percentage > 100: current_percentage = 100.0
+    if current_percentage < 0: current_percentage = 0.0
+
+    return current_percentage
+
+def effective_percentage(override_percentage, attended_periods, total_periods):
+    # An admin override always wins over the calculated value
+    if override_percentage is not None:
+        return float(override_percentage)
+    return percentage_from_counts(attended_periods, total_periods)
+
+def periods_needed_for_threshold(attended_periods, total_periods, threshold=ATTENDANCE_THRESHOLD):
+    """Consecutive attended periods required to reach the threshold (0 if already there)."""
+    if percentage_from_counts(attended_periods, total_periods) >= threshold:
+        return 0
+    # (attended + x) / (total + x) >= threshold / 100
+    needed = (threshold * total_periods - 100.0 * attended_periods) / (100.0 - threshold)
+    return max(0, math.ceil(needed - 1e-9))
@@ -0,0 +1,330 @@
+"""
+Background jobs for the work that outlives a gunicorn request (BACKGROUND_JOBS=1):
+attendance exports, eligibility and stored-percentage recomputes, large deletes.
+
+    BACKGROUND_JOBS=1 gunicorn ...   # admin pages enqueue and poll /admin/jobs/<id>
+    flask worker                     # JOB_WORKERS pool processes; one or more per node
+
+A job is a row in `jobs` (migration 11): queued -> running -> done | failed.
+Workers claim with a conditional UPDATE (... WHERE state = 'queued'), so two
+workers never run the same job. The handler runs in a pool process with its
+own connection and writes its progress into the row; the worker process
+refreshes heartbeat_at of the jobs it runs.
+
+A handler that raises is queued again after JOB_RETRY_DELAY * 2^(attempt - 1)
+seconds, until it has run max_attempts times. A job whose worker died (no
+heartbeat for JOB_STALE_SECONDS) is queued again by any live worker, which
+also counts as an attempt, so handlers must be safe to run twice.
+
+Result files go to JOB_RESULTS_DIR/<job id>/ on the worker's node and are
+served from the same path by /admin/jobs/<id>/download, so the web and worker
+processes need that directory in common (same node or a shared mount).
+Finished jobs and their files are purged after JOB_KEEP_DAYS.
+
+Handlers are registered in app.py:
+
+    @background_jobs.handler('attendance_export', "Attendance export")
+    def attendance_export_job(job):
+        job.progress(0, total)
+        with open(job.result_path("export.csv"), "wb") as f: ...
+        return "1200 rows exported"
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+import mysql.connector
+
+PROGRESS_INTERVAL = 1.0 # Seconds between progress writes of one job
+POLL_INTERVAL = 1.0 # Seconds between queue polls of an idle worker
+PURGE_INTERVAL = 3600
+
+HANDLERS = {}
+
+def handler(job_type, label):
+    """Registers fn(job) -> result message as the handler of job_type."""
+    def register(fn):
+        HANDLERS[job_type] = (fn, label)
+        return fn
+    return register
+
+def label(job_type):
+    return HANDLERS[job_type][1] if job_type in HANDLERS else job_type
+
+def enqueue(cursor, job_type, params, created_by=None, max_attempts=3):
+    """Inserts a queued job and returns its id. params must be JSON serializable."""
+    if job_type not in HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+    now = datetime.now()
+    cursor.execute("""
+        INSERT INTO jobs (job_type, params, max_attempts, run_after, created_by, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, (job_type, json.dumps(params), max_attempts, now, created_by, now))
+    return cursor.lastrowid
+
+def fetch(cursor, job_id):
+    cursor.execute("SELECT * FROM jobs WHERE id = %s", (job_id,))
+    return cursor.fetchone()
+
+def status(job):
+    """The JSON the job pages poll."""
+    return {
+        'id': job['id'],
+        'type': label(job['job_type']),
+        'state': job['state'],
+        'attempts': job['attempts'],
+        'max_attempts': job['max_attempts'],
+        'progress_done': job['progress_done'],
+        'progress_total': job['progress_total'],
+        'progress_message': job['progress_message'],
+        'result_message': job['result_message'],
+        'has_result': bool(job['result_file']) and job['state'] == 'done',
+        'error': job['error'],
+        'created_at': str(job['created_at']),
+        'started_at': str(job['started_at']) if job['started_at'] else None,
+        'finished_at': str(job['finished_at']) if job['finished_at'] else None,
+    }
+
+def result_file(results_dir, job):
+    """Absolute path of a done job's result file, or None."""
+    if job['state'] != 'done' or not job['result_file']:
+        return None
+    path = os.path.join(results_dir, str(job['id']), job['result_file'])
+    return path if os.path.isfile(path) else None
+
+# --- Inside a pool process ---
+
+class Job:
+    """What a handler gets: its params, progress reporting and a place for its result file."""
+
+    def __init__(self, db, cursor, row, results_dir):
+        self.db = db
+        self.cursor = cursor
+        self.id = row['id']
+        self.params = json.loads(row['params'])
+        self.attempt = row['attempts']
+        self.results_dir = results_dir
+        self.result_file = None
+        self._reported_at = 0.0
+
+    def progress(self, done=None, total=None, message=None, force=False):
+        """Records progress (throttled to one write per PROGRESS_INTERVAL unless force)."""
+        now = time.monotonic()
+        if not force and now - self._reported_at < PROGRESS_INTERVAL:
+            return
+        self._reported_at = now
+        self.cursor.execute("""
+            UPDATE jobs SET progress_done = %s, progress_total = %s, progress_message = %s
+            WHERE id = %s
+        """, (done, total, message[:255] if message else None, self.id))
+
+    def result_path(self, filename):
+        """Path to write the job's result file to (replaces a previous attempt's file)."""
+        directory = os.path.join(self.results_dir, str(self.id))
+        os.makedirs(directory, exist_ok=True)
+        self.result_file = filename
+        return os.path.join(directory, filename)
+
+def run(db, job_id, results_dir):
+    """
+    Runs one claimed job's handler; called in a pool process with its own
+    connection, which it closes. Returns (result_file, result_message);
+    exceptions propagate to the worker, which records the failure.
+    """
+    cursor = db.cursor(dictionary=True)
+    try:
+        row = fetch(cursor, job_id)
+        fn, _ = HANDLERS[row['job_type']]
+        job = Job(db, cursor, row, results_dir)
+        message = fn(job)
+        return job.result_file, message
+    finally:
+        cursor.close()
+        db.close()
+
+# --- Worker process ---
+
+class Worker:
+    def __init__(self, connect, execute, results_dir, workers, retry_delay, stale_seconds, keep_days,
+                 log=print):
+        self.connect = connect # () -> (db, cursor), retries until the database is up
+        self.execute = execute # picklable top-level fn(job_id) -> (result_file, message)
+        self.results_dir = results_dir
+        self.workers = workers
+        self.retry_delay = retry_delay
+        self.stale_seconds = stale_seconds
+        self.keep_days = keep_days
+        self.log = log
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.running = {} # future -> job id
+        self.db, self.cursor = connect()
+
+    def _pool(self):
+        # 'spawn' so children never inherit the worker's open MySQL sockets
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def claim(self, limit):
+        now = datetime.now()
+        self.cursor.execute("""
+            SELECT id FROM jobs WHERE state = 'queued' AND run_after <= %s
+            ORDER BY id LIMIT %s
+        """, (now, limit))
+        claimed = []
+        for r in self.cursor.fetchall():
+            self.cursor.execute("""
+                UPDATE jobs
+                SET state = 'running', worker = %s, attempts = attempts + 1, started_at = %s, heartbeat_at = %s,
+                    progress_done = NULL, progress_total = NULL, progress_message = NULL, error = NULL
+                WHERE id = %s AND state = 'queued'
+            """, (self.name, now, now, r['id']))
+            if self.cursor.rowcount == 1: # Another worker got it first otherwise
+                claimed.append(r['id'])
+        return claimed
+
+    def heartbeat(self):
+        if self.running:
+            self.cursor.execute("UPDATE jobs SET heartbeat_at = %s WHERE worker = %s AND state = 'running'",
+                                (datetime.now(), self.name))
+
+    def finish(self, job_id, result_file, message):
+        self.cursor.execute("""
+            UPDATE jobs
+            SET state = 'done', finished_at = %s, result_file = %s, result_message = %s,
+                progress_done = progress_total
+            WHERE id = %s AND worker = %s
+        """, (datetime.now(), result_file, (message or '')[:255] or None, job_id, self.name))
+
+    def fail(self, job_id, error):
+        """Queues the job again with backoff, or marks it failed after its last attempt."""
+        job = fetch(self.cursor, job_id)
+        now = datetime.now()
+        if job['attempts'] < job['max_attempts']:
+            delay = self.retry_delay * 2 ** (job['attempts'] - 1)
+            self.cursor.execute("""
+                UPDATE jobs SET state = 'queued', worker = NULL, run_after = %s, error = %s
+                WHERE id = %s AND worker = %s
+            """, (now + timedelta(seconds=delay), error, job_id, self.name))
+            self.log(f"Job {job_id} failed (attempt {job['attempts']}), retrying in {delay:g}s: {error}")
+        else:
+            self.cursor.execute("""
+                UPDATE jobs SET state = 'failed', finished_at = %s, error = %s
+                WHERE id = %s AND worker = %s
+            """, (now, error, job_id, self.name))
+            self.log(f"Job {job_id} failed after {job['attempts']} attempts: {error}")
+
+    def requeue_stale(self):
+        """Jobs of workers that stopped heartbeating: queued again, or failed after their last attempt."""
+        now = datetime.now()
+        cutoff = now - timedelta(seconds=self.stale_seconds)
+        self.cursor.execute("""
+            UPDATE jobs SET state = 'failed', finished_at = %s, error = 'Worker stopped responding'
+            WHERE state = 'running' AND heartbeat_at < %s AND attempts >= max_attempts
+        """, (now, cutoff))
+        failed = self.cursor.rowcount
+        self.cursor.execute("""
+            UPDATE jobs SET state = 'queued', worker = NULL, run_after = %s, error = 'Worker stopped responding'
+            WHERE state = 'running' AND heartbeat_at < %s
+        """, (now, cutoff))
+        if failed or self.cursor.rowcount:
+            self.log(f"{self.cursor.rowcount} jobs of unresponsive workers queued again, {failed} failed.")
+
+    def release(self):
+        """On shutdown: the jobs still running here go back to the queue without using up an attempt."""
+        self.cursor.execute("""
+            UPDATE jobs SET state = 'queued', worker = NULL, attempts = attempts - 1, run_after = %s
+            WHERE worker = %s AND state = 'running'
+        """, (datetime.now(), self.name))
+        return self.cursor.rowcount
+
+    def purge(self):
+        cutoff = datetime.now() - timedelta(days=self.keep_days)
+        self.cursor.execute("SELECT id FROM jobs WHERE state IN ('done', 'failed') AND finished_at < %s",
+                            (cutoff,))
+        ids = [r['id'] for r in self.cursor.fetchall()]
+        for job_id in ids:
+            shutil.rmtree(os.path.join(self.results_dir, str(job_id)), ignore_errors=True)
+        for i in range(0, len(ids), 1000):
+            chunk = ids[i:i + 1000]
+            self.cursor.execute(f"DELETE FROM jobs WHERE id IN ({','.join(['%s'] * len(chunk))})", tuple(chunk))
+        return len(ids)
+
+    def collect(self, futures):
+        """Records finished jobs; True if the pool broke (a pool process was killed or ran out of memory)."""
+        broken = False
+        for future in futures:
+            job_id = self.running.pop(future)
+            try:
+                result_file, message = future.result()
+            except BrokenProcessPool as e:
+                broken = True
+                self.fail(job_id, f"Pool process died: {e}")
+                continue
+            except Exception as e:
+                self.fail(job_id, f"{type(e).__name__}: {e}")
+                continue
+            self.finish(job_id, result_file, message)
+            self.log(f"Job {job_id} done: {message}")
+        return broken
+
+    @staticmethod
+    def _terminate(pool):
+        # No public way to stop running pool processes before Python 3.14 (terminate_workers)
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    def serve(self, once=False):
+        """Runs jobs until interrupted (SIGINT/SIGTERM), or with once=True until the queue is empty."""
+        def stop(signum, frame):
+            raise KeyboardInterrupt
+        signal.signal(signal.SIGTERM, stop)
+
+        pool = self._pool()
+        heartbeat_every = max(1.0, self.stale_seconds / 4.0)
+        beat_at = purged_at = 0.0
+        try:
+            while True:
+                try:
+                    now = time.monotonic()
+                    if now - beat_at >= heartbeat_every:
+                        self.heartbeat()
+                        self.requeue_stale()
+                        beat_at = now
+                    if now - purged_at >= PURGE_INTERVAL:
+                        purged = self.purge()
+                        if purged:
+                            self.log(f"Purged {purged} finished jobs.")
+                        purged_at = now
+
+                    free = self.workers - len(self.running)
+                    for job_id in (self.claim(free) if free > 0 else []):
+                        self.running[pool.submit(self.execute, job_id)] = job_id
+                        self.log(f"Job {job_id} started.")
+
+                    if not self.running:
+                        if once:
+                            break
+                        time.sleep(POLL_INTERVAL)
+                        continue
+                    done, _ = wait(list(self.running), timeout=min(POLL_INTERVAL, heartbeat_every),
+                                   return_when=FIRST_COMPLETED)
+                    if self.collect(done):
+                        # Every job of a broken pool fails; start a fresh pool for the retries
+                        self.collect(list(self.running))
+                        self._terminate(pool)
+                        pool = self._pool()
+                except mysql.connector.Error as err:
+                    self.log(f"Database error ({err}); reconnecting.")
+                    self.db, self.cursor = self.connect()
+        except KeyboardInterrupt:
+            self._terminate(pool)
+            self.log(f"Stopped; {self.release()} running jobs put back in the queue.")
+        else:
+            pool.shutdown(wait=True)
@@ -0,0 +1,87 @@
+"""
+Text protocol vs server-side prepared statements for the repeated statements
+in queries.py, on one connection (what a request or a pooled connection sees):
+
+    python bench_prepared_statements.py --iterations 2000
+
+For each statement, runs the same parameter mix both ways and prints the mean and
+p95 round trip per execution, plus how often the server parsed the statement
+(Com_select for text, Com_stmt_prepare for prepared) from SHOW SESSION STATUS.
+"""
+import argparse
+import itertools
+import time
+
+import mysql.connector
+from config import Config
+from queries import Queries, STATEMENTS
+
+def connect():
+    return mysql.connector.connect(
+        host=Config.DB_HOST,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        database=Config.DB_NAME,
+        port=Config.DB_PORT,
+        autocommit=True
+    )
+
+def sample_params(cursor, limit):
+    """Real parameter tuples per statement, so both protocols read the same rows."""
+    def rows(query, *args):
+        cursor.execute(query + " LIMIT %s", args + (limit,))
+        return [tuple(r) for r in cursor.fetchall()]
+
+    students = rows("SELECT id FROM students ORDER BY id")
+    classes = rows("SELECT DISTINCT department_id, current_year, batch FROM students")
+    return {
+        'staff_id_for_user': rows("SELECT user_id FROM staff WHERE user_id IS NOT NULL"),
+        'staff_subject': rows("SELECT id, staff_id FROM subjects WHERE staff_id IS NOT NULL"),
+        'class_students': classes,
+        'class_roster_ids': classes,
+        'student_override': students,
+        'student_counts': students,
+        'student_for_user': rows("SELECT user_id FROM students"),
+    }
+
+def session_counters(cursor):
+    cursor.execute("SHOW SESSION STATUS WHERE Variable_name IN ('Com_select', 'Com_stmt_prepare', 'Com_stmt_execute')")
+    return {name: int(value) for name, value in cursor.fetchall()}
+
+def measure(db, counter_cursor, name, params, iterations, prepared):
+    repo = Queries(db, prepared=prepared)
+    before = session_counters(counter_cursor)
+    timings = []
+    for args in itertools.islice(itertools.cycle(params), iterations):
+        started = time.perf_counter()
+        repo.all(name, args)
+        timings.append((time.perf_counter() - started) * 1000.0)
+    after = session_counters(counter_cursor)
+    timings.sort()
+    parses = after['Com_stmt_prepare'] - before['Com_stmt_prepare'] if prepared else \
+        after['Com_select'] - before['Com_select']
+    return sum(timings) / len(timings), timings[int(len(timings) * 0.95) - 1], parses
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000, help='Executions per statement and protocol.')
+    parser.add_argument('--sample', type=int, default=200, help='Distinct parameter tuples per statement.')
+    args = parser.parse_args()
+
+    db = connect()
+    cursor = db.cursor()
+    params = sample_params(cursor, args.sample)
+
+    print(f"{'statement':20} {'text ms':>9} {'p95':>7} {'parses':>7}   {'prepared ms':>11} {'p95':>7} {'parses':>7}   {'saved':>6}")
+    for name in STATEMENTS:
+        if not params.get(name):
+            continue
+        text = measure(db, cursor, name, params[name], args.iterations, prepared=False)
+        prepared = measure(db, cursor, name, params[name], args.iterations, prepared=True)
+        saved = (1 - prepared[0] / text[0]) * 100 if text[0] else 0.0
+        print(f"{name:20} {text[0]:9.3f} {text[1]:7.3f} {text[2]:7d}   "
+              f"{prepared[0]:11.3f} {prepared[1]:7.3f} {prepared[2]:7d}   {saved:5.1f}%")
+    db.close()
+
+if __name__ == "__main__":
+    main()
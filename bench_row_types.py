@@ -0,0 +1,110 @@
+"""
+Dictionary-cursor rows vs compact rows (compact_rows.py) on large result sets.
+
+    python bench_row_types.py                 # 100k rows in a scratch SQLite database
+    python bench_row_types.py --mysql         # the configured MySQL database (existing data)
+
+Runs the student-history shaped query (attendance JOIN subjects) both ways and
+prints, per row type: fetch+build time, memory retained by the result list and
+peak memory while fetching (tracemalloc), a full gc.collect() with the rows
+alive, and one `{{ row.subject_name }}` lookup per row through Jinja's getattr,
+as a template loop does it.
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from jinja2 import Environment
+
+import compact_rows
+
+QUERY = """
+    SELECT a.id, a.student_id, a.date, a.status, a.marked_at, s.name as subject_name, s.code as subject_code
+    FROM attendance a
+    JOIN subjects s ON a.subject_id = s.id
+    LIMIT %s
+"""
+
+def sqlite_database(rows):
+    import sqlite_backend
+    path = os.path.join(tempfile.mkdtemp(), 'bench_rows.db')
+    db = sqlite_backend.connect(path)
+    cursor = db.cursor()
+    cursor.execute("INSERT INTO departments (name, code) VALUES ('Bench', 'BEN')")
+    dept_id = cursor.lastrowid
+    cursor.execute("INSERT INTO subjects (code, name, department_id, year, batch) "
+                   "VALUES ('BEN101', 'Benchmarking', %s, 1, 'I Batch')", (dept_id,))
+    subject_id = cursor.lastrowid
+
+    students = 500
+    days = -(-rows // students)
+    student_ids = []
+    for i in range(students):
+        cursor.execute("INSERT INTO users (username, password_hash, role) VALUES (%s, 'x', 'student')", (f"bench{i}",))
+        cursor.execute("INSERT INTO students (user_id, register_no, name, department_id, current_year, batch) "
+                       "VALUES (%s, %s, %s, %s, 1, 'I Batch')", (cursor.lastrowid, f"B{i:05d}", f"Student {i}", dept_id))
+        student_ids.append(cursor.lastrowid)
+
+    start = date(2024, 1, 1)
+    db.start_transaction()
+    cursor.executemany("INSERT INTO attendance (student_id, subject_id, date, status) VALUES (%s, %s, %s, %s)",
+                       [(sid, subject_id, start + timedelta(days=d), 'Present' if (sid + d) % 5 else 'Absent')
+                        for d in range(days) for sid in student_ids][:rows])
+    db.commit()
+    return db
+
+def mysql_database():
+    import mysql.connector
+    from config import Config
+    return mysql.connector.connect(host=Config.DB_HOST, user=Config.DB_USER, password=Config.DB_PASSWORD,
+                                   database=Config.DB_NAME, port=Config.DB_PORT, autocommit=True)
+
+def dict_rows(db, query, params):
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def measure(label, fetch, db, rows):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fetch(db, QUERY, (rows,))
+    fetch_ms = (time.perf_counter() - started) * 1000.0
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    gc.collect()
+    gc_ms = (time.perf_counter() - started) * 1000.0
+
+    lookup = Environment().getattr
+    started = time.perf_counter()
+    for row in result:
+        lookup(row, 'subject_name')
+    read_ms = (time.perf_counter() - started) * 1000.0
+
+    print(f"{label:8} {len(result):9d} {fetch_ms:10.1f} {retained / 2**20:11.1f} {peak / 2**20:9.1f} "
+          f"{gc_ms:8.1f} {read_ms:8.1f}")
+    del result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--mysql', action='store_true', help='Use the configured MySQL database instead of SQLite.')
+    args = parser.parse_args()
+
+    db = mysql_database() if args.mysql else sqlite_database(args.rows)
+    print(f"{'rows':8} {'count':>9} {'fetch ms':>10} {'retained MB':>11} {'peak MB':>9} {'gc ms':>8} {'read ms':>8}")
+    for _ in range(2): # Second round runs with warm caches
+        measure('dict', dict_rows, db, args.rows)
+        measure('compact', compact_rows.fetchall, db, args.rows)
+    db.close()
+
+if __name__ == "__main__":
+    main()
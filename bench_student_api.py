@@ -0,0 +1,96 @@
+"""
+Throughput comparison: sync student dashboard vs the async JSON API tier.
+
+Logs in once as a student against the sync app, then hammers both paths with the
+same session cookie and the same concurrency:
+
+    gunicorn --worker-class gthread --threads 4 -w 4 app:app --bind :8000
+    hypercorn -w 4 api_async:app --bind :8001
+    python bench_student_api.py --user 21CS001 --password secret --concurrency 200 --requests 5000
+
+Prints requests/second, p50/p95/p99 latency and errors for each path.
+"""
+import argparse
+import http.cookiejar
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+def login(base_url, username, password):
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    data = urllib.parse.urlencode({'username': username, 'password': password}).encode()
+    opener.open(f"{base_url}/login", data=data, timeout=30)
+    for cookie in jar:
+        if cookie.name == 'session':
+            return cookie.value
+    raise SystemExit("Login failed: no session cookie returned.")
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run(url, cookie, total, concurrency):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        req = urllib.request.Request(url, headers={'Cookie': f'session={cookie}'})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                resp.read()
+                ok = resp.status == 200
+        except (urllib.error.URLError, OSError):
+            ok = False
+        elapsed = (time.perf_counter() - started) * 1000.0
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'rps': total / wall if wall else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'errors': errors,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sync-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--async-url', default='http://127.0.0.1:8001')
+    parser.add_argument('--user', required=True, help='Student register number')
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    args = parser.parse_args()
+
+    cookie = login(args.sync_url, args.user, args.password)
+
+    targets = [
+        ('sync  /student', f"{args.sync_url}/student"),
+        ('async /api/student/percentage', f"{args.async_url}/api/student/percentage"),
+    ]
+    print(f"{'path':32} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for label, url in targets:
+        r = run(url, cookie, args.requests, args.concurrency)
+        print(f"{label:32} {r['rps']:9.1f} {r['p50']:9.1f} {r['p95']:9.1f} {r['p99']:9.1f} {r['errors']:7d}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Peak mark-submission throughput: one transaction per submission (direct) vs
+the write-behind queue with group commits (write_queue.py).
+
+    python bench_write_queue.py --submitters 64 --submissions 20
+    python bench_write_queue.py --batch 50      # smaller group commits
+
+Each submitter thread plays one staff member: it submits its class's
+attendance (one subject, the whole roster) for a new date, again and again,
+as fast as it can. Direct mode inserts through insert_attendance() on the
+submitter's own connection. Queued mode enqueues and waits for the outcome,
+with one writer thread doing claim / write_batch / finish like
+`flask attendance-writer`. Prints submissions/s, rows/s and the p50/p95 time
+until a submitter has its answer, for each mode.
+
+Uses the configured database (DB_BACKEND, MYSQL*) and its existing subjects
+and students (e.g. from `flask seed-synthetic`). Dates from 2099-01-01 on
+are written and deleted again afterwards, change feed entries included.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import mysql.connector
+
+import write_queue
+from app import app, connect_db, fetch_marked_dates, insert_attendance
+
+FIRST_DATE = date(2099, 1, 1)
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))]
+
+def load_classes(count):
+    """[(subject_id, [student_id, ...])] for up to `count` subjects that have students."""
+    db = connect_db()
+    cursor = db.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT sub.id as subject_id, st.id as student_id
+        FROM subjects sub
+        JOIN students st ON st.department_id = sub.department_id
+             AND st.current_year = sub.year AND st.batch = sub.batch
+        ORDER BY sub.id, st.id
+    """)
+    classes = {}
+    for row in cursor.fetchall():
+        if row['subject_id'] not in classes and len(classes) == count:
+            continue
+        classes.setdefault(row['subject_id'], []).append(row['student_id'])
+    db.close()
+    return list(classes.items())
+
+def cleanup():
+    db = connect_db()
+    cursor = db.cursor()
+    cursor.execute("DELETE FROM attendance WHERE date >= %s", (FIRST_DATE,))
+    cursor.execute("DELETE FROM attendance_changes WHERE date >= %s", (FIRST_DATE,))
+    db.close()
+
+def run(mode, classes, submissions, queue=None, batch=None):
+    latencies, errors, rows_written = [], [0], [0]
+    lock = threading.Lock()
+
+    def submitter(index, subject_id, student_ids):
+        db = connect_db() if mode == 'direct' else None
+        cursor = db.cursor(dictionary=True) if db else None
+        for n in range(submissions):
+            day = (FIRST_DATE + timedelta(days=index * submissions + n)).isoformat()
+            rows = [(sid, subject_id, day, 'Absent' if sid % 10 == 0 else 'Present') for sid in student_ids]
+            started = time.perf_counter()
+            ok = True
+            try:
+                if mode == 'direct':
+                    insert_attendance(db, cursor, rows)
+                else:
+                    submission_id = queue.enqueue(subject_id, [day], [(sid, d, s) for sid, _, d, s in rows])
+                    ok = queue.wait(submission_id, timeout=60)[0] == 'committed'
+            except mysql.connector.Error:
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000.0
+            with lock:
+                latencies.append(elapsed)
+                if ok:
+                    rows_written[0] += len(rows)
+                else:
+                    errors[0] += 1
+        if db:
+            db.close()
+
+    stop = threading.Event()
+    batches = []
+
+    def writer():
+        db = connect_db()
+        cursor = db.cursor(dictionary=True)
+        while not stop.is_set():
+            claimed = queue.claim(batch)
+            if not claimed:
+                time.sleep(app.config['WRITE_QUEUE_IDLE_MS'] / 1000.0)
+                continue
+            queue.finish(write_queue.write_batch(db, cursor, claimed, fetch_marked_dates))
+            batches.append(len(claimed))
+        db.close()
+
+    writer_thread = threading.Thread(target=writer) if mode == 'queued' else None
+    if writer_thread:
+        writer_thread.start()
+    threads = [threading.Thread(target=submitter, args=(i, subject_id, student_ids))
+               for i, (subject_id, student_ids) in enumerate(classes)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    if writer_thread:
+        stop.set()
+        writer_thread.join()
+
+    latencies.sort()
+    total = len(latencies)
+    note = f"  avg batch {sum(batches) / len(batches):.1f}" if batches else ""
+    print(f"{mode:8} {total / elapsed:10.1f} {rows_written[0] / elapsed:10.0f} {percentile(latencies, 50):9.1f} "
+          f"{percentile(latencies, 95):9.1f} {errors[0]:7d}{note}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--submitters', type=int, default=64, help='Concurrent submitters (one subject each).')
+    parser.add_argument('--submissions', type=int, default=20, help='Submissions per submitter.')
+    parser.add_argument('--batch', type=int, default=None, help='Submissions per group commit (default WRITE_QUEUE_BATCH).')
+    args = parser.parse_args()
+
+    classes = load_classes(args.submitters)
+    if not classes:
+        raise SystemExit("No subjects with students; load some data first (flask seed-synthetic).")
+    print(f"{len(classes)} submitters x {args.submissions} submissions, "
+          f"{sum(len(s) for _, s in classes) // len(classes)} students per class on average")
+
+    queue_path = os.path.join(tempfile.mkdtemp(), 'bench-write-queue.db')
+    queue = write_queue.WriteQueue(queue_path)
+    print(f"{'mode':8} {'subm/s':>10} {'rows/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+    try:
+        cleanup()
+        run('direct', classes, args.submissions)
+        cleanup()
+        run('queued', classes, args.submissions, queue, args.batch or app.config['WRITE_QUEUE_BATCH'])
+    finally:
+        cleanup()
+
+if __name__ == "__main__":
+    main()
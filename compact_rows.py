@@ -0,0 +1,73 @@
+"""
+Compact rows for large result sets: one tuple per row instead of one dict.
+
+Row classes are namedtuple subclasses generated once per query shape (the
+result's column names) and cached, so a row costs a tuple of its values and
+nothing else; the column names live on the class. Rows read like the
+dictionary-cursor rows they replace:
+
+    row.name, row['name'], row.get('name'), row.keys(), dict(row.items())
+
+Jinja's `row.name` and `row['name']` both work. Rows are immutable: use
+row._asdict() for a mutable copy. Duplicate column names resolve to the last
+one (as in a dict row); names that are not identifiers are key access only.
+
+`python bench_row_types.py` measures dict vs compact rows on 100k-row results.
+"""
+import keyword
+from collections import namedtuple
+from functools import lru_cache
+
+FETCH_CHUNK = 5000
+
+class CompactRow(tuple):
+    __slots__ = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def get(self, key, default=None):
+        position = self._index.get(key)
+        return default if position is None else tuple.__getitem__(self, position)
+
+    def keys(self):
+        return self._index.keys()
+
+    def items(self):
+        return [(name, tuple.__getitem__(self, i)) for name, i in self._index.items()]
+
+    def _asdict(self):
+        return dict(self.items())
+
+@lru_cache(maxsize=256)
+def row_class(columns):
+    index = {name: i for i, name in enumerate(columns)} # Last duplicate wins, like dict rows
+    fields = [name if index[name] == i and name.isidentifier() and not keyword.iskeyword(name)
+              and not name.startswith('_') else '_'
+              for i, name in enumerate(columns)]
+    base = namedtuple('Row', fields, rename=True) # '_' becomes '_<position>'
+    return type('Row', (CompactRow, base), {'__slots__': (), '_index': index})
+
+def fetchall(db, query, params=()):
+    """Runs query on its own tuple cursor and returns compact rows."""
+    cursor = db.cursor()
+    try:
+        cursor.execute(query, params)
+        cls = row_class(tuple(column[0] for column in cursor.description))
+        new = tuple.__new__
+        rows = []
+        # Chunks keep the driver's intermediate tuples from doubling peak memory
+        while True:
+            chunk = cursor.fetchmany(FETCH_CHUNK)
+            if not chunk:
+                break
+            rows.extend([new(cls, values) for values in chunk])
+        return rows
+    finally:
+        cursor.close()
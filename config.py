@@ -1,8 +1,110 @@
 import os
+import tempfile
 
 class Config:
+    SECRET_KEY = os.getenv(
+        "SECRET_KEY",
+        "mohanraj$attendance@system#2026!secure"
+    )
+
     DB_HOST = os.getenv("MYSQLHOST", "localhost")
     DB_USER = os.getenv("MYSQLUSER", "root")
     DB_PASSWORD = os.getenv("MYSQLPASSWORD", "")
     DB_NAME = os.getenv("MYSQLDATABASE", "")
     DB_PORT = int(os.getenv("MYSQLPORT", 3306))
+
+    # Open connections kept per worker (0 = connect per request); pooled connections
+    # keep their server-side prepared statements between requests (queries.py)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 0))
+    DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "1") == "1"
+
+    # 'mysql', or 'sqlite' for an embedded single-node database (sqlite_backend.py)
+    DB_BACKEND = os.getenv("DB_BACKEND", "mysql")
+    SQLITE_PATH = os.getenv("SQLITE_PATH", "attendance.db")
+
+    # Optional read replicas ("host[:port]", comma separated) for read-only pages (db_routing.py)
+    DB_REPLICAS = os.getenv("MYSQL_REPLICAS", "")
+    REPLICA_MAX_LAG_SECONDS = int(os.getenv("REPLICA_MAX_LAG_SECONDS", 5))
+    # After a user's own write, their reads stay on the primary at least this long
+    REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 10))
+    REPLICA_CHECK_INTERVAL = int(os.getenv("REPLICA_CHECK_INTERVAL", 5))
+
+    # Seconds the institution-wide analytics rollup is reused before recomputing
+    ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", 120))
+
+    # Worker processes for `flask compute-eligibility` (0 = one per CPU)
+    ELIGIBILITY_WORKERS = int(os.getenv("ELIGIBILITY_WORKERS", 0))
+
+    # Bearer token for machine clients of /api/attendance/changes (unset = admin session only)
+    SYNC_API_TOKEN = os.getenv("SYNC_API_TOKEN", "")
+    # Seconds after which a gap in the change feed's seq is taken as permanent (rolled back);
+    # must be longer than the longest write transaction
+    CHANGE_FEED_SETTLE_SECONDS = int(os.getenv("CHANGE_FEED_SETTLE_SECONDS", 60))
+
+    # Connection pool of the async read-only API tier (api_async.py)
+    ASYNC_DB_POOL_MIN = int(os.getenv("ASYNC_DB_POOL_MIN", 2))
+    ASYNC_DB_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", 20))
+
+    # Where per-student attendance reads come from: 'rows' (attendance table only) or
+    # 'packed' (status vectors from `flask pack-attendance` plus rows not packed yet)
+    ATTENDANCE_STORAGE = os.getenv("ATTENDANCE_STORAGE", "rows")
+
+    # Read students.effective_percentage / total_periods / attended_periods (kept by triggers,
+    # migration 10) instead of counting attendance rows on every request
+    STORED_PERCENTAGES = os.getenv("STORED_PERCENTAGES", "0") == "1"
+
+    # Seconds a worker reuses a class roster when expanding compact mark submissions
+    ROSTER_CACHE_TTL = int(os.getenv("ROSTER_CACHE_TTL", 60))
+
+    # Write-behind queue for mark submissions (write_queue.py): requests enqueue to a local
+    # file and wait for `flask attendance-writer` to commit them in batches
+    WRITE_QUEUE = os.getenv("WRITE_QUEUE", "0") == "1"
+    WRITE_QUEUE_PATH = os.getenv("WRITE_QUEUE_PATH", "attendance-write-queue.db")
+    WRITE_QUEUE_BATCH = int(os.getenv("WRITE_QUEUE_BATCH", 200)) # Submissions per transaction
+    WRITE_QUEUE_ACK_TIMEOUT = float(os.getenv("WRITE_QUEUE_ACK_TIMEOUT", 10))
+    WRITE_QUEUE_IDLE_MS = int(os.getenv("WRITE_QUEUE_IDLE_MS", 20)) # Writer poll interval when idle
+
+    # Background jobs (background_jobs.py): admin exports, recomputes and large deletes are
+    # queued for `flask worker` instead of running inside the request
+    BACKGROUND_JOBS = os.getenv("BACKGROUND_JOBS", "0") == "1"
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2)) # Jobs run at once per worker
+    JOB_RESULTS_DIR = os.getenv("JOB_RESULTS_DIR", os.path.join(tempfile.gettempdir(), "attendance-job-results"))
+    JOB_RETRY_DELAY = int(os.getenv("JOB_RETRY_DELAY", 30)) # Seconds before the first retry, doubling
+    JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", 60)) # No heartbeat this long = worker died
+    JOB_KEEP_DAYS = int(os.getenv("JOB_KEEP_DAYS", 7))
+
+    # Effective percentages and per-subject breakdowns shared by all workers of a node through
+    # one memory-mapped file (result_cache.py), invalidated per student on every write. Writes
+    # made on other nodes are only seen after RESULT_CACHE_TTL seconds. Off by default: set
+    # RESULT_CACHE=1 (and the same RESULT_CACHE_PATH) for the web workers, the writer and the CLI
+    RESULT_CACHE = os.getenv("RESULT_CACHE", "0") == "1"
+    RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH",
+                                  os.path.join(tempfile.gettempdir(), "attendance-result-cache"))
+    RESULT_CACHE_SIZE_MB = int(os.getenv("RESULT_CACHE_SIZE_MB", 32))
+    RESULT_CACHE_ENTRY_BYTES = int(os.getenv("RESULT_CACHE_ENTRY_BYTES", 2048)) # Larger values are not cached
+    RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", 120))
+
+    # Rendered template fragments kept per worker ({% cache %} blocks, keyed by data versions)
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", 256))
+    FRAGMENT_CACHE_TTL = int(os.getenv("FRAGMENT_CACHE_TTL", 600))
+
+    # Large read-only lists (manage pages, eligibility, term snapshots, history) as
+    # compact tuple rows instead of dicts (compact_rows.py)
+    COMPACT_ROWS = os.getenv("COMPACT_ROWS", "1") == "1"
+
+    # Server-Timing header on every response, and one JSON line per request through a
+    # queue (request_log.py); REQUEST_LOG_FILE empty = stderr
+    SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+    REQUEST_LOG = os.getenv("REQUEST_LOG", "1") == "1"
+    REQUEST_LOG_FILE = os.getenv("REQUEST_LOG_FILE", "")
+
+    # Admin-only request profiles (?profile=1), newest PROFILE_KEEP kept (empty dir = off)
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "attendance-profiles"))
+    PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 50))
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+
+    # Compiled template bytecode (filled by `flask compile-templates` at deploy; empty = off)
+    TEMPLATE_BYTECODE_DIR = os.getenv(
+        "TEMPLATE_BYTECODE_DIR",
+        os.path.join(tempfile.gettempdir(), "attendance-jinja-bytecode")
+    )
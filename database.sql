@@ -1,5 +1,6 @@
 CREATE DATABASE IF NOT EXISTS attendance_db;
 USE attendance_db;
+-- Fresh installs only. Existing databases are upgraded with `python migrate.py`.
 
 -- Users table (Centralized auth)
 CREATE TABLE IF NOT EXISTS users (
@@ -24,6 +25,7 @@ CREATE TABLE IF NOT EXISTS staff (
     name VARCHAR(100) NOT NULL,
     department_id INT,
     email VARCHAR(100),
+    KEY idx_staff_name (name), -- typeahead prefix search
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (department_id) REFERENCES departments(id) ON DELETE SET NULL
 );
@@ -36,7 +38,13 @@ CREATE TABLE IF NOT EXISTS students (
     name VARCHAR(100) NOT NULL,
     department_id INT,
     current_year INT NOT NULL, -- 1, 2, 3, 4
-    section VARCHAR(20) NOT NULL, -- I Batch, II Batch
+    batch VARCHAR(20) NOT NULL, -- I Batch, II Batch
+    admin_override_percentage FLOAT DEFAULT NULL, -- set by admin; wins over the calculated value
+    -- Maintained by the triggers below (stored_percentages.py); read when STORED_PERCENTAGES=1
+    total_periods INT NOT NULL DEFAULT 0,
+    attended_periods INT NOT NULL DEFAULT 0,
+    effective_percentage DECIMAL(5,2) NOT NULL DEFAULT 0,
+    KEY idx_students_name (name), -- typeahead prefix search (register_no is already unique)
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (department_id) REFERENCES departments(id) ON DELETE SET NULL
 );
@@ -48,8 +56,10 @@ CREATE TABLE IF NOT EXISTS subjects (
     name VARCHAR(100) NOT NULL,
     department_id INT,
     year INT NOT NULL,
-    section VARCHAR(20) NOT NULL,
+    batch VARCHAR(20) NOT NULL,
     staff_id INT,
+    KEY idx_subjects_code (code), -- typeahead prefix search
+    KEY idx_subjects_name (name),
     FOREIGN KEY (department_id) REFERENCES departments(id) ON DELETE CASCADE,
     FOREIGN KEY (staff_id) REFERENCES staff(id) ON DELETE SET NULL
 );
@@ -61,21 +71,197 @@ CREATE TABLE IF NOT EXISTS attendance (
     subject_id INT NOT NULL,
     date DATE NOT NULL,
     status ENUM('Present', 'Absent', 'On Duty') DEFAULT 'Absent',
-    marked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    marked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
     FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE,
     UNIQUE KEY unique_attendance (student_id, subject_id, date)
 );
 
--- Class Logins table (Common login for Dept/Year/Section)
+-- Class Logins table (Common login for Dept/Year/Batch)
 CREATE TABLE IF NOT EXISTS class_logins (
     id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT UNIQUE NOT NULL,
     department_id INT NOT NULL,
     year INT NOT NULL,
-    section VARCHAR(20) NOT NULL,
+    batch VARCHAR(20) NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (department_id) REFERENCES departments(id) ON DELETE CASCADE,
-    UNIQUE KEY unique_class_login (department_id, year, section)
+    UNIQUE KEY unique_class_login (department_id, year, batch)
+);
+
+-- Academic terms (a closed term gets a frozen percentage snapshot)
+CREATE TABLE IF NOT EXISTS terms (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(50) UNIQUE NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    snapshot_at TIMESTAMP NULL DEFAULT NULL
+);
+
+-- Term-end percentage snapshots (one row per student per term, never recomputed)
+-- Student details are copied so the snapshot survives later edits and deletions.
+CREATE TABLE IF NOT EXISTS term_snapshots (
+    term_id INT NOT NULL,
+    student_id INT NOT NULL,
+    register_no VARCHAR(20) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    department_id INT,
+    current_year INT NOT NULL,
+    batch VARCHAR(20) NOT NULL,
+    total_periods INT NOT NULL,
+    attended_periods INT NOT NULL,
+    raw_percentage DECIMAL(5,2) NOT NULL,
+    override_percentage FLOAT DEFAULT NULL,
+    effective_percentage DECIMAL(5,2) NOT NULL,
+    PRIMARY KEY (term_id, student_id),
+    KEY idx_term_snapshot_class (term_id, department_id, current_year),
+    FOREIGN KEY (term_id) REFERENCES terms(id) ON DELETE CASCADE
+);
+
+-- Exam eligibility results (rebuilt by `flask compute-eligibility`, one row per student)
+CREATE TABLE IF NOT EXISTS eligibility (
+    student_id INT PRIMARY KEY,
+    department_id INT,
+    current_year INT NOT NULL,
+    batch VARCHAR(20) NOT NULL,
+    total_periods INT NOT NULL,
+    attended_periods INT NOT NULL,
+    override_percentage FLOAT DEFAULT NULL,
+    effective_percentage DECIMAL(5,2) NOT NULL,
+    is_eligible BOOLEAN NOT NULL,
+    periods_needed INT DEFAULT NULL, -- NULL when an admin override decides the percentage
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_eligibility_class (department_id, current_year, batch, is_eligible),
+    FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+);
+
+-- Attendance change feed (filled by the triggers below, read by /api/attendance/changes)
+-- No foreign keys: deletions must stay in the feed after the rows are gone.
+CREATE TABLE IF NOT EXISTS attendance_changes (
+    seq BIGINT AUTO_INCREMENT PRIMARY KEY,
+    attendance_id INT NOT NULL,
+    student_id INT NOT NULL,
+    subject_id INT NOT NULL,
+    date DATE NOT NULL,
+    status ENUM('Present', 'Absent', 'On Duty') NULL, -- NULL for deletions
+    change_type ENUM('insert', 'update', 'delete') NOT NULL,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_changes_student (student_id, seq) -- per-student data version (student page ETags)
+);
+
+-- Note: MySQL does not fire triggers for ON DELETE CASCADE, so the app deletes
+-- attendance rows explicitly before deleting students or subjects.
+DROP TRIGGER IF EXISTS attendance_after_insert;
+CREATE TRIGGER attendance_after_insert AFTER INSERT ON attendance FOR EACH ROW
+    INSERT INTO attendance_changes (attendance_id, student_id, subject_id, date, status, change_type)
+    VALUES (NEW.id, NEW.student_id, NEW.subject_id, NEW.date, NEW.status, 'insert');
+
+DROP TRIGGER IF EXISTS attendance_after_update;
+CREATE TRIGGER attendance_after_update AFTER UPDATE ON attendance FOR EACH ROW
+    INSERT INTO attendance_changes (attendance_id, student_id, subject_id, date, status, change_type)
+    SELECT NEW.id, NEW.student_id, NEW.subject_id, NEW.date, NEW.status, 'update'
+    FROM DUAL WHERE NOT (OLD.status <=> NEW.status);
+
+DROP TRIGGER IF EXISTS attendance_after_delete;
+CREATE TRIGGER attendance_after_delete AFTER DELETE ON attendance FOR EACH ROW
+    INSERT INTO attendance_changes (attendance_id, student_id, subject_id, date, status, change_type)
+    SELECT OLD.id, OLD.student_id, OLD.subject_id, OLD.date, NULL, 'delete'
+    FROM DUAL WHERE @attendance_packing IS NULL; -- set when archiving rows of packed sessions by hand
+
+-- Stored percentages: every attendance change adjusts the student's counts, and every
+-- write to a student recomputes effective_percentage (override, else attended / total).
+-- student_id of an attendance row never changes. `flask check-percentages --repair` fixes drift.
+DROP TRIGGER IF EXISTS attendance_counts_after_insert;
+CREATE TRIGGER attendance_counts_after_insert AFTER INSERT ON attendance FOR EACH ROW
+    UPDATE students
+    SET total_periods = total_periods + 1,
+        attended_periods = attended_periods + IFNULL(NEW.status IN ('Present', 'On Duty'), 0)
+    WHERE id = NEW.student_id;
+
+DROP TRIGGER IF EXISTS attendance_counts_after_update;
+CREATE TRIGGER attendance_counts_after_update AFTER UPDATE ON attendance FOR EACH ROW
+    UPDATE students
+    SET attended_periods = attended_periods + IFNULL(NEW.status IN ('Present', 'On Duty'), 0)
+                                            - IFNULL(OLD.status IN ('Present', 'On Duty'), 0)
+    WHERE id = NEW.student_id AND NOT (OLD.status <=> NEW.status);
+
+DROP TRIGGER IF EXISTS attendance_counts_after_delete;
+CREATE TRIGGER attendance_counts_after_delete AFTER DELETE ON attendance FOR EACH ROW
+    UPDATE students
+    SET total_periods = total_periods - 1,
+        attended_periods = attended_periods - IFNULL(OLD.status IN ('Present', 'On Duty'), 0)
+    WHERE id = OLD.student_id AND @attendance_packing IS NULL; -- packed periods stay counted
+
+DROP TRIGGER IF EXISTS students_percentage_before_insert;
+CREATE TRIGGER students_percentage_before_insert BEFORE INSERT ON students FOR EACH ROW
+    SET NEW.effective_percentage = IFNULL(NEW.admin_override_percentage,
+        CASE WHEN NEW.total_periods > 0 THEN ROUND(NEW.attended_periods * 100.0 / NEW.total_periods, 2) ELSE 0 END);
+
+DROP TRIGGER IF EXISTS students_percentage_before_update;
+CREATE TRIGGER students_percentage_before_update BEFORE UPDATE ON students FOR EACH ROW
+    SET NEW.effective_percentage = IFNULL(NEW.admin_override_percentage,
+        CASE WHEN NEW.total_periods > 0 THEN ROUND(NEW.attended_periods * 100.0 / NEW.total_periods, 2) ELSE 0 END);
+
+-- Packed attendance (`flask pack-attendance`): one row per (subject, date) session
+-- with a 2-bit status per student (0 = not on roll, 1 = Present, 2 = Absent, 3 = On Duty).
+-- Vector positions refer to a frozen roster; identical rosters are stored once.
+CREATE TABLE IF NOT EXISTS attendance_rosters (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    roster_hash CHAR(40) NOT NULL UNIQUE, -- sha1 of the sorted student ids
+    student_count INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS attendance_roster_members (
+    roster_id INT NOT NULL,
+    position INT NOT NULL, -- index into the session status vector
+    student_id INT NOT NULL,
+    PRIMARY KEY (roster_id, position),
+    KEY idx_roster_member_student (student_id, roster_id),
+    FOREIGN KEY (roster_id) REFERENCES attendance_rosters(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS attendance_sessions (
+    subject_id INT NOT NULL,
+    date DATE NOT NULL,
+    roster_id INT NOT NULL,
+    statuses VARBINARY(1024) NOT NULL, -- 4 students per byte, position 0 in the low bits
+    PRIMARY KEY (subject_id, date),
+    KEY idx_session_roster (roster_id),
+    FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE,
+    FOREIGN KEY (roster_id) REFERENCES attendance_rosters(id)
+);
+
+-- Data version stamps for cached template fragments ({% cache %} in admin pages).
+-- Bumped by the app on every write to students / staff / departments / subjects.
+CREATE TABLE IF NOT EXISTS data_versions (
+    name VARCHAR(30) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+-- Background jobs (`flask worker`, background_jobs.py): exports, recomputes, large deletes
+CREATE TABLE IF NOT EXISTS jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    job_type VARCHAR(50) NOT NULL,
+    params TEXT NOT NULL, -- JSON
+    state ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 3,
+    run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP, -- not claimed before (retry backoff)
+    worker VARCHAR(100) DEFAULT NULL, -- host:pid of the worker running it
+    heartbeat_at TIMESTAMP DEFAULT NULL,
+    progress_done INT DEFAULT NULL,
+    progress_total INT DEFAULT NULL,
+    progress_message VARCHAR(255) DEFAULT NULL,
+    result_file VARCHAR(255) DEFAULT NULL, -- in JOB_RESULTS_DIR/<id>/
+    result_message VARCHAR(255) DEFAULT NULL,
+    error TEXT,
+    created_by INT DEFAULT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP DEFAULT NULL,
+    finished_at TIMESTAMP DEFAULT NULL,
+    KEY idx_jobs_queue (state, run_after),
+    KEY idx_jobs_created (created_at),
+    FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL
 );
@@ -0,0 +1,130 @@
+"""
+Read/write routing between the MySQL primary and optional read replicas.
+
+Views decorated with @replica_reads in app.py may be served from a replica;
+everything else (and every write) uses the primary. A replica is only used
+when it is reachable, replicating, and no further behind than
+REPLICA_MAX_LAG_SECONDS. A user who has just written stays on the primary for
+REPLICA_STICKY_SECONDS, and after that for as long as the replica's lag is
+still longer than the time since their write, so nobody reads a page older
+than their own change.
+
+Lag comes from SHOW REPLICA STATUS (the database user needs REPLICATION
+CLIENT on the replicas) and is re-checked at most every
+REPLICA_CHECK_INTERVAL seconds per worker.
+
+Local test setup: a second mysqld on port 3307 replicating from the first,
+then MYSQL_REPLICAS=127.0.0.1:3307 and `flask replica-status`.
+"""
+import random
+import threading
+import time
+
+import mysql.connector
+
+def parse_replicas(value, default_port):
+    """'db2, db3:3307' -> [('db2', default_port), ('db3', 3307)]"""
+    replicas = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.partition(':')
+        replicas.append((host, int(port) if port else default_port))
+    return replicas
+
+def replica_lag(db):
+    """Seconds the replica is behind, or None when it is not (or no longer) replicating."""
+    cursor = db.cursor(dictionary=True)
+    try:
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+            row = cursor.fetchone()
+            lag_column = 'Seconds_Behind_Source'
+        except mysql.connector.Error as err:
+            if err.errno != 1064: # Syntax error: MySQL before 8.0.22
+                raise
+            cursor.execute("SHOW SLAVE STATUS")
+            row = cursor.fetchone()
+            lag_column = 'Seconds_Behind_Master'
+        cursor.fetchall()
+    finally:
+        cursor.close()
+    if row is None:
+        return None
+    return row[lag_column] # NULL while the SQL thread is stopped
+
+class ReplicaRouter:
+    def __init__(self, replicas, max_lag, sticky_seconds, check_interval):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self.check_interval = check_interval
+        self.health = {} # (host, port) -> (checked_at, lag or None)
+        self.lock = threading.Lock()
+
+    def usable(self, lag, since_write):
+        if lag is None or lag > self.max_lag:
+            return False
+        if since_write is None:
+            return True
+        # Read-your-writes: the replica must already contain the user's last write
+        return since_write >= self.sticky_seconds and since_write > lag
+
+    def known_health(self, replica):
+        with self.lock:
+            checked = self.health.get(replica)
+        if checked and time.time() - checked[0] < self.check_interval:
+            return True, checked[1]
+        return False, None
+
+    def record(self, replica, lag):
+        with self.lock:
+            self.health[replica] = (time.time(), lag)
+
+    def connect(self, connect, since_write=None):
+        """
+        Returns (connection, replica) for a usable replica, or (None, None) when
+        the caller should use the primary. `connect(host, port)` opens a connection.
+        """
+        if since_write is not None and since_write < self.sticky_seconds:
+            return None, None
+
+        candidates = list(self.replicas)
+        random.shuffle(candidates)
+        for replica in candidates:
+            fresh, lag = self.known_health(replica)
+            if fresh and not self.usable(lag, since_write):
+                continue
+            try:
+                db = connect(*replica)
+            except mysql.connector.Error:
+                self.record(replica, None) # Down: skip it until the next check
+                continue
+            if not fresh:
+                try:
+                    lag = replica_lag(db)
+                except mysql.connector.Error:
+                    lag = None
+                self.record(replica, lag)
+            if self.usable(lag, since_write):
+                return db, replica
+            db.close()
+        return None, None
+
+    def status(self, connect):
+        """[(host, port, lag, error)] checked now, for the replica-status command."""
+        rows = []
+        for replica in self.replicas:
+            try:
+                db = connect(*replica)
+                try:
+                    lag = replica_lag(db)
+                finally:
+                    db.close()
+                error = None if lag is not None else "not replicating"
+            except mysql.connector.Error as err:
+                lag, error = None, str(err)
+            self.record(replica, lag)
+            rows.append((replica[0], replica[1], lag, error))
+        return rows
@@ -0,0 +1,264 @@
+"""
+Load harness: replays the two traffic peaks against a running instance.
+
+    marking-peak   every staff and class login opens their dashboard and the mark
+                   page of one subject, then submits it (the 9:00-9:10 rush)
+    result-rush    every student logs in and keeps refreshing their dashboard,
+                   opening the attendance history once (result day)
+    mixed          both at once
+
+Accounts come from a CSV file with the columns role,username,password (role is
+staff, class or student):
+
+    gunicorn --worker-class gthread --threads 4 -w 4 app:app --bind :8000
+    python loadtest.py --accounts accounts.csv --scenario marking-peak --window 60
+    python loadtest.py --accounts accounts.csv --scenario result-rush --save-baseline baseline.json
+    python loadtest.py --accounts accounts.csv --scenario result-rush --baseline baseline.json
+
+Users arrive spread evenly at random over --window seconds (600 is the real ten
+minute peak). Redirects are followed like a browser would; a request that ends
+on a page with a danger flash (e.g. "already marked") or on the login form is
+counted under "<route> (rejected)". Reports throughput, p50/p95/p99 latency and
+error rate per route. With --baseline it prints the change against a saved run and exits 1 when a
+route's p95 grew more than --tolerance percent or its error rate went up.
+"""
+import argparse
+import csv
+import http.cookiejar
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None # Surface 3xx to the caller, which follows it itself
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, route, elapsed_ms, ok):
+        with self.lock:
+            entry = self.routes.setdefault(route, {'latencies': [], 'errors': 0})
+            entry['latencies'].append(elapsed_ms)
+            if not ok:
+                entry['errors'] += 1
+
+    def summary(self, duration):
+        result = {}
+        for route, entry in sorted(self.routes.items()):
+            latencies = sorted(entry['latencies'])
+            count = len(latencies)
+            result[route] = {
+                'count': count,
+                'errors': entry['errors'],
+                'error_rate': entry['errors'] / count if count else 0.0,
+                'rps': count / duration if duration else 0.0,
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+            }
+        return result
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def route_label(method, path):
+    path = re.sub(r'/\d+', '/<id>', urllib.parse.urlsplit(path).path)
+    return f"{method} {path}"
+
+class VirtualUser:
+    def __init__(self, base_url, stats):
+        self.base_url = base_url
+        self.stats = stats
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect())
+
+    def request(self, path, data=None, headers=None):
+        """Performs one request, following redirects; returns (status, body) of the final page.
+
+        Each hop is timed under its own route; the request itself is also
+        recorded as "<route> (rejected)" when the page it ends on is a refusal.
+        """
+        status, body = self._follow(path, data, headers)
+        if rejected(body):
+            self.stats.record(route_label('POST' if data is not None else 'GET', path) + ' (rejected)', 0.0, False)
+        return status, body
+
+    def _follow(self, path, data=None, headers=None):
+        method = 'POST' if data is not None else 'GET'
+        label = route_label(method, path)
+        payload = urllib.parse.urlencode(data, doseq=True).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=payload, headers=headers or {})
+        started = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=60) as resp:
+                status, body, location = resp.status, resp.read().decode('utf-8', 'replace'), None
+        except urllib.error.HTTPError as err:
+            status, body, location = err.code, err.read().decode('utf-8', 'replace'), err.headers.get('Location')
+        except (urllib.error.URLError, OSError):
+            self.stats.record(label, (time.perf_counter() - started) * 1000.0, False)
+            return None, ''
+        self.stats.record(label, (time.perf_counter() - started) * 1000.0, status < 400)
+
+        if location and 300 <= status < 400:
+            return self._follow(urllib.parse.urljoin(path, location))
+        return status, body
+
+    def login(self, username, password):
+        status, body = self.request('/login', {'username': username, 'password': password})
+        return status == 200 and not rejected(body)
+
+def rejected(body):
+    """A danger flash, or the login form: the app refused the request or dropped the session."""
+    return 'alert-danger' in body or 'name="password"' in body
+
+def think(seconds):
+    if seconds:
+        time.sleep(random.uniform(0, seconds))
+
+def marking_session(user, account, args):
+    if not user.login(account['username'], account['password']):
+        return
+    home = '/class_dashboard' if account['role'] == 'class' else '/staff'
+    _, body = user.request(home)
+    subject_ids = sorted(set(re.findall(r'/staff/mark/(\d+)"', body)))
+    if not subject_ids:
+        return
+    subject_id = random.choice(subject_ids)
+    _, page = user.request(f'/staff/mark/{subject_id}')
+    version = re.search(r'name="roster_version" value="([^"]*)"', page)
+    student_ids = re.findall(r'name="status_(\d+)"', page)
+    think(args.think)
+
+    # Same compact submission the mark page's script sends
+    absent = [sid for sid in student_ids if random.random() < args.absent_rate]
+    user.request(f'/staff/mark/{subject_id}', {
+        'date': args.date,
+        'roster_version': version.group(1) if version else '',
+        'default_status': 'Present',
+        'exceptions': ",".join(f"{sid}:A" for sid in absent),
+    })
+
+def student_session(user, account, args):
+    if not user.login(account['username'], account['password']):
+        return
+    history_at = random.randrange(args.refreshes)
+    for i in range(args.refreshes):
+        user.request('/student')
+        if i == history_at:
+            user.request('/student/attendance-history')
+        think(args.think)
+
+def run(args, accounts):
+    stats = Stats()
+    roles = {'marking-peak': ('staff', 'class'), 'result-rush': ('student',),
+             'mixed': ('staff', 'class', 'student')}[args.scenario]
+    selected = [a for a in accounts if a['role'] in roles]
+    if args.users:
+        selected = selected[:args.users]
+    if not selected:
+        raise SystemExit(f"No accounts with role {' / '.join(roles)} in {args.accounts}.")
+
+    plan = sorted(((random.uniform(0, args.window), account) for account in selected), key=lambda item: item[0])
+    threads = min(len(plan), args.max_threads)
+    if threads < len(plan):
+        print(f"Note: {len(plan)} users share {threads} threads; late arrivals queue behind earlier ones.")
+
+    started = time.time()
+
+    def one(item):
+        offset, account = item
+        delay = started + offset - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        user = VirtualUser(args.url.rstrip('/'), stats)
+        session = student_session if account['role'] == 'student' else marking_session
+        session(user, account, args)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, plan))
+
+    duration = time.time() - started
+    return {'scenario': args.scenario, 'users': len(plan), 'window': args.window,
+            'duration': duration, 'routes': stats.summary(duration)}
+
+def print_report(result, baseline=None):
+    print(f"\n{result['scenario']}: {result['users']} users over {result['window']}s, "
+          f"finished in {result['duration']:.1f}s")
+    header = f"{'route':40} {'count':>7} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+    print(header + ("   p95 vs baseline" if baseline else ""))
+    for route, r in result['routes'].items():
+        line = (f"{route:40} {r['count']:7d} {r['rps']:7.1f} {r['p50']:8.1f} {r['p95']:8.1f} {r['p99']:8.1f} "
+                f"{r['error_rate'] * 100:6.1f}%")
+        base = (baseline or {}).get('routes', {}).get(route)
+        if base and base['p95']:
+            line += f"   {(r['p95'] / base['p95'] - 1) * 100:+.0f}%"
+        print(line)
+
+def regressions(result, baseline, tolerance):
+    found = []
+    for route, r in result['routes'].items():
+        base = baseline['routes'].get(route)
+        if not base:
+            continue
+        if base['p95'] and r['p95'] > base['p95'] * (1 + tolerance / 100.0):
+            found.append(f"{route}: p95 {base['p95']:.1f} -> {r['p95']:.1f} ms")
+        if r['error_rate'] > base['error_rate']:
+            found.append(f"{route}: error rate {base['error_rate'] * 100:.1f}% -> {r['error_rate'] * 100:.1f}%")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--accounts', required=True, help='CSV with role,username,password columns.')
+    parser.add_argument('--scenario', choices=('marking-peak', 'result-rush', 'mixed'), default='marking-peak')
+    parser.add_argument('--users', type=int, default=0, help='Use only the first N matching accounts.')
+    parser.add_argument('--window', type=float, default=60, help='Seconds over which users arrive.')
+    parser.add_argument('--think', type=float, default=2.0, help='Maximum pause between a user\'s steps.')
+    parser.add_argument('--refreshes', type=int, default=5, help='Dashboard loads per student (result-rush).')
+    parser.add_argument('--date', default=date.today().isoformat(), help='Date submitted by marking-peak.')
+    parser.add_argument('--absent-rate', type=float, default=0.1)
+    parser.add_argument('--max-threads', type=int, default=1000)
+    parser.add_argument('--save-baseline', help='Write this run\'s results to a JSON file.')
+    parser.add_argument('--baseline', help='Compare against a JSON file written by --save-baseline.')
+    parser.add_argument('--tolerance', type=float, default=20.0, help='Allowed p95 growth over the baseline, percent.')
+    args = parser.parse_args()
+
+    with open(args.accounts, newline='') as f:
+        accounts = list(csv.DictReader(f))
+
+    result = run(args, accounts)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if baseline:
+        found = regressions(result, baseline, args.tolerance)
+        if found:
+            print("\nRegressions against the baseline:")
+            for item in found:
+                print(f"  {item}")
+            raise SystemExit(1)
+        print("\nNo regressions against the baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,557 @@
+"""
+Versioned schema migrations.
+
+    python migrate.py              # apply pending migrations in order
+    python migrate.py --dry-run    # print what would run, change nothing
+    python migrate.py --status     # list applied / pending versions
+    python migrate.py --repair-triggers  # recreate database.sql triggers that are missing
+
+Applied versions are recorded in `schema_migrations`. Every step checks the
+live schema first (information_schema), so re-running a migration on a
+database that already has the change is a no-op. This is also how a database
+created from database.sql gets its versions recorded.
+
+Large tables are never locked for long:
+- ALTERs are issued as online DDL (ALGORITHM=INSTANT, or INPLACE with
+  LOCK=NONE). If MySQL cannot do a change online, the migration stops instead
+  of silently taking a table lock (pass --allow-locking to accept that).
+- Data changes go through backfill(), which updates primary-key ranges of
+  BACKFILL_CHUNK rows, one short transaction per chunk.
+
+To add a migration, append a function decorated with @migration(<next version>, "<name>").
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import mysql.connector
+from config import Config
+from seed_synthetic import LOAD_LOCK_NAME
+
+BACKFILL_CHUNK = 5000
+BACKFILL_PAUSE = 0.05 # Seconds between chunks, leaves room for replication and live traffic
+LOCK_NAME = 'attendance_schema_migrations'
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database.sql')
+
+MIGRATIONS = []
+
+def migration(version, name):
+    def register(fn):
+        MIGRATIONS.append((version, name, fn))
+        return fn
+    return register
+
+class MigrationError(Exception):
+    pass
+
+class Migrator:
+    def __init__(self, db, dry_run=False, allow_locking=False):
+        self.db = db
+        self.cursor = db.cursor(dictionary=True)
+        self.dry_run = dry_run
+        self.allow_locking = allow_locking
+
+    # --- Schema inspection ---
+
+    def table_exists(self, table):
+        self.cursor.execute("""
+            SELECT 1 FROM information_schema.tables
+            WHERE table_schema = DATABASE() AND table_name = %s
+        """, (table,))
+        return self.cursor.fetchone() is not None
+
+    def column(self, table, column):
+        self.cursor.execute("""
+            SELECT column_type as column_type, column_default as column_default, extra as extra,
+                   is_nullable as is_nullable
+            FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """, (table, column))
+        return self.cursor.fetchone()
+
+    def index_exists(self, table, index):
+        self.cursor.execute("""
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+            LIMIT 1
+        """, (table, index))
+        return self.cursor.fetchone() is not None
+
+    def trigger_statement(self, trigger):
+        self.cursor.execute("""
+            SELECT action_statement as action_statement FROM information_schema.triggers
+            WHERE trigger_schema = DATABASE() AND trigger_name = %s
+        """, (trigger,))
+        row = self.cursor.fetchone()
+        return row['action_statement'] if row else None
+
+    # --- Changes ---
+
+    def execute(self, sql, params=()):
+        if self.dry_run:
+            print(f"    would run: {' '.join(sql.split())}")
+            return 0
+        self.cursor.execute(sql, params)
+        return self.cursor.rowcount
+
+    def create_table(self, table, ddl):
+        if self.table_exists(table):
+            return
+        self.execute(ddl)
+
+    def online_alter(self, table, clause, algorithms=('INSTANT', 'INPLACE')):
+        """ALTER TABLE without blocking writes; refuses to fall back to a locking copy."""
+        for algorithm in algorithms:
+            lock = "" if algorithm == 'INSTANT' else ", LOCK=NONE"
+            try:
+                self.execute(f"ALTER TABLE {table} {clause}, ALGORITHM={algorithm}{lock}")
+                return
+            except mysql.connector.Error as err:
+                # 1845/1846: algorithm or lock not supported for this change
+                if err.errno not in (1845, 1846):
+                    raise
+        if not self.allow_locking:
+            raise MigrationError(f"ALTER TABLE {table} {clause} cannot run online. "
+                                 f"Schedule a maintenance window and re-run with --allow-locking.")
+        print(f"    warning: {table} is locked while this ALTER copies the table")
+        self.execute(f"ALTER TABLE {table} {clause}")
+
+    def add_column(self, table, column, definition):
+        if not self.column(table, column):
+            self.online_alter(table, f"ADD COLUMN {column} {definition}")
+
+    def rename_column(self, table, old, new):
+        if self.column(table, old) and not self.column(table, new):
+            self.online_alter(table, f"RENAME COLUMN {old} TO {new}")
+
+    def add_index(self, table, index, columns, unique=False):
+        if not self.index_exists(table, index):
+            kind = "UNIQUE INDEX" if unique else "INDEX"
+            self.online_alter(table, f"ADD {kind} {index} ({columns})", algorithms=('INPLACE',))
+
+    def replace_trigger(self, trigger, ddl, body_marker):
+        """(Re)creates a trigger unless its live body already contains body_marker."""
+        statement = self.trigger_statement(trigger)
+        if statement and body_marker in statement:
+            return
+        self.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        self.execute(ddl)
+
+    def backfill(self, table, assignments, where="1=1", params=(), key='id', chunk=BACKFILL_CHUNK):
+        """
+        UPDATE table SET <assignments> WHERE <where>, one primary-key range of
+        `chunk` rows per statement. Each chunk commits on its own, so row locks
+        are held for milliseconds and replicas never see one giant transaction.
+        Re-running is safe as long as `where` excludes rows already updated.
+        """
+        self.cursor.execute(f"SELECT MIN({key}) as lo, MAX({key}) as hi FROM {table}")
+        bounds = self.cursor.fetchone()
+        if bounds['lo'] is None:
+            return 0
+        if self.dry_run:
+            self.cursor.execute(f"SELECT COUNT(*) as pending FROM {table} WHERE {where}", params)
+            pending = self.cursor.fetchone()['pending']
+            print(f"    would backfill {pending} rows of {table} in chunks of {chunk}: SET {assignments}")
+            return 0
+
+        updated = 0
+        started = time.time()
+        for lo in range(bounds['lo'], bounds['hi'] + 1, chunk):
+            self.cursor.execute(
+                f"UPDATE {table} SET {assignments} WHERE {key} >= %s AND {key} < %s AND ({where})",
+                (lo, lo + chunk) + tuple(params))
+            updated += self.cursor.rowcount
+            if self.cursor.rowcount:
+                time.sleep(BACKFILL_PAUSE)
+            done = min(lo + chunk, bounds['hi'] + 1) - bounds['lo']
+            total = bounds['hi'] + 1 - bounds['lo']
+            print(f"\r    backfill {table}: {done * 100 // total}% ({updated} rows updated, "
+                  f"{time.time() - started:.0f}s)", end="", flush=True)
+        print()
+        return updated
+
+# --- Migrations (append only; never renumber or edit an applied one) ---
+
+@migration(1, "create class_logins")
+def create_class_logins(m):
+    m.create_table('class_logins', """
+        CREATE TABLE class_logins (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT UNIQUE NOT NULL,
+            department_id INT NOT NULL,
+            year INT NOT NULL,
+            batch VARCHAR(20) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            FOREIGN KEY (department_id) REFERENCES departments(id) ON DELETE CASCADE,
+            UNIQUE KEY unique_class_login (department_id, year, batch)
+        )
+    """)
+
+@migration(2, "rename section to batch")
+def rename_section_to_batch(m):
+    # Replaces rename_section_to_batch.py and db_migration_batch.py
+    for table in ('students', 'subjects', 'class_logins'):
+        m.rename_column(table, 'section', 'batch')
+    for table in ('students', 'subjects'):
+        column = m.column(table, 'batch')
+        if column and column['column_type'].lower() != 'varchar(20)':
+            m.online_alter(table, "MODIFY batch VARCHAR(20) NOT NULL", algorithms=('INPLACE',))
+        # A dry run never renamed section, so count the pending rows against it
+        name = 'batch' if column else 'section'
+        if not column and not m.column(table, 'section'):
+            continue
+        # Old single-letter sections become the first batch
+        m.backfill(table, f"{name} = 'I Batch'", where=f"{name} IN ('A', 'B', 'C', '')")
+
+@migration(3, "add students.admin_override_percentage")
+def add_admin_override(m):
+    m.add_column('students', 'admin_override_percentage', "FLOAT DEFAULT NULL")
+
+@migration(4, "create terms and term_snapshots")
+def create_term_snapshots(m):
+    m.create_table('terms', """
+        CREATE TABLE terms (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(50) UNIQUE NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            snapshot_at TIMESTAMP NULL DEFAULT NULL
+        )
+    """)
+    m.create_table('term_snapshots', """
+        CREATE TABLE term_snapshots (
+            term_id INT NOT NULL,
+            student_id INT NOT NULL,
+            register_no VARCHAR(20) NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            department_id INT,
+            current_year INT NOT NULL,
+            batch VARCHAR(20) NOT NULL,
+            total_periods INT NOT NULL,
+            attended_periods INT NOT NULL,
+            raw_percentage DECIMAL(5,2) NOT NULL,
+            override_percentage FLOAT DEFAULT NULL,
+            effective_percentage DECIMAL(5,2) NOT NULL,
+            PRIMARY KEY (term_id, student_id),
+            KEY idx_term_snapshot_class (term_id, department_id, current_year),
+            FOREIGN KEY (term_id) REFERENCES terms(id) ON DELETE CASCADE
+        )
+    """)
+
+@migration(5, "create eligibility")
+def create_eligibility(m):
+    m.create_table('eligibility', """
+        CREATE TABLE eligibility (
+            student_id INT PRIMARY KEY,
+            department_id INT,
+            current_year INT NOT NULL,
+            batch VARCHAR(20) NOT NULL,
+            total_periods INT NOT NULL,
+            attended_periods INT NOT NULL,
+            override_percentage FLOAT DEFAULT NULL,
+            effective_percentage DECIMAL(5,2) NOT NULL,
+            is_eligible BOOLEAN NOT NULL,
+            periods_needed INT DEFAULT NULL,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_eligibility_class (department_id, current_year, batch, is_eligible),
+            FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+        )
+    """)
+
+@migration(6, "attendance change feed")
+def create_change_feed(m):
+    # Replaces db_migration_change_feed.py
+    marked_at = m.column('attendance', 'marked_at')
+    if marked_at and 'on update' not in (marked_at['extra'] or '').lower():
+        m.online_alter('attendance',
+                       "MODIFY marked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP",
+                       algorithms=('INPLACE',))
+
+    m.create_table('attendance_changes', """
+        CREATE TABLE attendance_changes (
+            seq BIGINT AUTO_INCREMENT PRIMARY KEY,
+            attendance_id INT NOT NULL,
+            student_id INT NOT NULL,
+            subject_id INT NOT NULL,
+            date DATE NOT NULL,
+            status ENUM('Present', 'Absent', 'On Duty') NULL,
+            change_type ENUM('insert', 'update', 'delete') NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_changes_student (student_id, seq)
+        )
+    """)
+    m.add_index('attendance_changes', 'idx_changes_student', 'student_id, seq')
+
+    m.replace_trigger('attendance_after_insert', """
+        CREATE TRIGGER attendance_after_insert AFTER INSERT ON attendance FOR EACH ROW
+            INSERT INTO attendance_changes (attendance_id, student_id, subject_id, date, status, change_type)
+            VALUES (NEW.id, NEW.student_id, NEW.subject_id, NEW.date, NEW.status, 'insert')
+    """, "'insert'")
+    m.replace_trigger('attendance_after_update', """
+        CREATE TRIGGER attendance_after_update AFTER UPDATE ON attendance FOR EACH ROW
+            INSERT INTO attendance_changes (attendance_id, student_id, subject_id, date, status, change_type)
+            SELECT NEW.id, NEW.student_id, NEW.subject_id, NEW.date, NEW.status, 'update'
+            FROM DUAL WHERE NOT (OLD.status <=> NEW.status)
+    """, "<=>")
+
+@migration(7, "packed attendance sessions")
+def create_packed_attendance(m):
+    # Replaces db_migration_packed_attendance.py
+    m.create_table('attendance_rosters', """
+        CREATE TABLE attendance_rosters (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            roster_hash CHAR(40) NOT NULL UNIQUE,
+            student_count INT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    m.create_table('attendance_roster_members', """
+        CREATE TABLE attendance_roster_members (
+            roster_id INT NOT NULL,
+            position INT NOT NULL,
+            student_id INT NOT NULL,
+            PRIMARY KEY (roster_id, position),
+            KEY idx_roster_member_student (student_id, roster_id),
+            FOREIGN KEY (roster_id) REFERENCES attendance_rosters(id) ON DELETE CASCADE
+        )
+    """)
+    m.create_table('attendance_sessions', """
+        CREATE TABLE attendance_sessions (
+            subject_id INT NOT NULL,
+            date DATE NOT NULL,
+            roster_id INT NOT NULL,
+            statuses VARBINARY(1024) NOT NULL,
+            PRIMARY KEY (subject_id, date),
+            KEY idx_session_roster (roster_id),
+            FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE,
+            FOREIGN KEY (roster_id) REFERENCES attendance_rosters(id)
+        )
+    """)
+    # Archiving rows of packed sessions (with @attendance_packing set) must not reach the change feed
+    m.replace_trigger('attendance_after_delete', """
+        CREATE TRIGGER attendance_after_delete AFTER DELETE ON attendance FOR EACH ROW
+            INSERT INTO attendance_changes (attendance_id, student_id, subject_id, date, status, change_type)
+            SELECT OLD.id, OLD.student_id, OLD.subject_id, OLD.date, NULL, 'delete'
+            FROM DUAL WHERE @attendance_packing IS NULL
+    """, "@attendance_packing")
+
+@migration(8, "create data_versions")
+def create_data_versions(m):
+    # Replaces db_migration_data_versions.py
+    m.create_table('data_versions', """
+        CREATE TABLE data_versions (
+            name VARCHAR(30) PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        )
+    """)
+
+@migration(9, "typeahead search indexes")
+def add_search_indexes(m):
+    # Replaces db_migration_search_indexes.py
+    m.add_index('students', 'idx_students_name', 'name')
+    m.add_index('subjects', 'idx_subjects_code', 'code')
+    m.add_index('subjects', 'idx_subjects_name', 'name')
+    m.add_index('staff', 'idx_staff_name', 'name')
+
+STUDENT_PERCENTAGE_EXPRESSION = """IFNULL(NEW.admin_override_percentage,
+            CASE WHEN NEW.total_periods > 0 THEN ROUND(NEW.attended_periods * 100.0 / NEW.total_periods, 2) ELSE 0 END)"""
+
+@migration(10, "stored student percentages")
+def add_stored_percentages(m):
+    # Counts and effective percentage on students, kept by triggers (stored_percentages.py)
+    m.add_column('students', 'total_periods', "INT NOT NULL DEFAULT 0")
+    m.add_column('students', 'attended_periods', "INT NOT NULL DEFAULT 0")
+    m.add_column('students', 'effective_percentage', "DECIMAL(5,2) NOT NULL DEFAULT 0")
+
+    for event in ('INSERT', 'UPDATE'):
+        trigger = f"students_percentage_before_{event.lower()}"
+        m.replace_trigger(trigger, f"""
+            CREATE TRIGGER {trigger} BEFORE {event} ON students FOR EACH ROW
+            SET NEW.effective_percentage = {STUDENT_PERCENTAGE_EXPRESSION}
+        """, "effective_percentage")
+    m.replace_trigger('attendance_counts_after_insert', """
+        CREATE TRIGGER attendance_counts_after_insert AFTER INSERT ON attendance FOR EACH ROW
+            UPDATE students
+            SET total_periods = total_periods + 1,
+                attended_periods = attended_periods + IFNULL(NEW.status IN ('Present', 'On Duty'), 0)
+            WHERE id = NEW.student_id
+    """, "total_periods")
+    m.replace_trigger('attendance_counts_after_update', """
+        CREATE TRIGGER attendance_counts_after_update AFTER UPDATE ON attendance FOR EACH ROW
+            UPDATE students
+            SET attended_periods = attended_periods + IFNULL(NEW.status IN ('Present', 'On Duty'), 0)
+                                                    - IFNULL(OLD.status IN ('Present', 'On Duty'), 0)
+            WHERE id = NEW.student_id AND NOT (OLD.status <=> NEW.status)
+    """, "attended_periods")
+    m.replace_trigger('attendance_counts_after_delete', """
+        CREATE TRIGGER attendance_counts_after_delete AFTER DELETE ON attendance FOR EACH ROW
+            UPDATE students
+            SET total_periods = total_periods - 1,
+                attended_periods = attended_periods - IFNULL(OLD.status IN ('Present', 'On Duty'), 0)
+            WHERE id = OLD.student_id AND @attendance_packing IS NULL
+    """, "@attendance_packing")
+
+    # Triggers first: marks arriving during the backfill are counted either way, and every
+    # backfilled row gets its effective_percentage from the BEFORE UPDATE trigger
+    m.backfill('students', """
+        total_periods = (SELECT COUNT(*) FROM attendance a WHERE a.student_id = students.id),
+        attended_periods = (SELECT COALESCE(SUM(a.status IN ('Present', 'On Duty')), 0)
+                            FROM attendance a WHERE a.student_id = students.id)
+    """)
+    m.cursor.execute("SELECT 1 as found FROM attendance_sessions LIMIT 1")
+    if m.cursor.fetchone():
+        print("    packed sessions are not in the attendance table: run `flask check-percentages --repair`")
+
+@migration(11, "create jobs")
+def create_jobs(m):
+    m.create_table('jobs', """
+        CREATE TABLE jobs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            job_type VARCHAR(50) NOT NULL,
+            params TEXT NOT NULL,
+            state ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+            attempts INT NOT NULL DEFAULT 0,
+            max_attempts INT NOT NULL DEFAULT 3,
+            run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            worker VARCHAR(100) DEFAULT NULL,
+            heartbeat_at TIMESTAMP DEFAULT NULL,
+            progress_done INT DEFAULT NULL,
+            progress_total INT DEFAULT NULL,
+            progress_message VARCHAR(255) DEFAULT NULL,
+            result_file VARCHAR(255) DEFAULT NULL,
+            result_message VARCHAR(255) DEFAULT NULL,
+            error TEXT,
+            created_by INT DEFAULT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP DEFAULT NULL,
+            finished_at TIMESTAMP DEFAULT NULL,
+            KEY idx_jobs_queue (state, run_after),
+            KEY idx_jobs_created (created_at),
+            FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL
+        )
+    """)
+
+# --- Runner ---
+
+def connect():
+    return mysql.connector.connect(
+        host=Config.DB_HOST,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        database=Config.DB_NAME,
+        port=Config.DB_PORT,
+        autocommit=True
+    )
+
+def schema_triggers(schema_file=SCHEMA_FILE):
+    """(name, CREATE TRIGGER statement) of every trigger in database.sql, in file order."""
+    with open(schema_file, encoding='utf-8') as f:
+        script = re.sub(r"--[^\n]*", "", f.read())
+    triggers = []
+    for statement in script.split(';'):
+        match = re.match(r"\s*CREATE TRIGGER (\w+)", statement)
+        if match:
+            triggers.append((match.group(1), statement.strip()))
+    return triggers
+
+def repair_triggers(m):
+    """
+    Recreates the database.sql triggers that are missing, e.g. the attendance
+    insert triggers after a bulk load (seed_synthetic.py) was killed before
+    restoring them. Existing triggers are left as they are.
+    """
+    missing = [(name, ddl) for name, ddl in schema_triggers() if m.trigger_statement(name) is None]
+    for name, ddl in missing:
+        print(f"{'[dry run] ' if m.dry_run else ''}recreating trigger {name}")
+        m.execute(ddl)
+    return [name for name, _ in missing]
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {r['version'] for r in cursor.fetchall()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dry-run', action='store_true', help='Print pending changes without applying them.')
+    parser.add_argument('--status', action='store_true', help='List applied and pending migrations.')
+    parser.add_argument('--allow-locking', action='store_true',
+                        help='Allow ALTERs that cannot run online (table copy with locks).')
+    parser.add_argument('--target', type=int, default=None, help='Stop after this version.')
+    parser.add_argument('--repair-triggers', action='store_true',
+                        help='Recreate missing triggers (all migrations must be applied).')
+    args = parser.parse_args()
+
+    versions = [version for version, _, _ in MIGRATIONS]
+    if versions != sorted(set(versions)):
+        raise SystemExit("Migration versions must be unique and in ascending order.")
+
+    db = connect()
+    m = Migrator(db, dry_run=args.dry_run, allow_locking=args.allow_locking)
+    cursor = m.cursor
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_ms INT NOT NULL
+        )
+    """)
+    applied = applied_versions(cursor)
+    pending = [(v, n, fn) for v, n, fn in MIGRATIONS
+               if v not in applied and (args.target is None or v <= args.target)]
+
+    if args.status:
+        for version, name, _ in MIGRATIONS:
+            print(f"{version:4d}  {'applied' if version in applied else 'pending':8}  {name}")
+        return
+
+    if args.repair_triggers:
+        if pending:
+            raise SystemExit("Apply the pending migrations first; they create the triggers of their versions.")
+        # Not while a bulk load has its triggers dropped: it restores them itself
+        cursor.execute("SELECT GET_LOCK(%s, 0) as got", (LOAD_LOCK_NAME,))
+        if not cursor.fetchone()['got']:
+            raise SystemExit("A bulk load is running; it restores its triggers when it finishes.")
+        try:
+            repaired = repair_triggers(m)
+            print(f"{len(repaired)} triggers recreated." if repaired else "All triggers are present.")
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOAD_LOCK_NAME,))
+            cursor.fetchall()
+            db.close()
+        return
+
+    if not pending:
+        print("Database is up to date.")
+        return
+
+    # One runner at a time (deploy scripts on several hosts)
+    cursor.execute("SELECT GET_LOCK(%s, 0) as got", (LOCK_NAME,))
+    if not cursor.fetchone()['got']:
+        raise SystemExit("Another migration run holds the lock; try again when it finishes.")
+
+    try:
+        for version, name, fn in pending:
+            print(f"{'[dry run] ' if args.dry_run else ''}{version:4d}  {name}")
+            started = time.time()
+            try:
+                fn(m)
+            except (mysql.connector.Error, MigrationError) as err:
+                print(f"Migration {version} failed: {err}", file=sys.stderr)
+                print("Earlier versions stay applied; fix the cause and re-run.", file=sys.stderr)
+                sys.exit(1)
+            if not args.dry_run:
+                cursor.execute("INSERT INTO schema_migrations (version, name, duration_ms) VALUES (%s, %s, %s)",
+                               (version, name, int((time.time() - started) * 1000)))
+        print("Dry run complete; nothing was changed." if args.dry_run else "Migrations complete.")
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        cursor.fetchall()
+        db.close()
+
+if __name__ == "__main__":
+    main()
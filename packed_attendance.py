@@ -0,0 +1,309 @@
+"""
+Compact status-vector storage for attendance sessions.
+
+The row layout stores one `attendance` row per student per period (id, two
+foreign keys, date, status, marked_at plus the unique index), roughly 60-100
+bytes each. The packed layout stores one `attendance_sessions` row per
+(subject, date) with a 2-bit-per-student status vector. Positions in the
+vector refer to a frozen roster snapshot (`attendance_rosters` /
+`attendance_roster_members`), and identical rosters are shared by every
+session of a class, so a 60-student period costs 15 bytes plus the session key.
+
+Packing is meant for closed terms (freeze them with `flask snapshot-term`
+first): `flask pack-attendance` copies sessions into vectors, and with
+ATTENDANCE_STORAGE = 'packed' the per-student accessors below read vectors plus
+any rows not yet packed. Packing is additive: institution-wide aggregates
+(analytics, eligibility, term snapshots, exports) read only the row table, so
+the rows of packed sessions are kept and corrections update both.
+"""
+import hashlib
+import time
+from array import array
+
+import mysql.connector
+
+# 2-bit codes. 0 means "no period for this student" (not on the roll that day).
+STATUS_CODES = {'Present': 1, 'Absent': 2, 'On Duty': 3}
+CODE_STATUSES = {1: 'Present', 2: 'Absent', 3: 'On Duty'}
+ATTENDED_CODES = (1, 3)
+# Rows with a NULL status count as a period but not as attended, exactly like Absent
+NULL_STATUS_CODE = 2
+
+def pack_statuses(codes):
+    """Packs a sequence of 2-bit codes, 4 students per byte, position 0 in the low bits."""
+    packed = bytearray((len(codes) + 3) // 4)
+    for position, code in enumerate(codes):
+        packed[position >> 2] |= (code & 3) << ((position & 3) * 2)
+    return bytes(packed)
+
+def unpack_statuses(packed, count):
+    return [(packed[position >> 2] >> ((position & 3) * 2)) & 3 for position in range(count)]
+
+def status_at(packed, position):
+    return (packed[position >> 2] >> ((position & 3) * 2)) & 3
+
+def set_status_at(packed, position, code):
+    shift = (position & 3) * 2
+    packed[position >> 2] = (packed[position >> 2] & ~(3 << shift) & 0xFF) | ((code & 3) << shift)
+
+# --- Rosters ---
+
+def roster_id_for(cursor, student_ids):
+    """Returns the id of the frozen roster for these (sorted) students, creating it once."""
+    members = array('I', student_ids).tobytes()
+    roster_hash = hashlib.sha1(members).hexdigest()
+
+    cursor.execute("SELECT id FROM attendance_rosters WHERE roster_hash = %s", (roster_hash,))
+    row = cursor.fetchone()
+    if row:
+        return row['id']
+
+    cursor.execute("INSERT INTO attendance_rosters (roster_hash, student_count) VALUES (%s, %s)",
+                   (roster_hash, len(student_ids)))
+    roster_id = cursor.lastrowid
+    cursor.executemany("""
+        INSERT INTO attendance_roster_members (roster_id, position, student_id)
+        VALUES (%s, %s, %s)
+    """, [(roster_id, position, sid) for position, sid in enumerate(student_ids)])
+    return roster_id
+
+# --- Migration (rows -> vectors) ---
+
+def pack_subject(db, cursor, subject_id, before_date):
+    """
+    Packs every unpacked session of one subject dated before `before_date`, one
+    transaction per session; the rows stay. Returns (sessions, student_periods) packed.
+    """
+    cursor.execute("""
+        SELECT a.date, a.student_id, a.status
+        FROM attendance a
+        WHERE a.subject_id = %s AND a.date < %s
+          AND NOT EXISTS (SELECT 1 FROM attendance_sessions se
+                          WHERE se.subject_id = a.subject_id AND se.date = a.date)
+        ORDER BY a.date, a.student_id
+    """, (subject_id, before_date))
+    rows = cursor.fetchall()
+
+    sessions = {}
+    for r in rows:
+        sessions.setdefault(r['date'], []).append(r)
+
+    for date, session_rows in sessions.items():
+        student_ids = [r['student_id'] for r in session_rows]
+        codes = [STATUS_CODES.get(r['status'], NULL_STATUS_CODE) for r in session_rows]
+
+        db.start_transaction()
+        try:
+            roster_id = roster_id_for(cursor, student_ids)
+            cursor.execute("""
+                INSERT INTO attendance_sessions (subject_id, date, roster_id, statuses)
+                VALUES (%s, %s, %s, %s)
+            """, (subject_id, date, roster_id, pack_statuses(codes)))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    return len(sessions), len(rows)
+
+# --- Accessors used by the routes when ATTENDANCE_STORAGE = 'packed' ---
+
+# Status vector + roster position of every packed session a student appears in
+STUDENT_VECTORS_QUERY = """
+    SELECT m.position, se.statuses, se.date, sub.name as subject_name, sub.code as subject_code
+    FROM attendance_roster_members m
+    JOIN attendance_sessions se ON se.roster_id = m.roster_id
+    JOIN subjects sub ON se.subject_id = sub.id
+    WHERE m.student_id = %s
+"""
+
+# Rows of sessions that have not been packed yet
+UNPACKED_ROWS_CONDITION = """
+    NOT EXISTS (SELECT 1 FROM attendance_sessions se
+                WHERE se.subject_id = a.subject_id AND se.date = a.date)
+"""
+
+UNPACKED_COUNTS_QUERY = """
+    SELECT COUNT(*) as total_periods,
+           COALESCE(SUM(a.status IN ('Present', 'On Duty')), 0) as attended_periods
+    FROM attendance a
+    WHERE a.student_id = %s AND """ + UNPACKED_ROWS_CONDITION
+
+UNPACKED_HISTORY_QUERY = """
+    SELECT a.date, a.status, s.name as subject_name, s.code as subject_code
+    FROM attendance a
+    JOIN subjects s ON a.subject_id = s.id
+    WHERE a.student_id = %s AND """ + UNPACKED_ROWS_CONDITION
+
+# The pure functions below are shared with the async API tier (aiomysql)
+
+def counts_from_vectors(vector_rows, unpacked_counts):
+    """(attended_periods, total_periods) from STUDENT_VECTORS_QUERY + UNPACKED_COUNTS_QUERY results."""
+    attended_periods = int(unpacked_counts['attended_periods'])
+    total_periods = int(unpacked_counts['total_periods'])
+    for r in vector_rows:
+        code = status_at(r['statuses'], r['position'])
+        if code:
+            total_periods += 1
+            if code in ATTENDED_CODES:
+                attended_periods += 1
+    return attended_periods, total_periods
+
+def history_from_vectors(vector_rows, unpacked_rows):
+    """Same shape as the student_attendance_history query, newest first."""
+    history = list(unpacked_rows)
+    for r in vector_rows:
+        code = status_at(r['statuses'], r['position'])
+        if code:
+            history.append({'date': r['date'], 'status': CODE_STATUSES[code],
+                            'subject_name': r['subject_name'], 'subject_code': r['subject_code']})
+    history.sort(key=lambda h: h['date'], reverse=True)
+    return history
+
+def student_counts(cursor, student_id):
+    cursor.execute(STUDENT_VECTORS_QUERY, (student_id,))
+    vector_rows = cursor.fetchall()
+    cursor.execute(UNPACKED_COUNTS_QUERY, (student_id,))
+    return counts_from_vectors(vector_rows, cursor.fetchone())
+
+def student_history(cursor, student_id):
+    cursor.execute(STUDENT_VECTORS_QUERY, (student_id,))
+    vector_rows = cursor.fetchall()
+    cursor.execute(UNPACKED_HISTORY_QUERY, (student_id,))
+    return history_from_vectors(vector_rows, cursor.fetchall())
+
+def session_exists(cursor, subject_id, date):
+    cursor.execute("SELECT 1 as found FROM attendance_sessions WHERE subject_id = %s AND date = %s",
+                   (subject_id, date))
+    return cursor.fetchone() is not None
+
+def session_statuses(cursor, subject_id, date):
+    """{student_id: status} of a packed session, or None if the session is not packed."""
+    cursor.execute("""
+        SELECT se.statuses, m.position, m.student_id
+        FROM attendance_sessions se
+        JOIN attendance_roster_members m ON m.roster_id = se.roster_id
+        WHERE se.subject_id = %s AND se.date = %s
+    """, (subject_id, date))
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    return {r['student_id']: CODE_STATUSES.get(status_at(r['statuses'], r['position']))
+            for r in rows}
+
+_stored_counts = False
+
+def stored_counts_exist(cursor):
+    """Whether students carries total/attended_periods yet (migration 10); remembered once seen."""
+    global _stored_counts
+    if not _stored_counts:
+        try:
+            cursor.execute("SELECT total_periods, attended_periods FROM students LIMIT 0")
+            cursor.fetchall()
+            _stored_counts = True
+        except mysql.connector.Error:
+            pass
+    return _stored_counts
+
+def update_session_statuses(db, cursor, subject_id, date, updates):
+    """
+    Applies {student_id: status} corrections to a packed session (read-modify-write
+    under a row lock). The session's attendance rows are corrected too, so their
+    triggers log the change and adjust the stored counts; periods without a row
+    are logged and counted here. Returns the student ids that are not on the
+    session's frozen roster.
+    """
+    stored_counts = stored_counts_exist(cursor)
+    db.start_transaction()
+    try:
+        cursor.execute("""
+            SELECT roster_id, statuses FROM attendance_sessions
+            WHERE subject_id = %s AND date = %s FOR UPDATE
+        """, (subject_id, date))
+        session_row = cursor.fetchone()
+        cursor.execute("SELECT position, student_id FROM attendance_roster_members WHERE roster_id = %s",
+                       (session_row['roster_id'],))
+        positions = {r['student_id']: r['position'] for r in cursor.fetchall()}
+        cursor.execute("SELECT id, student_id, status FROM attendance WHERE subject_id = %s AND date = %s FOR UPDATE",
+                       (subject_id, date))
+        rows = {r['student_id']: r for r in cursor.fetchall()}
+
+        packed = bytearray(session_row['statuses'])
+        vector_changed = False
+        row_updates = []
+        changes = []
+        counts = [] # Stored percentages (stored_percentages.py): no trigger sees a vector change
+        missing = []
+        for student_id, status in updates.items():
+            position = positions.get(int(student_id))
+            if position is None:
+                missing.append(student_id)
+                continue
+            row = rows.get(int(student_id))
+            if row is not None and row['status'] != status:
+                row_updates.append((status, row['id']))
+            code = STATUS_CODES.get(status, NULL_STATUS_CODE)
+            old_code = status_at(packed, position)
+            if old_code != code:
+                set_status_at(packed, position, code)
+                vector_changed = True
+                if row is None:
+                    changes.append((0, student_id, subject_id, date, status, 'update'))
+                    counts.append((int(old_code == 0),
+                                   int(code in ATTENDED_CODES) - int(old_code in ATTENDED_CODES), student_id))
+
+        if vector_changed:
+            cursor.execute("UPDATE attendance_sessions SET statuses = %s WHERE subject_id = %s AND date = %s",
+                           (bytes(packed), subject_id, date))
+        if row_updates:
+            cursor.executemany("UPDATE attendance SET status = %s WHERE id = %s", row_updates)
+        if changes:
+            # attendance_id 0: the period lives only in the packed session (its row was archived by hand)
+            cursor.executemany("""
+                INSERT INTO attendance_changes (attendance_id, student_id, subject_id, date, status, change_type)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, changes)
+        if changes and stored_counts:
+            cursor.executemany("""
+                UPDATE students
+                SET total_periods = total_periods + %s, attended_periods = attended_periods + %s
+                WHERE id = %s
+            """, counts)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return missing
+
+# --- Size / latency comparison ---
+
+def storage_report(cursor, database, sample_student_ids):
+    """Table sizes of both layouts (the packed tables are stored in addition to the rows) and
+    average per-student read latency of each."""
+    cursor.execute("""
+        SELECT table_name as table_name, table_rows as table_rows,
+               data_length + index_length as total_bytes
+        FROM information_schema.tables
+        WHERE table_schema = %s
+          AND table_name IN ('attendance', 'attendance_sessions', 'attendance_rosters', 'attendance_roster_members')
+    """, (database,))
+    sizes = {r['table_name']: r for r in cursor.fetchall()}
+
+    def timed(read):
+        started = time.perf_counter()
+        for sid in sample_student_ids:
+            read(sid)
+        return (time.perf_counter() - started) * 1000.0 / max(1, len(sample_student_ids))
+
+    def row_counts(sid):
+        cursor.execute("""
+            SELECT COUNT(*) as total_periods, SUM(status IN ('Present', 'On Duty')) as attended_periods
+            FROM attendance WHERE student_id = %s
+        """, (sid,))
+        cursor.fetchone()
+
+    return {
+        'sizes': sizes,
+        'row_read_ms': timed(row_counts),
+        'packed_read_ms': timed(lambda sid: student_counts(cursor, sid)),
+    }
@@ -0,0 +1,115 @@
+"""
+Repository of the statements every request repeats (staff lookup, subject
+checks, class rosters, per-student counts), run as server-side prepared
+statements.
+
+    q = Queries(db)
+    subject = q.one('staff_subject', (subject_id, staff_id))
+    student_ids = q.column('class_roster_ids', (dept_id, year, batch), cast=int)
+
+MySQL parses and plans a prepared statement once; later executions only send
+the parameters (binary protocol). The prepared cursors are cached on the
+connection itself, so they last as long as it does: one request with
+per-request connections, or many requests when DB_POOL_SIZE keeps pooled
+connections open. A reconnect (new connection id) discards the cache.
+
+`python bench_prepared_statements.py` compares this with the text protocol.
+"""
+from mysql.connector.pooling import PooledMySQLConnection
+
+from attendance_calc import STUDENT_COUNTS_QUERY
+
+STATEMENTS = {
+    'user_by_username': "SELECT * FROM users WHERE username = %s",
+    'staff_id_for_user': "SELECT id FROM staff WHERE user_id = %s",
+    'subject': "SELECT * FROM subjects WHERE id = %s",
+    'staff_subject': "SELECT * FROM subjects WHERE id = %s AND staff_id = %s",
+    'class_students': """
+        SELECT * FROM students
+        WHERE department_id = %s AND current_year = %s AND batch = %s
+        ORDER BY register_no
+    """,
+    'class_roster_ids': """
+        SELECT id FROM students
+        WHERE department_id = %s AND current_year = %s AND batch = %s
+    """,
+    'student_override': "SELECT admin_override_percentage FROM students WHERE id = %s",
+    'student_counts': STUDENT_COUNTS_QUERY,
+    'student_stored_counts': "SELECT attended_periods, total_periods FROM students WHERE id = %s",
+    'student_effective_percentage': "SELECT effective_percentage FROM students WHERE id = %s",
+    'student_subject_counts': """
+        SELECT s.code as subject_code, s.name as subject_name, COUNT(*) as total_periods,
+               COALESCE(SUM(a.status IN ('Present', 'On Duty')), 0) as attended_periods
+        FROM attendance a
+        JOIN subjects s ON a.subject_id = s.id
+        WHERE a.student_id = %s
+        GROUP BY s.id, s.code, s.name
+        ORDER BY s.code
+    """,
+    'student_for_user': """
+        SELECT s.*,
+               (SELECT MAX(c.seq) FROM attendance_changes c WHERE c.student_id = s.id) as data_seq,
+               (SELECT v.version FROM data_versions v WHERE v.name = 'subjects') as subjects_version
+        FROM students s
+        WHERE s.user_id = %s
+    """,
+    'data_versions': "SELECT name, version FROM data_versions",
+    'data_version': "SELECT version FROM data_versions WHERE name = %s",
+}
+
+def _statement_cache(db):
+    # Pooled connections are wrappers around the real connection; cache on the real one.
+    # (Not getattr(db, '_cnx'): a plain C-extension connection has a _cnx too, the C handle.)
+    # The attribute name is ours: the connector keeps its own _prepared_statements.
+    cnx = db._cnx if isinstance(db, PooledMySQLConnection) else db
+    connection_id = getattr(cnx, 'connection_id', None)
+    cache = getattr(cnx, '_attendance_stmt_cache', None)
+    if cache is None or cache[0] != connection_id:
+        cache = (connection_id, {})
+        cnx._attendance_stmt_cache = cache
+    return cache[1]
+
+class Queries:
+    def __init__(self, db, prepared=True):
+        self.db = db
+        self.prepared = prepared
+        self.text_cursor = None
+
+    def _execute(self, name, params):
+        sql = STATEMENTS[name]
+        if not self.prepared:
+            if self.text_cursor is None:
+                self.text_cursor = self.db.cursor(dictionary=True)
+            self.text_cursor.execute(sql, params)
+            return self.text_cursor
+        cache = _statement_cache(self.db)
+        cursor = cache.get(name)
+        if cursor is None:
+            cursor = cache[name] = self.db.cursor(prepared=True, dictionary=True)
+        # Same string object as last time: the cursor reuses its prepared statement
+        cursor.execute(sql, params)
+        return cursor
+
+    def all(self, name, params=()):
+        """List of row dicts."""
+        return self._execute(name, params).fetchall()
+
+    def one(self, name, params=()):
+        """First row dict, or None. Always drains the result so the connection stays usable."""
+        rows = self.all(name, params)
+        return rows[0] if rows else None
+
+    def value(self, name, params=(), cast=None, default=None):
+        """First column of the first row (converted with cast), or default."""
+        row = self.one(name, params)
+        if row is None:
+            return default
+        value = next(iter(row.values()))
+        if value is None:
+            return default
+        return cast(value) if cast else value
+
+    def column(self, name, params=(), cast=None):
+        """First column of every row."""
+        values = [next(iter(row.values())) for row in self.all(name, params)]
+        return [cast(v) for v in values] if cast else values
@@ -0,0 +1,122 @@
+"""
+Per-request timing: a Server-Timing header on every response and one JSON log
+line per request.
+
+    Server-Timing: db-connect;dur=1.8, db;dur=6.2;desc="9 queries", render;dur=4.1, app;dur=3.0, total;dur=15.1
+
+db-connect  getting the request connection (get_db)
+db          executing statements and fetching rows (sql_timing.py), including
+            queries run from templates (LazyRows)
+render      template rendering, without the queries it ran
+app         everything else: Python in the views, hooks, session handling
+
+Browsers show the header in the network panel (timing tab). The log line
+carries the same numbers plus route, status, role, the replica route and any
+admin action the request performed (log_event writes the same line for actions
+run by background jobs). It
+is handed to a QueueHandler, so the request thread only puts the record on a
+queue; a listener thread in each worker process formats it and writes it to
+REQUEST_LOG_FILE (or stderr). Streamed responses (CSV exports) are timed up
+to the start of the body.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from datetime import datetime, timezone
+
+from flask import g, request, session
+
+import sql_timing
+
+logger = logging.getLogger('attendance.requests')
+
+_queue = queue.SimpleQueue()
+_listener = None
+_listener_pid = None
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.msg, separators=(',', ':'), default=str)
+
+class _Enqueue(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        return record # Formatting happens on the listener thread, not the request thread
+
+def _start_listener(log_file):
+    # Per process: a listener thread started before gunicorn forks does not exist in the workers
+    global _listener, _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    handler = logging.handlers.WatchedFileHandler(log_file) if log_file else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(_JsonFormatter())
+    _listener = logging.handlers.QueueListener(_queue, handler)
+    _listener.start()
+    _listener_pid = os.getpid()
+    atexit.register(_listener.stop)
+
+def init_app(app):
+    if not (app.config['SERVER_TIMING'] or app.config['REQUEST_LOG']):
+        return
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if app.config['REQUEST_LOG'] and not logger.handlers:
+        logger.addHandler(_Enqueue(_queue))
+
+    @app.before_request
+    def start_request_timing():
+        g.request_started = time.perf_counter()
+        sql_timing.begin()
+
+    @app.after_request
+    def finish_request_timing(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        total_ms = (time.perf_counter() - started) * 1000.0
+        queries, db_ms = sql_timing.totals()
+        connect_ms = g.get('db_connect_ms', 0.0)
+        render_ms = g.get('render_ms', 0.0)
+        app_ms = max(0.0, total_ms - connect_ms - db_ms - render_ms)
+
+        if app.config['SERVER_TIMING']:
+            response.headers['Server-Timing'] = (
+                f'db-connect;dur={connect_ms:.1f}, db;dur={db_ms:.1f};desc="{queries} queries", '
+                f'render;dur={render_ms:.1f}, app;dur={app_ms:.1f}, total;dur={total_ms:.1f}')
+
+        if app.config['REQUEST_LOG']:
+            _start_listener(app.config['REQUEST_LOG_FILE'])
+            logger.info({
+                'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+                'method': request.method,
+                'path': request.path,
+                'route': request.endpoint,
+                'status': response.status_code,
+                'role': session.get('role'),
+                'user_id': session.get('user_id'),
+                'total_ms': round(total_ms, 2),
+                'db_connect_ms': round(connect_ms, 2),
+                'db_ms': round(db_ms, 2),
+                'queries': queries,
+                'render_ms': round(render_ms, 2),
+                'app_ms': round(app_ms, 2),
+                'db_route': g.get('db_route'),
+                'admin_action': g.get('admin_action'),
+                'pid': os.getpid(),
+            })
+        return response
+
+def log_event(app, **fields):
+    """One JSON log line from outside a request (background jobs, CLI commands)."""
+    if not app.config['REQUEST_LOG']:
+        return
+    _start_listener(app.config['REQUEST_LOG_FILE'])
+    logger.info({
+        'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+        **fields,
+        'pid': os.getpid(),
+    })
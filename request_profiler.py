@@ -0,0 +1,148 @@
+"""
+Opt-in sampling profiler for single requests (admins only).
+
+An admin adds ?profile=1 to a URL (or sends the header X-Profile: 1). While
+that request runs, a background thread samples the request thread's stack
+every PROFILE_INTERVAL_MS and the request's SQL statements are timed
+(sql_timing.py). Sampling keeps the overhead low and independent of how many
+Python calls the page makes, unlike a tracing profiler.
+
+Each profile is saved in PROFILE_DIR as two files:
+    <name>.folded   collapsed stacks ("frame;frame;frame count"), the input of
+                    flamegraph.pl, speedscope and similar viewers
+    <name>.json     route, timings, hot frames and per-statement SQL timings
+
+Only the newest PROFILE_KEEP profiles are kept. /admin/profiles lists them.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+TOP_FRAMES = 25
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    def __init__(self, interval):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+        self.duration_ms = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration_ms = (time.perf_counter() - self.started) * 1000.0
+
+def hot_frames(stacks, limit=TOP_FRAMES):
+    """[(frame, self samples, total samples)], most self time first; total counts each stack once."""
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        own[stack[-1]] += count
+        for label in set(stack):
+            total[label] += count
+    frames = sorted(total, key=lambda label: (own[label], total[label]), reverse=True)
+    return [(label, own[label], total[label]) for label in frames[:limit]]
+
+def sql_statements(log):
+    """[{'sql', 'calls', 'ms', 'rows'}] aggregated by statement text, slowest first."""
+    grouped = {}
+    for sql, ms, rows in log:
+        sql = " ".join(str(sql).split())
+        entry = grouped.setdefault(sql, {'sql': sql, 'calls': 0, 'ms': 0.0, 'rows': 0})
+        entry['calls'] += 1
+        entry['ms'] += ms
+        entry['rows'] += rows
+    return sorted(grouped.values(), key=lambda e: e['ms'], reverse=True)
+
+def save(directory, keep, profiler, sql_log, endpoint, method, path, status):
+    """Writes <name>.folded and <name>.json, prunes old profiles and returns the name."""
+    os.makedirs(directory, exist_ok=True)
+    now = datetime.now()
+    name = f"{now:%Y%m%d-%H%M%S-%f}-{endpoint or 'unknown'}-{os.getpid()}"
+
+    with open(os.path.join(directory, name + '.folded'), 'w', encoding='utf-8') as f:
+        for stack, count in profiler.stacks.most_common():
+            f.write(f"{';'.join(stack)} {count}\n")
+
+    statements = sql_statements(sql_log)
+    meta = {
+        'name': name,
+        'created': now.isoformat(timespec='seconds'),
+        'endpoint': endpoint,
+        'method': method,
+        'path': path,
+        'status': status,
+        'duration_ms': profiler.duration_ms,
+        'interval_ms': profiler.interval * 1000.0,
+        'samples': profiler.samples,
+        'sql_count': len(sql_log),
+        'sql_ms': sum(e['ms'] for e in statements),
+        'sql': statements,
+        'hot_frames': hot_frames(profiler.stacks),
+    }
+    with open(os.path.join(directory, name + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+    for old in list_profiles(directory)[keep:]:
+        for suffix in ('.json', '.folded'):
+            try:
+                os.remove(os.path.join(directory, old['name'] + suffix))
+            except OSError:
+                pass
+    return name
+
+def list_profiles(directory, endpoint=None):
+    """Saved profiles (metadata), newest first."""
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(directory), reverse=True):
+        if not filename.endswith('.json'):
+            continue
+        meta = load(directory, filename[:-len('.json')])
+        if meta and (endpoint is None or meta['endpoint'] == endpoint):
+            profiles.append(meta)
+    return profiles
+
+def load(directory, name):
+    try:
+        with open(os.path.join(directory, os.path.basename(name) + '.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None # Pruned by another worker, or still being written
+
+def combined_hot_frames(directory, profiles, limit=TOP_FRAMES):
+    """Hot frames over several profiles (e.g. every saved profile of one route)."""
+    stacks = Counter()
+    for meta in profiles:
+        try:
+            with open(os.path.join(directory, meta['name'] + '.folded'), encoding='utf-8') as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    stacks[tuple(stack.split(';'))] += int(count)
+        except (OSError, ValueError):
+            continue
+    return hot_frames(stacks, limit), sum(stacks.values())
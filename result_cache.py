@@ -0,0 +1,258 @@
+"""
+Computed-result cache shared by every worker process on a node (effective
+percentages, per-subject breakdowns).
+
+The cache is one memory-mapped file (RESULT_CACHE_PATH) that each gunicorn
+worker, `flask attendance-writer` and the CLI map into memory, so a value one
+worker computed is a hit in all the others and survives worker restarts.
+The app only uses it with RESULT_CACHE=1 (off by default); `flask result-cache`
+shows its hit ratio.
+
+    cache = SharedCache(path, size_bytes=16 << 20, entry_bytes=1024, ttl=120)
+    found, value, token = cache.lookup('percentage', student_id)
+    if not found:
+        value = compute()
+        cache.store('percentage', student_id, value, token)
+    ...
+    cache.invalidate([student_id])   # after the write to that student commits
+
+Layout: a header (layout, counters), a table of per-student generation
+counters, then the entry slots. Slots are grouped in sets of WAYS; a key can
+only live in its own set and the least recently used slot of the set is
+evicted (LRU per set, like a CPU cache), so a lookup or store reads at most
+WAYS slot headers. Values are JSON; ones larger than entry_bytes are not
+cached. The file size is the size limit: it never grows.
+
+Invalidation does not search for keys. Every entry records the generation of
+its student when the value was read from the database; invalidate() bumps the
+generation, which turns every key of that student (any kind) into a miss, and
+clear() bumps the epoch for everything. lookup() hands out the generation it
+saw and store() drops the value if the student was invalidated in between, so
+a request that computed from old data cannot put it back after a write.
+Students share a generation counter when their ids are GENERATIONS apart;
+that only causes extra misses.
+
+Every operation holds an exclusive lock on the file (fcntl.flock) plus a
+thread lock, for a few microseconds. Entries are also dropped after ttl
+seconds: writes made on other nodes never reach this node's file.
+
+Changing the size settings rebuilds the file; restart every process using it.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError: # Windows: single-process development server, thread lock only
+    fcntl = None
+
+MAGIC = b'ATTRC001'
+WAYS = 8
+GENERATIONS = 65536
+
+# magic, sets, entry_bytes, then counters: epoch, clock, hits, misses, stores, evictions, invalidations, too_large
+HEADER = struct.Struct('<8sII8Q')
+HEADER_BYTES = 128
+COUNTERS = ('epoch', 'clock', 'hits', 'misses', 'stores', 'evictions', 'invalidations', 'too_large')
+COUNTER_OFFSET = {name: 16 + 8 * i for i, name in enumerate(COUNTERS)}
+GENERATION = struct.Struct('<Q')
+# key hash, epoch, generation, last used (clock), stored at, generation index, payload length
+SLOT = struct.Struct('<QQQQdII')
+
+def _key_hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+class SharedCache:
+    def __init__(self, path, size_bytes, entry_bytes, ttl):
+        self.path = path
+        self.entry_bytes = entry_bytes
+        self.slot_bytes = SLOT.size + entry_bytes
+        self.slots_offset = HEADER_BYTES + GENERATION.size * GENERATIONS
+        self.sets = max(1, (size_bytes - self.slots_offset) // (self.slot_bytes * WAYS))
+        self.size_bytes = self.slots_offset + self.sets * WAYS * self.slot_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._map = None
+        self._file = None
+        self._pid = None
+
+    # --- File and locking ---
+
+    def _mapped(self):
+        # Per process: a flock taken through a descriptor inherited across fork would not
+        # exclude the parent, so every worker opens and maps the file itself
+        while self._pid != os.getpid():
+            f = open(self.path, 'a+b')
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if os.fstat(f.fileno()).st_ino != os.stat(self.path).st_ino:
+                    f.close() # Replaced by another process while we waited for the lock
+                    continue
+                f.seek(0)
+                header = f.read(HEADER.size)
+                if (len(header) == HEADER.size and os.fstat(f.fileno()).st_size == self.size_bytes and
+                        HEADER.unpack(header)[:3] == (MAGIC, self.sets, self.entry_bytes)):
+                    self._file, self._map = f, mmap.mmap(f.fileno(), self.size_bytes)
+                    self._pid = os.getpid()
+                else:
+                    # New, or another layout: build a fresh file and rename it into place, so
+                    # processes still mapping the old one never see it shrink under them
+                    self._build()
+                    f.close()
+            finally:
+                if fcntl and not f.closed:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        return self._map
+
+    def _build(self):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, self.sets, self.entry_bytes, *([0] * len(COUNTERS))))
+            f.truncate(self.size_bytes) # Sparse, reads as zeros: every slot empty
+        os.replace(temp_path, self.path)
+
+    def _locked(self):
+        return _FileLock(self)
+
+    def _counter(self, m, name):
+        return GENERATION.unpack_from(m, COUNTER_OFFSET[name])[0]
+
+    def _add(self, m, name, amount=1):
+        offset = COUNTER_OFFSET[name]
+        value = GENERATION.unpack_from(m, offset)[0] + amount
+        GENERATION.pack_into(m, offset, value)
+        return value
+
+    def _generation(self, m, index):
+        return GENERATION.unpack_from(m, HEADER_BYTES + GENERATION.size * index)[0]
+
+    def _live(self, m, slot, epoch, now):
+        key_hash, slot_epoch, generation, _, stored_at, gen_index, _ = slot
+        return (key_hash and slot_epoch == epoch and now - stored_at < self.ttl and
+                generation == self._generation(m, gen_index))
+
+    def _set_slots(self, key_hash):
+        first = self.slots_offset + (key_hash % self.sets) * WAYS * self.slot_bytes
+        return range(first, first + WAYS * self.slot_bytes, self.slot_bytes)
+
+    # --- Reads and writes ---
+
+    def lookup(self, kind, student_id):
+        """(found, value, token); pass token to store() after computing a missing value."""
+        key = f"{kind}:{student_id}"
+        key_hash = _key_hash(key)
+        gen_index = int(student_id) % GENERATIONS
+        now = time.time()
+        payload = None
+        with self._locked() as m:
+            epoch = self._counter(m, 'epoch')
+            token = (epoch, self._generation(m, gen_index))
+            for offset in self._set_slots(key_hash):
+                slot = SLOT.unpack_from(m, offset)
+                if slot[0] == key_hash and self._live(m, slot, epoch, now):
+                    start = offset + SLOT.size
+                    payload = m[start:start + slot[6]]
+                    SLOT.pack_into(m, offset, *slot[:3], self._add(m, 'clock'), *slot[4:])
+                    break
+            self._add(m, 'hits' if payload is not None else 'misses')
+        if payload is None:
+            return False, None, token
+        stored_key, value = json.loads(payload)
+        if stored_key != key: # 64-bit hash collision
+            return False, None, token
+        return True, value, token
+
+    def store(self, kind, student_id, value, token):
+        key = f"{kind}:{student_id}"
+        payload = json.dumps([key, value], separators=(',', ':')).encode('utf-8')
+        key_hash = _key_hash(key)
+        gen_index = int(student_id) % GENERATIONS
+        now = time.time()
+        with self._locked() as m:
+            if len(payload) > self.entry_bytes:
+                self._add(m, 'too_large')
+                return False
+            epoch, generation = token
+            if epoch != self._counter(m, 'epoch') or generation != self._generation(m, gen_index):
+                return False # Invalidated while the value was being computed
+            target, oldest = None, None
+            for offset in self._set_slots(key_hash):
+                slot = SLOT.unpack_from(m, offset)
+                if slot[0] == key_hash or not self._live(m, slot, epoch, now):
+                    target = offset
+                    break
+                if oldest is None or slot[3] < oldest[1]:
+                    oldest = (offset, slot[3])
+            if target is None:
+                target = oldest[0]
+                self._add(m, 'evictions')
+            SLOT.pack_into(m, target, key_hash, epoch, generation, self._add(m, 'clock'), now,
+                           gen_index, len(payload))
+            start = target + SLOT.size
+            m[start:start + len(payload)] = payload
+            self._add(m, 'stores')
+        return True
+
+    def invalidate(self, student_ids):
+        """Drops every cached value of these students (call after their write commits)."""
+        indexes = {int(sid) % GENERATIONS for sid in student_ids if str(sid).isdigit()}
+        if not indexes:
+            return
+        with self._locked() as m:
+            for index in indexes:
+                offset = HEADER_BYTES + GENERATION.size * index
+                GENERATION.pack_into(m, offset, GENERATION.unpack_from(m, offset)[0] + 1)
+            self._add(m, 'invalidations', len(indexes))
+
+    def clear(self):
+        """Drops everything (writes that touch too many students to name them)."""
+        with self._locked() as m:
+            self._add(m, 'epoch')
+            self._add(m, 'invalidations')
+
+    def stats(self):
+        """Counters shared by all processes, plus live entries and their bytes."""
+        now = time.time()
+        with self._locked() as m:
+            stats = {name: self._counter(m, name) for name in COUNTERS}
+            entries = used = 0
+            for offset in range(self.slots_offset, self.size_bytes, self.slot_bytes):
+                slot = SLOT.unpack_from(m, offset)
+                if self._live(m, slot, stats['epoch'], now):
+                    entries += 1
+                    used += slot[6]
+        lookups = stats['hits'] + stats['misses']
+        stats.update(entries=entries, bytes=used, slots=self.sets * WAYS, size_bytes=self.size_bytes,
+                     entry_bytes=self.entry_bytes, ttl=self.ttl, path=self.path,
+                     hit_ratio=stats['hits'] / lookups if lookups else 0.0)
+        return stats
+
+class _FileLock:
+    __slots__ = ('cache', 'map')
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def __enter__(self):
+        self.cache._lock.acquire()
+        try:
+            self.map = self.cache._mapped()
+            if fcntl:
+                fcntl.flock(self.cache._file, fcntl.LOCK_EX)
+        except BaseException:
+            self.cache._lock.release()
+            raise
+        return self.map
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl:
+                fcntl.flock(self.cache._file, fcntl.LOCK_UN)
+        finally:
+            self.cache._lock.release()
@@ -0,0 +1,374 @@
+"""
+Synthetic institution data for benchmarks and load tests (`flask seed-synthetic`).
+
+Generates departments, staff, subjects for every (dept, year, batch), class
+logins, students and attendance over a run of school days, writes them as CSV
+files and bulk-loads them:
+
+    flask seed-synthetic --size small                   # ~150k attendance rows
+    flask seed-synthetic --size large --seed 7          # ~50M attendance rows
+    flask seed-synthetic --size medium --days 30 --no-load
+
+The same --seed and sizes produce the same files (ids continue from the
+current MAX(id) of each table, so load into the same starting database to get
+identical rows; only the password hash salt differs). Every account shares one
+password (hashed once) and accounts.csv lists them in the role,username,password
+format loadtest.py reads.
+
+Absence patterns: each student has their own absence rate (most around 6%, a
+tail of chronically absent ones), absences are mostly whole days that tend to
+run in streaks, Mondays and Fridays are worse, single skipped periods and
+On Duty days happen on top. Each class follows a fixed weekly timetable.
+
+Loading (MySQL): LOAD DATA LOCAL INFILE per file (the server needs
+local_infile=ON), else multi-row INSERTs in one transaction per file. Unique
+and foreign key checks are off for the session, rows arrive in primary-key
+order, and the attendance insert triggers are dropped for the load and restored
+afterwards, so seeded rows are not in the change feed. Dropping them affects
+every connection, so a load refuses to start unless attendance has been idle
+for IDLE_SECONDS, and on MySQL it holds the LOAD_LOCK_NAME advisory lock
+(`python migrate.py --repair-triggers` restores triggers a killed load left
+dropped). On SQLite the same multi-row INSERT path is used.
+"""
+import csv
+import os
+import random
+from datetime import date, datetime, timedelta
+
+import mysql.connector
+
+PRESETS = {
+    'small': dict(departments=2, batches=2, students=30, subjects=6, periods=5, days=60),
+    'medium': dict(departments=6, batches=2, students=60, subjects=6, periods=5, days=120),
+    'large': dict(departments=20, batches=4, students=60, subjects=8, periods=6, days=440),
+}
+YEARS = 4
+BATCH_NAMES = ['I Batch', 'II Batch', 'III Batch', 'IV Batch', 'V Batch', 'VI Batch']
+SUBJECTS_PER_STAFF = 4
+ATTENDANCE_FILE_ROWS = 1000000 # One LOAD DATA (one transaction) per file
+INSERT_BATCH_ROWS = 1000
+LOCAL_INFILE_ERRORS = (1148, 2068, 3948) # Disabled on the server or refused by the client
+LOAD_LOCK_NAME = 'attendance_bulk_load' # Also taken by migrate.py --repair-triggers
+IDLE_SECONDS = 300 # No attendance change this recent, or the load would drop triggers under live marks
+
+# Load order respects foreign keys even though checks are off
+TABLES = [
+    ('users', ('id', 'username', 'password_hash', 'role')),
+    ('departments', ('id', 'name', 'code')),
+    ('staff', ('id', 'user_id', 'name', 'department_id', 'email')),
+    ('subjects', ('id', 'code', 'name', 'department_id', 'year', 'batch', 'staff_id')),
+    ('class_logins', ('id', 'user_id', 'department_id', 'year', 'batch')),
+    ('students', ('id', 'user_id', 'register_no', 'name', 'department_id', 'current_year', 'batch')),
+    ('attendance', ('student_id', 'subject_id', 'date', 'status', 'marked_at')),
+]
+
+FIRST_NAMES = ['Aarav', 'Aditi', 'Akash', 'Ananya', 'Arjun', 'Bhavya', 'Deepak', 'Divya', 'Farhan', 'Gayathri',
+               'Harini', 'Ishaan', 'Janani', 'Karthik', 'Kavya', 'Lakshmi', 'Manoj', 'Meera', 'Naveen', 'Nisha',
+               'Pranav', 'Priya', 'Rahul', 'Ramya', 'Sanjay', 'Sneha', 'Surya', 'Swathi', 'Varun', 'Vidya']
+LAST_NAMES = ['Anand', 'Babu', 'Chandran', 'Das', 'Ganesan', 'Iyer', 'Kannan', 'Kumar', 'Mohan', 'Nair',
+              'Pillai', 'Raj', 'Raman', 'Reddy', 'Selvam', 'Shankar', 'Sharma', 'Srinivasan', 'Subramani', 'Vel']
+SUBJECT_NAMES = ['Mathematics', 'Physics', 'Chemistry', 'English', 'Programming', 'Data Structures',
+                 'Digital Logic', 'Statistics', 'Economics', 'Environmental Science', 'Algorithms',
+                 'Databases', 'Networks', 'Operating Systems', 'Signals', 'Thermodynamics']
+
+def school_days(end_date, count):
+    """The last `count` weekdays up to end_date, skipping May and the year-end break, oldest first."""
+    days = []
+    day = end_date
+    while len(days) < count:
+        if day.weekday() < 5 and day.month != 5 and not (day.month == 12 and day.day >= 24) \
+                and not (day.month == 1 and day.day == 1):
+            days.append(day)
+        day -= timedelta(days=1)
+    return days[::-1]
+
+def absence_rate(rng):
+    pick = rng.random()
+    if pick < 0.80:
+        return rng.betavariate(2, 28) # ~6%
+    if pick < 0.95:
+        return rng.betavariate(3, 17) # ~15%
+    return rng.betavariate(4, 8) # chronic, ~33%
+
+def person_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+class Generator:
+    def __init__(self, out_dir, seed, end_date, prefix, password_hash, start_ids, departments, batches,
+                 students, subjects, periods, days):
+        self.out_dir = out_dir
+        self.rng = random.Random(seed)
+        self.end_date = end_date
+        self.prefix = prefix
+        self.password_hash = password_hash
+        self.next_ids = {table: start_ids.get(table, 0) + 1 for table, _ in TABLES}
+        self.departments = departments
+        self.batches = min(batches, len(BATCH_NAMES))
+        self.students = students
+        self.subjects = min(subjects, len(SUBJECT_NAMES))
+        self.periods = min(periods, self.subjects)
+        self.days = days
+        self.counts = {table: 0 for table, _ in TABLES}
+        self.files = {table: [] for table, _ in TABLES}
+        self.writers = {}
+        self.accounts = []
+
+    def new_id(self, table):
+        value = self.next_ids[table]
+        self.next_ids[table] += 1
+        return value
+
+    def write(self, table, row):
+        if table not in self.writers:
+            path = os.path.join(self.out_dir, f"{table}.csv")
+            handle = open(path, 'w', newline='', encoding='utf-8')
+            writer = csv.writer(handle, lineterminator='\n')
+            writer.writerow(dict(TABLES)[table])
+            self.writers[table] = (handle, writer)
+            self.files[table].append(path)
+        self.writers[table][1].writerow(row)
+        self.counts[table] += 1
+
+    def user(self, username, role, password, account_role=None):
+        user_id = self.new_id('users')
+        self.write('users', (user_id, username, self.password_hash, role))
+        self.accounts.append((account_role or role, username, password))
+        return user_id
+
+    def generate(self, password):
+        """Writes every CSV file and accounts.csv (loadtest.py's format)."""
+        classes = []
+        for d in range(1, self.departments + 1):
+            dept_id = self.new_id('departments')
+            code = f"{self.prefix.upper()}{d:02d}"
+            self.write('departments', (dept_id, f"{self.prefix} department {d:02d}", code))
+
+            dept_classes = [(year, BATCH_NAMES[b]) for year in range(1, YEARS + 1) for b in range(self.batches)]
+            staff_ids = []
+            for _ in range(-(-len(dept_classes) * self.subjects // SUBJECTS_PER_STAFF)):
+                username = f"{self.prefix}-staff-{self.next_ids['staff']:05d}"
+                user_id = self.user(username, 'staff', password)
+                staff_id = self.new_id('staff')
+                self.write('staff', (staff_id, user_id, person_name(self.rng), dept_id, f"{username}@example.edu"))
+                staff_ids.append(staff_id)
+
+            for c, (year, batch) in enumerate(dept_classes):
+                subject_ids = []
+                for k in range(self.subjects):
+                    subject_id = self.new_id('subjects')
+                    teacher = staff_ids[(c * self.subjects + k) // SUBJECTS_PER_STAFF]
+                    self.write('subjects', (subject_id, f"{code}{year}{k + 1:02d}", SUBJECT_NAMES[k],
+                                            dept_id, year, batch, teacher))
+                    subject_ids.append(subject_id)
+
+                batch_no = BATCH_NAMES.index(batch) + 1
+                # Class logins are 'staff' users; accounts.csv marks them 'class' for loadtest.py
+                user_id = self.user(f"{self.prefix}-{code.lower()}-{year}-{batch_no}", 'staff', password, 'class')
+                self.write('class_logins', (self.new_id('class_logins'), user_id, dept_id, year, batch))
+
+                students = []
+                for i in range(1, self.students + 1):
+                    register_no = f"{code}{year}{batch_no}{i:03d}"
+                    user_id = self.user(register_no, 'student', password)
+                    student_id = self.new_id('students')
+                    self.write('students', (student_id, user_id, register_no, person_name(self.rng),
+                                            dept_id, year, batch))
+                    students.append((student_id, absence_rate(self.rng)))
+
+                # Fixed weekly timetable: which subjects meet on each weekday, in period order
+                timetable = [self.rng.sample(subject_ids, self.periods) for _ in range(5)]
+                classes.append((students, timetable))
+
+        for handle, _ in self.writers.values():
+            handle.close()
+        self.writers = {}
+
+        with open(os.path.join(self.out_dir, 'accounts.csv'), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(('role', 'username', 'password'))
+            writer.writerows(self.accounts)
+
+        self.generate_attendance(classes)
+
+    def generate_attendance(self, classes):
+        """Attendance in marking order (day, class, period), split into ATTENDANCE_FILE_ROWS files."""
+        rng = self.rng.random
+        header = ",".join(dict(TABLES)['attendance']) + "\n"
+        handle, written = None, 0
+        streaks = [[False] * len(students) for students, _ in classes]
+
+        for day in school_days(self.end_date, self.days):
+            day_text = day.isoformat()
+            weekday_factor = 1.3 if day.weekday() in (0, 4) else 1.0
+            for (students, timetable), absent_yesterday in zip(classes, streaks):
+                # Whole-day state per student: 'A' absent, 'O' on duty, None in class
+                day_state = []
+                for i, (_, rate) in enumerate(students):
+                    if (absent_yesterday[i] and rng() < 0.5) or rng() < rate * 0.7 * weekday_factor:
+                        day_state.append('Absent')
+                    elif rng() < 0.01:
+                        day_state.append('On Duty')
+                    else:
+                        day_state.append(None)
+                    absent_yesterday[i] = day_state[-1] == 'Absent'
+
+                lines = []
+                for period, subject_id in enumerate(timetable[day.weekday()]):
+                    marked_at = (datetime.combine(day, datetime.min.time())
+                                 + timedelta(hours=9 + period, seconds=int(rng() * 600))).isoformat(' ')
+                    for (student_id, rate), state in zip(students, day_state):
+                        status = state or ('Absent' if rng() < rate * 0.3 else 'Present')
+                        lines.append(f"{student_id},{subject_id},{day_text},{status},{marked_at}\n")
+
+                if handle is None or written >= ATTENDANCE_FILE_ROWS:
+                    if handle:
+                        handle.close()
+                    path = os.path.join(self.out_dir, f"attendance-{len(self.files['attendance']) + 1:04d}.csv")
+                    handle = open(path, 'w', encoding='utf-8')
+                    handle.write(header)
+                    self.files['attendance'].append(path)
+                    written = 0
+                handle.write("".join(lines))
+                written += len(lines)
+                self.counts['attendance'] += len(lines)
+        if handle:
+            handle.close()
+
+# --- Loading ---
+
+def start_ids(cursor):
+    ids = {}
+    for table, columns in TABLES:
+        if columns[0] == 'id':
+            cursor.execute(f"SELECT COALESCE(MAX(id), 0) as max_id FROM {table}")
+            ids[table] = int(cursor.fetchone()['max_id'])
+    return ids
+
+def insert_triggers(cursor, table, backend):
+    """(name, CREATE statement) of the AFTER/BEFORE INSERT triggers on table."""
+    if backend == 'sqlite':
+        cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", (table,))
+        return [(r['name'], r['sql']) for r in cursor.fetchall() if ' INSERT ON ' in r['sql'].upper()]
+    cursor.execute("""
+        SELECT trigger_name as name, action_timing as timing, action_statement as body
+        FROM information_schema.triggers
+        WHERE trigger_schema = DATABASE() AND event_object_table = %s AND event_manipulation = 'INSERT'
+    """, (table,))
+    return [(r['name'], f"CREATE TRIGGER {r['name']} {r['timing']} INSERT ON {table} FOR EACH ROW {r['body']}")
+            for r in cursor.fetchall()]
+
+def insert_file(db, cursor, table, columns, path):
+    statement = None
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)
+        db.start_transaction()
+        try:
+            batch = []
+            for row in reader:
+                batch.append(row)
+                if len(batch) == INSERT_BATCH_ROWS:
+                    if statement is None:
+                        statement = multi_row_insert(table, columns, INSERT_BATCH_ROWS)
+                    cursor.execute(statement, [value for r in batch for value in r])
+                    batch = []
+            if batch:
+                cursor.execute(multi_row_insert(table, columns, len(batch)), [value for r in batch for value in r])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+def multi_row_insert(table, columns, rows):
+    values = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ", ".join([values] * rows)
+
+def require_idle(cursor):
+    """Raises ValueError if attendance changed in the last IDLE_SECONDS (by the newest change feed row)."""
+    cursor.execute("SELECT changed_at FROM attendance_changes ORDER BY seq DESC LIMIT 1")
+    last = cursor.fetchone()
+    if last is None:
+        return
+    cursor.execute("SELECT CURRENT_TIMESTAMP as now")
+    now = cursor.fetchone()['now']
+    changed_at = last['changed_at']
+    # SQLite returns the text form
+    now = datetime.fromisoformat(now) if isinstance(now, str) else now
+    changed_at = datetime.fromisoformat(changed_at) if isinstance(changed_at, str) else changed_at
+    if now - changed_at < timedelta(seconds=IDLE_SECONDS):
+        raise ValueError(f"Attendance was written at {changed_at}. The load drops the attendance insert "
+                         f"triggers for every connection; run it when nothing has been marked for "
+                         f"{IDLE_SECONDS // 60} minutes.")
+
+def load(db, cursor, files, backend, progress=print):
+    """Bulk-loads the generated files table by table; returns 'LOAD DATA' or 'INSERT'."""
+    if backend == 'mysql':
+        cursor.execute("SELECT GET_LOCK(%s, 0) as got", (LOAD_LOCK_NAME,))
+        if not cursor.fetchone()['got']:
+            raise ValueError("Another bulk load or trigger repair is running; try again when it finishes.")
+    try:
+        require_idle(cursor)
+        return load_files(db, cursor, files, backend, progress)
+    finally:
+        if backend == 'mysql':
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOAD_LOCK_NAME,))
+            cursor.fetchall()
+
+def load_files(db, cursor, files, backend, progress):
+    use_infile = backend == 'mysql'
+    cursor.execute("SET SESSION unique_checks = 0")
+    cursor.execute("SET SESSION foreign_key_checks = 0")
+    triggers = insert_triggers(cursor, 'attendance', backend)
+    for name, _ in triggers:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    try:
+        for table, columns in TABLES:
+            for path in files[table]:
+                if use_infile:
+                    try:
+                        cursor.execute(f"""
+                            LOAD DATA LOCAL INFILE %s INTO TABLE {table}
+                            CHARACTER SET utf8mb4
+                            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+                            LINES TERMINATED BY '\\n' IGNORE 1 LINES
+                            ({', '.join(columns)})
+                        """, (os.path.abspath(path),))
+                        progress(f"{table}: {os.path.basename(path)}")
+                        continue
+                    except mysql.connector.Error as err:
+                        if err.errno not in LOCAL_INFILE_ERRORS:
+                            raise
+                        progress(f"LOAD DATA LOCAL INFILE unavailable ({err.msg}); using multi-row INSERTs.")
+                        use_infile = False
+                insert_file(db, cursor, table, columns, path)
+                progress(f"{table}: {os.path.basename(path)}")
+    finally:
+        for _, statement in triggers:
+            cursor.execute(statement)
+        cursor.execute("SET SESSION foreign_key_checks = 1")
+        cursor.execute("SET SESSION unique_checks = 1")
+    return 'LOAD DATA' if use_infile else 'INSERT'
+
+def seed(db, cursor, backend, out_dir, seed, size, password_hash, password, prefix='syn', end_date=None,
+         generate_only=False, progress=print, **overrides):
+    """Generates (and unless generate_only, loads) one synthetic institution. Returns the row counts."""
+    if len(prefix) > 6 or not prefix.isalnum():
+        raise ValueError("The prefix must be 1-6 letters or digits (it is part of department codes).")
+    cursor.execute("SELECT COUNT(*) as taken FROM departments WHERE code LIKE %s", (prefix.upper() + '__',))
+    if cursor.fetchone()['taken'] and not generate_only:
+        raise ValueError(f"Data with the prefix '{prefix}' is already loaded; pick another --prefix.")
+
+    if not generate_only:
+        require_idle(cursor) # Checked again under the lock; this one saves generating the files first
+
+    sizes = dict(PRESETS[size])
+    sizes.update({name: value for name, value in overrides.items() if value is not None})
+    os.makedirs(out_dir, exist_ok=True)
+    generator = Generator(out_dir, seed, end_date or date.today(), prefix, password_hash,
+                          start_ids(cursor), **sizes)
+    generator.generate(password)
+    progress(f"Generated {generator.counts['attendance']} attendance rows in {out_dir}.")
+    if generate_only:
+        return generator.counts, None
+    method = load(db, cursor, generator.files, backend, progress)
+    return generator.counts, method
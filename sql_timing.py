@@ -0,0 +1,98 @@
+"""
+Per-request SQL timing.
+
+instrument(db) makes that connection object's cursor() return TimedCursor
+wrappers. After begin() in the current request, every execute/executemany and
+fetch is timed into the request's totals (statement count, ms; fetch time
+counts towards the statement that produced the rows). begin(log=True) also
+keeps each statement as [sql, ms, rows] in g.sql_log, for request profiles.
+Outside a begun request the wrapper only passes calls through.
+
+Cursors created while instrumented can outlive the request (queries.py keeps
+prepared cursors on the connection); they look the request state up on each
+call, so they record into whichever request is using them.
+"""
+import time
+
+from flask import g, has_app_context
+
+def begin(log=False):
+    g.sql_stats = [0, 0.0]
+    g.sql_log = [] if log else None
+
+def totals():
+    """(statements, ms) of the current request so far."""
+    stats = g.get('sql_stats') if has_app_context() else None
+    return tuple(stats) if stats else (0, 0.0)
+
+def _stats():
+    return g.get('sql_stats') if has_app_context() else None
+
+class TimedCursor:
+    __slots__ = ('_cursor', '_entry')
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._entry = None
+
+    def _timed(self, sql, call, *args, **kwargs):
+        stats = _stats()
+        if stats is None:
+            return call(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            stats[1] += elapsed_ms
+            if sql is not None:
+                stats[0] += 1
+                log = g.sql_log
+                self._entry = [sql, elapsed_ms, 0] if log is not None else None
+                if self._entry:
+                    log.append(self._entry)
+            elif self._entry is not None:
+                self._entry[1] += elapsed_ms
+
+    def execute(self, operation, *args, **kwargs):
+        return self._timed(operation, self._cursor.execute, operation, *args, **kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        return self._timed(operation, self._cursor.executemany, operation, *args, **kwargs)
+
+    def _fetched(self, rows, count):
+        if self._entry is not None:
+            self._entry[2] += count
+        return rows
+
+    def fetchone(self):
+        row = self._timed(None, self._cursor.fetchone)
+        return self._fetched(row, 0 if row is None else 1)
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._timed(None, self._cursor.fetchmany, *args, **kwargs)
+        return self._fetched(rows, len(rows))
+
+    def fetchall(self):
+        rows = self._timed(None, self._cursor.fetchall)
+        return self._fetched(rows, len(rows))
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+def instrument(db):
+    """Wraps db.cursor() (this connection object only) so its cursors are timed."""
+    if not getattr(db, '_sql_timed', False):
+        create = db.cursor
+        db.cursor = lambda *args, **kwargs: TimedCursor(create(*args, **kwargs))
+        db._sql_timed = True
+    return db
@@ -0,0 +1,296 @@
+"""
+Embedded SQLite backend (DB_BACKEND=sqlite) for benchmarks, tests and small
+single-node deployments.
+
+connect() returns an object that behaves like the mysql.connector connections
+the app already uses: cursor(dictionary=True), %s placeholders, rowcount,
+lastrowid, start_transaction/commit/rollback, and mysql.connector.Error
+subclasses (IntegrityError 1062 for duplicates) so every existing
+`except mysql.connector.Error` handler keeps working.
+
+Statements are translated from MySQL on the fly (translate(), cached):
+    %s                              ?1, ?2, ...
+    ON DUPLICATE KEY UPDATE c = VALUES(c)   ON CONFLICT DO UPDATE SET c = excluded.c
+    DELETE a FROM t a JOIN ...      DELETE FROM t WHERE rowid IN (SELECT a.rowid FROM t a JOIN ...)
+    (SELECT ...) UNION (SELECT ...) SELECT * FROM (...) UNION SELECT * FROM (...)
+    GROUP BY ... WITH ROLLUP        UNION ALL of one GROUP BY per level, GROUPING() as constants
+    FOR UPDATE, FROM DUAL           dropped (start_transaction takes the write lock up front)
+    <=>, RAND(), @var, LIKE         IS, random(), session_var('var'), LIKE ... ESCAPE '\\'
+    SET @var = x                    kept on the connection, read by session_var()
+    SET SESSION ...                 ignored (TRANSACTION READ ONLY becomes PRAGMA query_only)
+    BEFORE ... SET NEW.c = x        AFTER ... UPDATE t SET c = x WHERE rowid = NEW.rowid (triggers)
+
+The schema is created from database.sql on the first connection to an empty
+file. information_schema, SHOW and GET_LOCK have no equivalent, so the
+MySQL-only tooling (migrate.py, replica routing, attendance-storage-report)
+does not apply here.
+"""
+import functools
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+
+import mysql.connector
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database.sql')
+
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(' '))
+sqlite3.register_converter('DATE', lambda b: date.fromisoformat(b.decode()))
+sqlite3.register_converter('TIMESTAMP', lambda b: datetime.fromisoformat(b.decode()))
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+# --- Statement translation ---
+
+def _split_top_level(text):
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [p.strip() for p in parts]
+
+def _top_level_from(sql):
+    depth = 0
+    for match in re.finditer(r"[()]|\bFROM\b", sql, re.I):
+        token = match.group(0)
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0:
+            return match.start()
+    raise ValueError("SELECT without FROM")
+
+def _expand_rollup(sql):
+    match = re.search(r"\bGROUP\s+BY\s+((?:(?!\bGROUP\s+BY\b).)*?)\s+WITH\s+ROLLUP\s*$", sql, re.S | re.I)
+    if not match:
+        return sql
+    keys = _split_top_level(match.group(1))
+    head = sql[:match.start()]
+    select = re.match(r"\s*SELECT\s", head, re.I)
+    from_pos = _top_level_from(head)
+    items = _split_top_level(head[select.end():from_pos])
+    body = head[from_pos:]
+
+    branches = []
+    for level in range(len(keys), -1, -1):
+        rolled = keys[level:]
+        columns = []
+        for item in items:
+            for key in keys:
+                item = re.sub(r"GROUPING\(\s*%s\s*\)" % re.escape(key),
+                              '1' if key in rolled else '0', item, flags=re.I)
+            parts = re.split(r"\s+as\s+", item, maxsplit=1, flags=re.I)
+            expr, alias = parts[0].strip(), (parts[1] if len(parts) > 1 else '')
+            if expr in rolled:
+                item = f"NULL as {alias or expr.split('.')[-1]}"
+            columns.append(item)
+        branch = "SELECT " + ", ".join(columns) + " " + body
+        if keys[:level]:
+            branch += " GROUP BY " + ", ".join(keys[:level])
+        else:
+            branch += " HAVING COUNT(*) > 0" # Like MySQL: no grand total row over no rows
+        branches.append(branch)
+    return "\nUNION ALL\n".join(branches)
+
+@functools.lru_cache(maxsize=512)
+def translate(sql):
+    counter = iter(range(1, 10000))
+    sql = re.sub(r"%s", lambda m: f"?{next(counter)}", sql).replace('%%', '%')
+
+    upsert = re.search(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", sql, re.I)
+    if upsert:
+        assignments = re.sub(r"\bVALUES\((\w+)\)", r"excluded.\1", sql[upsert.end():], flags=re.I)
+        sql = sql[:upsert.start()] + "ON CONFLICT DO UPDATE SET" + assignments
+
+    sql = re.sub(r"^\s*DELETE\s+(\w+)\s+FROM\s+(\w+)\s+\1\b(.*)$",
+                 r"DELETE FROM \2 WHERE rowid IN (SELECT \1.rowid FROM \2 \1\3)",
+                 sql, flags=re.S | re.I)
+    sql = re.sub(r"(^\s*|\bUNION(?:\s+ALL)?\s*)\(\s*SELECT\b", r"\1SELECT * FROM (SELECT", sql, flags=re.I)
+    sql = _expand_rollup(sql)
+
+    sql = re.sub(r"\s+FOR\s+UPDATE\b", "", sql, flags=re.I)
+    sql = re.sub(r"\s+FROM\s+DUAL\b", "", sql, flags=re.I)
+    sql = sql.replace("<=>", " IS ")
+    sql = re.sub(r"\bRAND\(\)", "random()", sql, flags=re.I)
+    sql = re.sub(r"@(\w+)", r"session_var('\1')", sql)
+    sql = re.sub(r"\bLIKE\s+(\?\d+)(?!\s+ESCAPE)", r"LIKE \1 ESCAPE '\\'", sql, flags=re.I)
+    return sql
+
+# --- Schema (database.sql) ---
+
+def translate_ddl(statement):
+    statement = statement.strip()
+    if re.match(r"(CREATE\s+DATABASE|USE)\b", statement, re.I):
+        return []
+
+    trigger = re.match(r"CREATE\s+TRIGGER\s+(\w+)\s+(.*?\bFOR\s+EACH\s+ROW)\s+(.*)$", statement, re.S | re.I)
+    if trigger:
+        timing, body = trigger.group(2), trigger.group(3)
+        assign = re.match(r"SET\s+NEW\.(\w+)\s*=\s*(.*)$", body, re.S | re.I)
+        if assign:
+            # NEW is read-only in SQLite: set the column on the row just written instead
+            table = re.search(r"\bON\s+(\w+)", timing, re.I).group(1)
+            timing = re.sub(r"^BEFORE\b", "AFTER", timing, flags=re.I)
+            body = f"UPDATE {table} SET {assign.group(1)} = {assign.group(2)} WHERE rowid = NEW.rowid"
+        return [f"CREATE TRIGGER IF NOT EXISTS {trigger.group(1)} {timing} "
+                f"BEGIN {translate(body)}; END"]
+
+    table = re.match(r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s*\((.*)\)\s*$", statement, re.S | re.I)
+    if not table:
+        return [statement]
+    name = table.group(1)
+    columns, indexes = [], []
+    for item in _split_top_level(table.group(2)):
+        key = re.match(r"(UNIQUE\s+)?(?:KEY|INDEX)\s+(\w+)\s*\((.*)\)$", item, re.S | re.I)
+        if key:
+            unique = "UNIQUE " if key.group(1) else ""
+            indexes.append(f"CREATE {unique}INDEX IF NOT EXISTS {key.group(2)} ON {name} ({key.group(3)})")
+            continue
+        item = re.sub(r"\b(?:BIG)?INT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b",
+                      "INTEGER PRIMARY KEY AUTOINCREMENT", item, flags=re.I)
+        item = re.sub(r"^(\w+)\s+ENUM\((.*?)\)", r"\1 TEXT CHECK (\1 IN (\2))", item, flags=re.I)
+        item = re.sub(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b", "", item, flags=re.I)
+        columns.append(item)
+    return [f"CREATE TABLE IF NOT EXISTS {name} (\n    " + ",\n    ".join(columns) + "\n)"] + indexes
+
+def create_schema(raw, schema_file=SCHEMA_FILE):
+    with open(schema_file, encoding='utf-8') as f:
+        script = re.sub(r"--[^\n]*", "", f.read())
+    for statement in script.split(';'):
+        if statement.strip():
+            for translated in translate_ddl(statement):
+                raw.execute(translated)
+
+# --- Connection / cursor ---
+
+def _mysql_error(err):
+    message = str(err)
+    if isinstance(err, sqlite3.IntegrityError):
+        if message.startswith('UNIQUE') or 'PRIMARY KEY' in message:
+            errno = 1062 # Duplicate entry
+        elif 'FOREIGN KEY' in message:
+            errno = 1452
+        else:
+            errno = 1048 # Column cannot be null / check failed
+        return mysql.connector.IntegrityError(msg=message, errno=errno)
+    if 'locked' in message or 'busy' in message:
+        return mysql.connector.OperationalError(msg=message, errno=1205) # Lock wait timeout
+    return mysql.connector.ProgrammingError(msg=message)
+
+class Cursor:
+    def __init__(self, connection, dictionary=False):
+        self.connection = connection
+        self.dictionary = dictionary
+        self.cursor = connection.raw.cursor()
+        self.rowcount = -1
+        self.lastrowid = None
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    def _row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        return dict(zip([c[0] for c in self.cursor.description], row))
+
+    def _session_statement(self, sql, params):
+        assign = re.match(r"\s*SET\s+@(\w+)\s*=\s*(.+?)\s*;?\s*$", sql, re.S | re.I)
+        if assign:
+            value = self.connection.raw.execute("SELECT " + translate(assign.group(2)), params or ()).fetchone()[0]
+            self.connection.session_vars[assign.group(1)] = value
+            return True
+        if re.match(r"\s*SET\s+SESSION\s+TRANSACTION\s+READ\s+ONLY", sql, re.I):
+            self.connection.raw.execute("PRAGMA query_only = ON")
+            return True
+        return bool(re.match(r"\s*SET\s+SESSION\b", sql, re.I))
+
+    def execute(self, sql, params=None):
+        if self._session_statement(sql, params):
+            self.rowcount = 0
+            return
+        try:
+            self.cursor.execute(translate(sql), tuple(params or ()))
+        except sqlite3.Error as err:
+            raise _mysql_error(err) from err
+        self.rowcount = self.cursor.rowcount
+        self.lastrowid = self.cursor.lastrowid
+
+    def executemany(self, sql, seq_params):
+        try:
+            self.cursor.executemany(translate(sql), [tuple(p) for p in seq_params])
+        except sqlite3.Error as err:
+            raise _mysql_error(err) from err
+        self.rowcount = self.cursor.rowcount
+
+    def fetchone(self):
+        return self._row(self.cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(r) for r in self.cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(r) for r in self.cursor.fetchall()]
+
+    def __iter__(self):
+        return (self._row(r) for r in self.cursor)
+
+    def close(self):
+        self.cursor.close()
+
+class Connection:
+    def __init__(self, raw):
+        self.raw = raw
+        self.session_vars = {}
+        raw.create_function('session_var', 1, self.session_vars.get, deterministic=False)
+
+    def cursor(self, dictionary=False, **kwargs):
+        return Cursor(self, dictionary)
+
+    def start_transaction(self):
+        # IMMEDIATE takes the write lock now, standing in for SELECT ... FOR UPDATE
+        self.raw.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        if self.raw.in_transaction:
+            self.raw.execute("COMMIT")
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.raw.execute("ROLLBACK")
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self.raw.close()
+
+def connect(path, timeout=5.0):
+    raw = sqlite3.connect(path, timeout=timeout, isolation_level=None, # autocommit, like the MySQL connections
+                          detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+    raw.execute("PRAGMA journal_mode = WAL")
+    raw.execute("PRAGMA synchronous = NORMAL")
+    raw.execute("PRAGMA foreign_keys = ON")
+
+    if path not in _schema_ready:
+        with _schema_lock:
+            exists = raw.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users'").fetchone()
+            if not exists:
+                create_schema(raw)
+            _schema_ready.add(path)
+    return Connection(raw)
@@ -0,0 +1,83 @@
+// Server-side typeahead for record pickers (backed by /api/search).
+//
+// <div class="typeahead">
+//     <input type="search" data-typeahead="student" placeholder="...">
+//     <input type="hidden" name="student_id" data-required="1">
+//     <ul class="typeahead-results"></ul>
+// </div>
+//
+// Optional data-department-id / data-year / data-batch on the search input scope the results.
+(function () {
+    var SEARCH_URL = '/api/search';
+    var DEBOUNCE_MS = 150;
+
+    function setup(input) {
+        var box = input.closest('.typeahead');
+        var hidden = box.querySelector('input[type="hidden"]');
+        var list = box.querySelector('.typeahead-results');
+        var timer = null;
+        var inflight = null;
+
+        function clearResults() {
+            list.innerHTML = '';
+            list.style.display = 'none';
+        }
+
+        function choose(item) {
+            hidden.value = item.id;
+            input.value = item.text;
+            clearResults();
+        }
+
+        function search() {
+            var params = new URLSearchParams({ type: input.dataset.typeahead, q: input.value.trim() });
+            ['departmentId', 'year', 'batch'].forEach(function (key) {
+                if (input.dataset[key]) params.set(key.replace('departmentId', 'department_id'), input.dataset[key]);
+            });
+
+            if (inflight) inflight.abort();
+            inflight = new AbortController();
+            fetch(SEARCH_URL + '?' + params.toString(), { signal: inflight.signal, credentials: 'same-origin' })
+                .then(function (resp) { return resp.json(); })
+                .then(function (data) {
+                    list.innerHTML = '';
+                    (data.results || []).forEach(function (item) {
+                        var li = document.createElement('li');
+                        li.textContent = item.text;
+                        li.addEventListener('mousedown', function (e) { e.preventDefault(); choose(item); });
+                        list.appendChild(li);
+                    });
+                    if (!list.children.length) {
+                        var empty = document.createElement('li');
+                        empty.className = 'typeahead-empty';
+                        empty.textContent = 'No matches';
+                        list.appendChild(empty);
+                    }
+                    list.style.display = 'block';
+                })
+                .catch(function (err) { if (err.name !== 'AbortError') clearResults(); });
+        }
+
+        input.addEventListener('input', function () {
+            hidden.value = ''; // typing invalidates the previous choice
+            clearTimeout(timer);
+            timer = setTimeout(search, DEBOUNCE_MS);
+        });
+        input.addEventListener('focus', function () { if (!hidden.value) search(); });
+        input.addEventListener('blur', clearResults);
+
+        var form = input.form;
+        if (form && hidden.dataset.required) {
+            form.addEventListener('submit', function (e) {
+                if (!hidden.value) {
+                    e.preventDefault();
+                    e.stopImmediatePropagation();
+                    input.focus();
+                    alert('Pick a record from the search results.');
+                }
+            }, true);
+        }
+    }
+
+    document.querySelectorAll('input[data-typeahead]').forEach(setup);
+})();
@@ -0,0 +1,107 @@
+"""
+Stored per-student percentages: students.total_periods, attended_periods and
+effective_percentage, kept current by triggers (migration 10, database.sql).
+
+    attendance AFTER INSERT/UPDATE/DELETE   add to / subtract from the student's counts
+    students BEFORE INSERT/UPDATE           effective_percentage = the override, else
+                                            ROUND(attended * 100 / total, 2), 0 without periods
+
+With STORED_PERCENTAGES=1 the read paths select these columns instead of
+counting attendance rows per request. Packed sessions keep their rows, so
+their counts come from the row triggers; rows archived by hand with
+@attendance_packing set are not subtracted.
+
+Anything that bypasses the triggers makes the columns drift: ON DELETE
+CASCADE, bulk loads with the triggers dropped (seed-synthetic), manual SQL.
+
+    flask check-percentages            # recount every student, list the drift
+    flask check-percentages --repair   # and correct it
+
+check() recounts one range of student ids at a time inside a transaction,
+so the stored and the recounted values come from the same snapshot. Repairs
+add the difference (UPDATE ... SET total_periods = total_periods + d) rather
+than overwrite, so marks committed while the check runs are not lost.
+"""
+from attendance_calc import effective_percentage
+from packed_attendance import ATTENDED_CODES, UNPACKED_ROWS_CONDITION, status_at
+
+CHECK_CHUNK = 1000 # Students per recount transaction
+
+STORED_AND_ROW_COUNTS = """
+    SELECT s.id, s.register_no, s.admin_override_percentage,
+           s.total_periods, s.attended_periods, s.effective_percentage,
+           COUNT(a.id) as row_total,
+           COALESCE(SUM(a.status IN ('Present', 'On Duty')), 0) as row_attended
+    FROM students s
+    LEFT JOIN attendance a ON a.student_id = s.id{unpacked}
+    WHERE s.id >= %s AND s.id < %s
+    GROUP BY s.id
+"""
+
+PACKED_PERIODS = """
+    SELECT m.student_id, m.position, se.statuses
+    FROM attendance_roster_members m
+    JOIN attendance_sessions se ON se.roster_id = m.roster_id
+    WHERE m.student_id >= %s AND m.student_id < %s
+"""
+
+def _recount(cursor, lo, hi, packed):
+    cursor.execute(STORED_AND_ROW_COUNTS.format(unpacked=" AND " + UNPACKED_ROWS_CONDITION if packed else ""),
+                   (lo, hi))
+    students = cursor.fetchall()
+    vectors = {}
+    if packed:
+        cursor.execute(PACKED_PERIODS, (lo, hi))
+        for r in cursor.fetchall():
+            code = status_at(r['statuses'], r['position'])
+            if code:
+                counts = vectors.setdefault(r['student_id'], [0, 0])
+                counts[0] += code in ATTENDED_CODES
+                counts[1] += 1
+    return students, vectors
+
+def check(db, cursor, repair=False, first_id=None, chunk=CHECK_CHUNK, progress=print):
+    """
+    Compares every student's stored columns with a recount. Returns the drifted
+    students as dicts (stored and actual counts and percentage); with repair=True
+    they are corrected as well.
+    """
+    cursor.execute("SELECT MIN(id) as lo, MAX(id) as hi FROM students")
+    bounds = cursor.fetchone()
+    if bounds['lo'] is None:
+        return []
+    cursor.execute("SELECT 1 as found FROM attendance_sessions LIMIT 1")
+    packed = cursor.fetchone() is not None
+
+    drift = []
+    start = max(bounds['lo'], first_id or bounds['lo'])
+    for lo in range(start, bounds['hi'] + 1, chunk):
+        db.start_transaction()
+        try:
+            students, vectors = _recount(cursor, lo, lo + chunk, packed)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        found = []
+        for s in students:
+            packed_attended, packed_total = vectors.get(s['id'], (0, 0))
+            attended = int(s['row_attended']) + packed_attended
+            total = int(s['row_total']) + packed_total
+            expected = round(effective_percentage(s['admin_override_percentage'], attended, total), 2)
+            stored = float(s['effective_percentage'])
+            if (attended, total) != (s['attended_periods'], s['total_periods']) or abs(stored - expected) > 0.0101:
+                found.append({'id': s['id'], 'register_no': s['register_no'],
+                              'stored': (s['attended_periods'], s['total_periods'], stored),
+                              'actual': (attended, total, expected)})
+        if repair and found:
+            # A zero difference still rewrites the row, and the BEFORE UPDATE trigger recomputes the percentage
+            cursor.executemany("""
+                UPDATE students
+                SET total_periods = total_periods + %s, attended_periods = attended_periods + %s
+                WHERE id = %s
+            """, [(d['actual'][1] - d['stored'][1], d['actual'][0] - d['stored'][0], d['id']) for d in found])
+        drift.extend(found)
+        progress(f"checked students {lo}-{min(lo + chunk, bounds['hi'] + 1) - 1}: {len(found)} drifted")
+    return drift
@@ -0,0 +1,154 @@
+"""
+Template rendering helpers: fragment cache, bytecode cache and render-time stats.
+
+    {% cache 'student_rows', versions.students, versions.departments %}
+        ... large loop ...
+    {% endcache %}
+
+A fragment is keyed by its template, its name and the data version stamps
+passed after it (see bump_data_version in app.py), so any write to the data it
+shows changes the key and the block is rendered again. Entries are kept per
+worker, least recently used first out, and never older than FRAGMENT_CACHE_TTL.
+
+Pass the rows as LazyRows so a cache hit skips the query as well as the loop.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import before_render_template, g, template_rendered
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+class FragmentCache:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.time() - entry[0] >= self.ttl:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.time(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses,
+                    'bytes': sum(len(value) for _, value in self.entries.values())}
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key_parts = [nodes.Const(parser.name), parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key_parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render_cached', [nodes.List(key_parts)]),
+                               [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, key_parts, caller):
+        cache = self.environment.fragment_cache
+        key = repr(key_parts)
+        rendered = cache.get(key)
+        if rendered is None:
+            rendered = caller()
+            cache.set(key, rendered)
+        return Markup(rendered)
+
+class LazyRows:
+    """Query rows fetched on first use (fetch(query, params)), so a cached fragment never runs its query."""
+    def __init__(self, fetch, query, params=()):
+        self.fetch = fetch
+        self.query = query
+        self.params = params
+        self.rows = None
+
+    def _load(self):
+        if self.rows is None:
+            self.rows = self.fetch(self.query, self.params)
+        return self.rows
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __bool__(self):
+        return bool(self._load())
+
+# --- Render-time stats (per worker) ---
+
+_render_stats = {}
+_render_stats_lock = threading.Lock()
+
+def _sql_ms():
+    stats = g.get('sql_stats') # Request SQL totals kept by sql_timing
+    return stats[1] if stats else 0.0
+
+def _render_started(sender, template, context, **extra):
+    g.setdefault('_render_started', []).append((time.perf_counter(), _sql_ms()))
+
+def _render_finished(sender, template, context, **extra):
+    started = g.get('_render_started')
+    if not started:
+        return
+    started_at, sql_ms_before = started.pop()
+    elapsed_ms = (time.perf_counter() - started_at) * 1000.0
+    # Per request, for Server-Timing: queries run from the template (LazyRows) count as db time
+    g.render_ms = g.get('render_ms', 0.0) + elapsed_ms - (_sql_ms() - sql_ms_before)
+    with _render_stats_lock:
+        stats = _render_stats.setdefault(template.name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        stats['count'] += 1
+        stats['total_ms'] += elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+
+def render_stats():
+    """[(template, count, avg_ms, max_ms, total_ms)], most total time first."""
+    with _render_stats_lock:
+        rows = [(name, s['count'], s['total_ms'] / s['count'], s['max_ms'], s['total_ms'])
+                for name, s in _render_stats.items()]
+    return sorted(rows, key=lambda r: r[4], reverse=True)
+
+def init_app(app):
+    env = app.jinja_env
+    env.add_extension(FragmentCacheExtension)
+    env.extend(fragment_cache=FragmentCache(app.config['FRAGMENT_CACHE_MAX_ENTRIES'],
+                                            app.config['FRAGMENT_CACHE_TTL']))
+
+    # Compiled templates are reused across restarts (filled by `flask compile-templates`).
+    # Entries carry a checksum of the source, so an edited template is recompiled.
+    bytecode_dir = app.config['TEMPLATE_BYTECODE_DIR']
+    if bytecode_dir:
+        os.makedirs(bytecode_dir, exist_ok=True)
+        env.bytecode_cache = FileSystemBytecodeCache(bytecode_dir)
+
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+
+def compile_templates(app):
+    """Compiles every template into the bytecode cache. Returns the template names."""
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
@@ -0,0 +1,151 @@
+"""
+Shared fixtures. The app reads its configuration from the environment when it
+is imported, so the scratch paths below are set first.
+
+`backend` runs a test once against a fresh SQLite file and once against a
+scratch MySQL database (TEST_MYSQLDATABASE, default attendance_test, on the
+server of MYSQLHOST / MYSQLPORT / MYSQLUSER / MYSQLPASSWORD). The MySQL run is
+skipped when no server answers.
+"""
+import os
+import re
+import sys
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix='attendance-tests-')
+os.environ['REQUEST_LOG'] = '0'
+os.environ['SERVER_TIMING'] = '0'
+os.environ['RESULT_CACHE'] = '1' # Opt-in in production; the route suite covers its invalidation
+os.environ['RESULT_CACHE_PATH'] = os.path.join(_scratch, 'result-cache')
+os.environ['JOB_RESULTS_DIR'] = os.path.join(_scratch, 'job-results')
+os.environ['PROFILE_DIR'] = os.path.join(_scratch, 'profiles')
+os.environ['TEMPLATE_BYTECODE_DIR'] = ''
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector
+import pytest
+from werkzeug.security import generate_password_hash
+
+import app as attendance_app
+import sqlite_backend
+import template_cache
+
+PASSWORD = 'test-password'
+MYSQL_TEST_DATABASE = os.getenv('TEST_MYSQLDATABASE', 'attendance_test')
+
+def load_mysql_schema(config, database):
+    try:
+        server = mysql.connector.connect(host=config['DB_HOST'], port=config['DB_PORT'], user=config['DB_USER'],
+                                         password=config['DB_PASSWORD'], connection_timeout=2, autocommit=True)
+    except mysql.connector.Error as err:
+        pytest.skip(f"no MySQL server: {err}")
+    cursor = server.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {database}")
+    cursor.execute(f"CREATE DATABASE {database}")
+    cursor.execute(f"USE {database}")
+    with open(sqlite_backend.SCHEMA_FILE, encoding='utf-8') as f:
+        script = re.sub(r"--[^\n]*", "", f.read())
+    for statement in script.split(';'):
+        if statement.strip() and not re.match(r"\s*(CREATE DATABASE|USE)\b", statement):
+            cursor.execute(statement)
+    server.close()
+
+def reset_caches():
+    # Every test starts from an empty database whose data versions start over
+    attendance_app._roster_cache.clear()
+    attendance_app._analytics_cache.update(rows=None, computed_at=0.0)
+    attendance_app.clear_student_results()
+    config = attendance_app.app.config
+    attendance_app.app.jinja_env.fragment_cache = template_cache.FragmentCache(
+        config['FRAGMENT_CACHE_MAX_ENTRIES'], config['FRAGMENT_CACHE_TTL'])
+
+@pytest.fixture(params=['sqlite', 'mysql'])
+def backend(request, tmp_path, monkeypatch):
+    config = attendance_app.app.config
+
+    def configure(key, env, value):
+        # The environment too: eligibility and jobs run in spawned processes that import the app again
+        monkeypatch.setitem(config, key, value)
+        monkeypatch.setenv(env, str(value))
+
+    monkeypatch.setitem(config, 'TESTING', True)
+    configure('DB_BACKEND', 'DB_BACKEND', request.param)
+    if request.param == 'sqlite':
+        configure('SQLITE_PATH', 'SQLITE_PATH', str(tmp_path / 'attendance.db'))
+    else:
+        load_mysql_schema(config, MYSQL_TEST_DATABASE)
+        configure('DB_NAME', 'MYSQLDATABASE', MYSQL_TEST_DATABASE)
+        configure('DB_POOL_SIZE', 'DB_POOL_SIZE', 0) # A pool would outlive the scratch database
+    reset_caches()
+    yield request.param
+    reset_caches()
+
+@pytest.fixture
+def db(backend):
+    connection = attendance_app.connect_db()
+    yield connection
+    connection.close()
+
+@pytest.fixture
+def cursor(db):
+    return db.cursor(dictionary=True)
+
+def add_user(cursor, username, role):
+    cursor.execute("INSERT INTO users (username, password_hash, role) VALUES (%s, %s, %s)",
+                   (username, generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000'), role))
+    return cursor.lastrowid
+
+def add_student(cursor, register_no, department_id, year=1, batch='I Batch'):
+    user_id = add_user(cursor, register_no, 'student')
+    cursor.execute("""
+        INSERT INTO students (user_id, register_no, name, department_id, current_year, batch)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, (user_id, register_no, f"Student {register_no}", department_id, year, batch))
+    return cursor.lastrowid
+
+def mark(cursor, student_id, subject_id, day, status):
+    cursor.execute("INSERT INTO attendance (student_id, subject_id, date, status) VALUES (%s, %s, %s, %s)",
+                   (student_id, subject_id, day, status))
+
+@pytest.fixture
+def institution(cursor):
+    """One department with a staff member, a class login, a subject, three students and a week of marks."""
+    ids = {'admin': add_user(cursor, 'admin', 'admin')}
+    cursor.execute("INSERT INTO departments (name, code) VALUES ('Computer Science', 'CSE')")
+    ids['department'] = cursor.lastrowid
+
+    ids['staff_user'] = add_user(cursor, 'staff', 'staff')
+    cursor.execute("INSERT INTO staff (user_id, name, department_id, email) VALUES (%s, 'Staff One', %s, %s)",
+                   (ids['staff_user'], ids['department'], 'staff@example.edu'))
+    ids['staff'] = cursor.lastrowid
+
+    ids['class_user'] = add_user(cursor, 'class', 'staff')
+    cursor.execute("INSERT INTO class_logins (user_id, department_id, year, batch) VALUES (%s, %s, 1, 'I Batch')",
+                   (ids['class_user'], ids['department']))
+    ids['class_login'] = cursor.lastrowid
+
+    cursor.execute("""
+        INSERT INTO subjects (code, name, department_id, year, batch, staff_id)
+        VALUES ('CS101', 'Programming', %s, 1, 'I Batch', %s)
+    """, (ids['department'], ids['staff']))
+    ids['subject'] = cursor.lastrowid
+
+    ids['students'] = [add_student(cursor, f"CSE00{n}", ids['department']) for n in range(1, 4)]
+    statuses = ['Present', 'Present', 'Absent', 'On Duty', 'Present']
+    for day in range(5):
+        for position, student_id in enumerate(ids['students']):
+            mark(cursor, student_id, ids['subject'], f"2026-03-0{day + 2}", statuses[(day + position) % 5])
+
+    cursor.execute("INSERT INTO terms (name, start_date, end_date) VALUES ('2026 Spring', '2026-01-01', '2026-05-31')")
+    ids['term'] = cursor.lastrowid
+    return ids
+
+@pytest.fixture
+def login():
+    """login(username) -> a test client with that account's session."""
+    def log_in(username):
+        client = attendance_app.app.test_client()
+        response = client.post('/login', data={'username': username, 'password': PASSWORD})
+        assert response.status_code == 302, f"login as {username} failed"
+        return client
+    return log_in
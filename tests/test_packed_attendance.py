@@ -0,0 +1,40 @@
+"""
+Packed sessions (packed_attendance.py) with ATTENDANCE_STORAGE=packed: the
+attendance rows are kept, so corrections must reach both the row and the vector.
+"""
+import app as attendance_app
+import packed_attendance
+from test_stored_percentages import recounted, stored
+
+CORRECTED_DATE = '2026-03-04' # CSE001 is Absent that day
+
+def test_correction_updates_the_row_and_the_vector(db, cursor, institution, login, monkeypatch):
+    student_id, other_id = institution['students'][:2]
+    subject_id = institution['subject']
+    sessions, _ = packed_attendance.pack_subject(db, cursor, subject_id, '2026-04-01')
+    assert sessions == 5
+    monkeypatch.setitem(attendance_app.app.config, 'ATTENDANCE_STORAGE', 'packed')
+    before = packed_attendance.session_statuses(cursor, subject_id, CORRECTED_DATE)
+    assert before[student_id] == 'Absent'
+    cursor.execute("SELECT MAX(seq) as seq FROM attendance_changes")
+    last_seq = cursor.fetchone()['seq']
+
+    response = login('admin').post('/admin/attendance/update', data={
+        'subject_id': subject_id, 'date': CORRECTED_DATE,
+        f"status_{student_id}": 'Present', f"status_{other_id}": before[other_id],
+    })
+    assert response.status_code == 302
+
+    cursor.execute("SELECT id, status FROM attendance WHERE student_id = %s AND subject_id = %s AND date = %s",
+                   (student_id, subject_id, CORRECTED_DATE))
+    row = cursor.fetchone()
+    assert row['status'] == 'Present'
+    after = packed_attendance.session_statuses(cursor, subject_id, CORRECTED_DATE)
+    assert after == {**before, student_id: 'Present'}
+
+    # One change, logged by the row's trigger under its real id, counted once
+    cursor.execute("SELECT attendance_id, student_id, status FROM attendance_changes WHERE seq > %s", (last_seq,))
+    assert cursor.fetchall() == [{'attendance_id': row['id'], 'student_id': student_id, 'status': 'Present'}]
+    attended, total = recounted(cursor, student_id)
+    assert stored(cursor, student_id)[:2] == (attended, total)
+    assert packed_attendance.student_counts(cursor, student_id) == (attended, total)
@@ -0,0 +1,96 @@
+import types
+
+import pytest
+
+import result_cache
+from result_cache import SharedCache
+
+ENTRY_BYTES = 256
+
+def one_set_size(entry_bytes=ENTRY_BYTES):
+    # Header and generation table, then exactly one set of WAYS slots
+    return (result_cache.HEADER_BYTES + result_cache.GENERATION.size * result_cache.GENERATIONS +
+            result_cache.WAYS * (result_cache.SLOT.size + entry_bytes))
+
+@pytest.fixture
+def cache(tmp_path):
+    return SharedCache(str(tmp_path / 'results'), size_bytes=one_set_size(), entry_bytes=ENTRY_BYTES, ttl=60)
+
+def fill(cache, kind, student_id, value):
+    found, _, token = cache.lookup(kind, student_id)
+    assert not found
+    return cache.store(kind, student_id, value, token)
+
+def test_store_then_hit(cache):
+    assert fill(cache, 'percentage', 7, 81.25)
+    assert cache.lookup('percentage', 7)[:2] == (True, 81.25)
+    assert cache.lookup('breakdown', 7)[0] is False # Same student, other kind
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['stores'], stats['entries']) == (1, 2, 1, 1)
+
+def test_hit_in_another_mapping_of_the_file(cache):
+    fill(cache, 'percentage', 7, 81.25)
+    other = SharedCache(cache.path, size_bytes=one_set_size(), entry_bytes=ENTRY_BYTES, ttl=60)
+    assert other.lookup('percentage', 7)[:2] == (True, 81.25)
+
+def test_invalidate_then_miss(cache):
+    fill(cache, 'percentage', 7, 81.25)
+    fill(cache, 'breakdown', 7, [{'code': 'CS101', 'percentage': 80.0}])
+    fill(cache, 'percentage', 8, 64.0)
+
+    cache.invalidate([7, 'not-an-id'])
+
+    assert cache.lookup('percentage', 7)[0] is False
+    assert cache.lookup('breakdown', 7)[0] is False
+    assert cache.lookup('percentage', 8)[:2] == (True, 64.0)
+    assert cache.stats()['invalidations'] == 1
+
+def test_store_with_stale_token_is_refused(cache):
+    found, _, token = cache.lookup('percentage', 7)
+    assert not found
+    cache.invalidate([7]) # A write lands while the value is being computed
+
+    assert cache.store('percentage', 7, 90.0, token) is False
+    assert cache.lookup('percentage', 7)[0] is False
+    assert cache.stats()['stores'] == 0
+
+def test_least_recently_used_slot_is_evicted_when_the_set_is_full(cache):
+    assert cache.sets == 1
+    for student_id in range(1, result_cache.WAYS + 1):
+        fill(cache, 'percentage', student_id, float(student_id))
+    cache.lookup('percentage', 1) # Now 2 is the least recently used
+
+    fill(cache, 'percentage', 100, 100.0)
+
+    assert cache.lookup('percentage', 2)[0] is False
+    for student_id in [1, 100] + list(range(3, result_cache.WAYS + 1)):
+        assert cache.lookup('percentage', student_id)[:2] == (True, float(student_id))
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['entries'] == stats['slots'] == result_cache.WAYS
+
+def test_too_large_values_are_counted_not_stored(cache):
+    assert fill(cache, 'breakdown', 7, 'x' * ENTRY_BYTES) is False
+
+    assert cache.lookup('breakdown', 7)[0] is False
+    stats = cache.stats()
+    assert (stats['too_large'], stats['stores'], stats['entries']) == (1, 0, 0)
+
+def test_clear_drops_everything_and_outdates_tokens(cache):
+    fill(cache, 'percentage', 7, 81.25)
+    _, _, token = cache.lookup('percentage', 8)
+
+    cache.clear()
+
+    assert cache.lookup('percentage', 7)[0] is False
+    assert cache.store('percentage', 8, 64.0, token) is False
+    assert fill(cache, 'percentage', 8, 64.0)
+    assert cache.stats()['entries'] == 1
+
+def test_entries_expire_after_ttl(cache, monkeypatch):
+    fill(cache, 'percentage', 7, 81.25)
+    later = result_cache.time.time() + cache.ttl
+    monkeypatch.setattr(result_cache, 'time', types.SimpleNamespace(time=lambda: later))
+
+    assert cache.lookup('percentage', 7)[0] is False
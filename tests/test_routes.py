@@ -0,0 +1,86 @@
+"""
+Every route, as every role, on both database backends: no server errors, no
+database error flashes, and a role only gets past the login page where it is
+allowed. GET requests use real ids; POST requests send an empty form to ids
+that do not exist, so they exercise validation without deleting the fixture.
+"""
+import re
+from urllib.parse import urlparse
+
+import pytest
+
+import app as attendance_app
+import background_jobs
+
+MISSING_ID = 999999
+ROLES = ('admin', 'staff', 'class', 'student')
+# Path prefix -> (roles the pages are for, roles role_required must send back to the login page).
+# Roles in neither set are not checked: admins pass role_required everywhere but the staff and
+# student pages log out an account without a profile, and class logins are staff accounts.
+ACCESS = [
+    ('/api/', {'admin'}, {'staff', 'class', 'student'}),
+    ('/admin', {'admin'}, {'staff', 'class', 'student'}),
+    ('/staff', {'staff'}, {'student'}),
+    ('/class', {'class'}, {'student'}),
+    ('/student', {'student'}, {'staff', 'class'}),
+]
+ERROR_FLASH = re.compile(r"Database Error|Error: ")
+
+def access(path):
+    for prefix, served, refused in ACCESS:
+        if path.startswith(prefix):
+            return served, refused
+    return set(ROLES), set() # splash, login, developer info, static files
+
+def url_arguments(ids, job_id, real):
+    existing = {
+        'dept_id': ids['department'], 'staff_id': ids['staff'], 'student_id': ids['students'][0],
+        'sub_id': ids['subject'], 'subject_id': ids['subject'], 'class_login_id': ids['class_login'],
+        'job_id': job_id, 'term_id': ids['term'], 'name': 'missing-profile', 'filename': 'css/style.css',
+    }
+    if real:
+        return existing
+    return {name: MISSING_ID if isinstance(value, int) else value for name, value in existing.items()}
+
+def requests_for(ids, job_id):
+    """(method, path) of every route: GET with real ids, POST with missing ones."""
+    with attendance_app.app.test_request_context():
+        for rule in attendance_app.app.url_map.iter_rules():
+            if rule.endpoint in ('login', 'logout'):
+                continue
+            for method, real in (('GET', True), ('POST', False)):
+                if method in rule.methods:
+                    arguments = url_arguments(ids, job_id, real)
+                    yield method, attendance_app.url_for(rule.endpoint, **{a: arguments[a] for a in rule.arguments})
+
+@pytest.mark.parametrize('role', ROLES)
+def test_every_route(backend, cursor, institution, login, role):
+    job_id = background_jobs.enqueue(cursor, 'compute_eligibility', {}, created_by=institution['admin'])
+    username = {'admin': 'admin', 'staff': 'staff', 'class': 'class', 'student': 'CSE001'}[role]
+
+    failures = []
+    for method, path in requests_for(institution, job_id):
+        # A fresh session each time: a refused page may have logged the account out
+        client = login(username)
+        response = client.open(path, method=method)
+        target = urlparse(response.location).path if response.status_code in (301, 302, 303) else None
+        refused = target in ('/login', '/logout') or response.status_code == 401
+        if target and not refused:
+            response = client.get(response.location) # Where the flash messages are shown
+        body = response.get_data(as_text=True) if response.mimetype == 'text/html' else ''
+        if response.status_code >= 500:
+            failures.append(f"{method} {path}: {response.status_code}")
+        elif ERROR_FLASH.search(body):
+            failures.append(f"{method} {path}: {ERROR_FLASH.search(body).group(0)} flashed")
+        elif role in access(path)[0] and refused:
+            failures.append(f"{method} {path}: refused to {role}")
+        elif role in access(path)[1] and not refused:
+            failures.append(f"{method} {path}: served to {role}")
+    assert not failures, "\n".join(failures)
+
+def test_logout_ends_the_session(backend, institution, login):
+    client = login('admin')
+    assert client.get('/admin').status_code == 200
+    client.get('/logout')
+    response = client.get('/admin')
+    assert response.status_code == 302 and response.location.endswith('/login')
@@ -0,0 +1,144 @@
+"""
+students.total_periods / attended_periods / effective_percentage as kept by the
+triggers (database.sql, migration 10), and check(repair=True) on both backends.
+"""
+import app as attendance_app
+import stored_percentages
+from conftest import add_student, mark
+
+def stored(cursor, student_id):
+    cursor.execute("SELECT attended_periods, total_periods, effective_percentage FROM students WHERE id = %s",
+                   (student_id,))
+    row = cursor.fetchone()
+    return int(row['attended_periods']), int(row['total_periods']), float(row['effective_percentage'])
+
+def recounted(cursor, student_id):
+    cursor.execute("""
+        SELECT COALESCE(SUM(status IN ('Present', 'On Duty')), 0) as attended, COUNT(*) as total
+        FROM attendance WHERE student_id = %s
+    """, (student_id,))
+    row = cursor.fetchone()
+    return int(row['attended']), int(row['total'])
+
+def test_new_student_starts_at_zero(cursor, institution):
+    student_id = add_student(cursor, 'CSE009', institution['department'])
+    assert stored(cursor, student_id) == (0, 0, 0.0)
+
+def test_insert_update_and_delete_adjust_the_counts(cursor, institution):
+    student_id = add_student(cursor, 'CSE009', institution['department'])
+    subject_id = institution['subject']
+
+    mark(cursor, student_id, subject_id, '2026-04-01', 'Present')
+    mark(cursor, student_id, subject_id, '2026-04-02', 'Absent')
+    mark(cursor, student_id, subject_id, '2026-04-03', 'Absent')
+    assert stored(cursor, student_id) == (1, 3, 33.33)
+
+    cursor.execute("UPDATE attendance SET status = 'On Duty' WHERE student_id = %s AND date = '2026-04-02'",
+                   (student_id,))
+    assert stored(cursor, student_id) == (2, 3, 66.67)
+
+    # Rewriting the same status is not a change
+    cursor.execute("UPDATE attendance SET status = 'On Duty' WHERE student_id = %s AND date = '2026-04-02'",
+                   (student_id,))
+    assert stored(cursor, student_id) == (2, 3, 66.67)
+
+    cursor.execute("DELETE FROM attendance WHERE student_id = %s AND date = '2026-04-01'", (student_id,))
+    assert stored(cursor, student_id) == (1, 2, 50.0)
+
+def test_override_recomputes_the_effective_percentage(cursor, institution):
+    student_id = institution['students'][0]
+    attended, total, _ = stored(cursor, student_id)
+
+    cursor.execute("UPDATE students SET admin_override_percentage = 42.5 WHERE id = %s", (student_id,))
+    assert stored(cursor, student_id) == (attended, total, 42.5)
+
+    # Marks keep counting underneath the override
+    mark(cursor, student_id, institution['subject'], '2026-04-01', 'Absent')
+    assert stored(cursor, student_id) == (attended, total + 1, 42.5)
+
+    cursor.execute("UPDATE students SET admin_override_percentage = NULL WHERE id = %s", (student_id,))
+    assert stored(cursor, student_id) == (attended, total + 1, round(attended * 100.0 / (total + 1), 2))
+
+def test_archiving_rows_with_attendance_packing_keeps_the_counts(cursor, institution):
+    student_id = institution['students'][0]
+    before = stored(cursor, student_id)
+    cursor.execute("SELECT MAX(seq) as seq FROM attendance_changes")
+    last_seq = cursor.fetchone()['seq']
+
+    cursor.execute("SET @attendance_packing = 1")
+    cursor.execute("DELETE FROM attendance WHERE student_id = %s", (student_id,))
+    cursor.execute("SET @attendance_packing = NULL")
+
+    assert recounted(cursor, student_id) == (0, 0)
+    assert stored(cursor, student_id) == before
+    cursor.execute("SELECT COUNT(*) as changes FROM attendance_changes WHERE seq > %s", (last_seq,))
+    assert cursor.fetchone()['changes'] == 0
+
+    # Without the variable a delete counts again
+    mark(cursor, student_id, institution['subject'], '2026-04-01', 'Present')
+    cursor.execute("DELETE FROM attendance WHERE student_id = %s", (student_id,))
+    assert stored(cursor, student_id) == before
+
+def test_check_reports_no_drift_when_the_triggers_kept_up(db, cursor, institution):
+    assert stored_percentages.check(db, cursor, progress=lambda line: None) == []
+
+def test_repair_fixes_drift_and_keeps_a_concurrent_mark(db, cursor, institution, monkeypatch):
+    drifted, concurrent = institution['students'][:2]
+    # Drift the way a bulk load without triggers would
+    cursor.execute("UPDATE students SET total_periods = total_periods + 4, attended_periods = 0 WHERE id = %s",
+                   (drifted,))
+
+    other = attendance_app.connect_db()
+    commit = db.commit
+    pending_marks = [concurrent, drifted]
+
+    def commit_then_mark():
+        commit()
+        # Marks committed after the recount, before the repair: their +1 must survive
+        while pending_marks:
+            mark(other.cursor(dictionary=True), pending_marks.pop(), institution['subject'], '2026-04-01', 'Present')
+
+    monkeypatch.setattr(db, 'commit', commit_then_mark)
+    drift = stored_percentages.check(db, cursor, repair=True, progress=lambda line: None)
+    other.close()
+
+    assert [d['id'] for d in drift] == [drifted]
+    for student_id in (drifted, concurrent):
+        attended, total = recounted(cursor, student_id)
+        assert stored(cursor, student_id) == (attended, total, round(attended * 100.0 / total, 2))
+    assert stored_percentages.check(db, cursor, progress=lambda line: None) == []
+
+def test_stored_and_computed_analytics_agree(backend, institution, monkeypatch):
+    # A whole percentage (a DECIMAL the SQLite backend returns as an integer) and a student without marks
+    with attendance_app.app.test_request_context():
+        db, cursor = attendance_app.get_db()
+        cursor.execute("UPDATE students SET admin_override_percentage = 85 WHERE id = %s",
+                       (institution['students'][0],))
+        add_student(cursor, 'CSE009', institution['department'])
+
+        monkeypatch.setitem(attendance_app.app.config, 'STORED_PERCENTAGES', False)
+        computed, _ = attendance_app.fetch_analytics_rollup(refresh=True)
+        monkeypatch.setitem(attendance_app.app.config, 'STORED_PERCENTAGES', True)
+        from_columns, _ = attendance_app.fetch_analytics_rollup(refresh=True)
+
+    assert from_columns == computed
+    assert [row['student_count'] for row in computed if row['level'] == 'total'] == [4]
+
+def test_override_page_without_the_stored_columns(backend, cursor, institution, login, monkeypatch):
+    # A database from before migration 10, with STORED_PERCENTAGES off
+    for trigger in ('attendance_counts_after_insert', 'attendance_counts_after_update',
+                    'attendance_counts_after_delete', 'students_percentage_before_insert',
+                    'students_percentage_before_update'):
+        cursor.execute(f"DROP TRIGGER {trigger}")
+    for column in ('total_periods', 'attended_periods', 'effective_percentage'):
+        cursor.execute(f"ALTER TABLE students DROP COLUMN {column}")
+    monkeypatch.setitem(attendance_app.app.config, 'STORED_PERCENTAGES', False)
+    student_id = institution['students'][0]
+    attended, total = recounted(cursor, student_id)
+
+    client = login('admin')
+    for query in ({'student_id': student_id}, {'department_id': institution['department'], 'year': 1}):
+        response = client.get('/admin/student-percentage', query_string=query)
+        body = response.get_data(as_text=True)
+        assert response.status_code == 200 and 'Error' not in body
+        assert 'CSE001' in body and str(round(attended * 100.0 / total, 1)) in body
@@ -0,0 +1,203 @@
+"""
+Write-behind queue for attendance submissions (WRITE_QUEUE=1).
+
+At 9 AM hundreds of mark submissions arrive at once and each one is its own
+transaction: its own redo log flush and its own round of index locking. With
+the queue, a submission is validated in the request as before, then appended
+to a local SQLite file (WAL, synchronous=FULL, so an acknowledged enqueue
+survives a crash) and the request waits for its outcome. One writer process,
+`flask attendance-writer`, takes everything queued so far (up to
+WRITE_QUEUE_BATCH submissions) and writes it as ONE transaction, with a
+savepoint per submission so a rejected one does not take the others down. The
+submitter is answered only after that transaction commits.
+
+    WRITE_QUEUE=1 gunicorn ...            # web workers enqueue and wait
+    WRITE_QUEUE=1 flask attendance-writer # the single writer, one per node
+
+If the writer does not answer within WRITE_QUEUE_ACK_TIMEOUT seconds the page
+says the submission is queued; it stays in the file and is written when the
+writer runs. Submissions a crashed writer left mid-transaction are settled on
+its next start: committed if their sessions exist, otherwise queued again.
+
+`python bench_write_queue.py` compares direct and queued peak throughput.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import mysql.connector
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    subject_id INTEGER NOT NULL,
+    dates TEXT NOT NULL,          -- JSON list of YYYY-MM-DD
+    rows TEXT NOT NULL,           -- JSON list of [student_id, date, status]
+    submitted_by INTEGER,
+    state TEXT NOT NULL DEFAULT 'pending', -- pending, writing, committed, failed
+    error TEXT,
+    enqueued_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_state ON submissions (state, id);
+CREATE INDEX IF NOT EXISTS idx_submissions_subject ON submissions (subject_id, state);
+"""
+
+POLL_INTERVAL = 0.01 # Seconds between outcome checks of a waiting request
+
+INSERT_ATTENDANCE = """
+    INSERT INTO attendance (student_id, subject_id, date, status)
+    VALUES (%s, %s, %s, %s)
+"""
+
+class SubmissionRejected(Exception):
+    pass
+
+class WriteQueue:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        # One connection per thread and process (gunicorn forks after the app is imported)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = FULL")
+            conn.executescript(SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    # --- Request side ---
+
+    def queued_dates(self, subject_id, dates):
+        """Dates of this subject already waiting in the queue (not yet written)."""
+        rows = self._conn().execute(
+            "SELECT dates FROM submissions WHERE subject_id = ? AND state IN ('pending', 'writing')",
+            (subject_id,)).fetchall()
+        waiting = {d for (encoded,) in rows for d in json.loads(encoded)}
+        return sorted(waiting.intersection(dates))
+
+    def enqueue(self, subject_id, dates, rows, submitted_by=None):
+        cur = self._conn().execute(
+            "INSERT INTO submissions (subject_id, dates, rows, submitted_by, enqueued_at) VALUES (?, ?, ?, ?, ?)",
+            (subject_id, json.dumps(list(dates)), json.dumps([list(r) for r in rows]), submitted_by, time.time()))
+        return cur.lastrowid
+
+    def wait(self, submission_id, timeout):
+        """('committed' | 'failed' | 'queued', error) once the writer is done or timeout passes."""
+        deadline = time.monotonic() + timeout
+        conn = self._conn()
+        while True:
+            state, error = conn.execute("SELECT state, error FROM submissions WHERE id = ?",
+                                        (submission_id,)).fetchone()
+            if state in ('committed', 'failed'):
+                return state, error
+            if time.monotonic() >= deadline:
+                return 'queued', None
+            time.sleep(POLL_INTERVAL)
+
+    # --- Writer side ---
+
+    def claim(self, limit):
+        """Marks up to `limit` of the oldest pending submissions as being written and returns them."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("SELECT id, subject_id, dates, rows FROM submissions WHERE state = 'pending' "
+                                "ORDER BY id LIMIT ?", (limit,)).fetchall()
+            conn.executemany("UPDATE submissions SET state = 'writing' WHERE id = ?", [(r[0],) for r in rows])
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return [{'id': r[0], 'subject_id': r[1], 'dates': json.loads(r[2]), 'rows': json.loads(r[3])}
+                for r in rows]
+
+    def writing(self):
+        """Submissions a previous writer claimed but never settled (it stopped mid-batch)."""
+        rows = self._conn().execute("SELECT id, subject_id, dates, rows FROM submissions WHERE state = 'writing' "
+                                    "ORDER BY id").fetchall()
+        return [{'id': r[0], 'subject_id': r[1], 'dates': json.loads(r[2]), 'rows': json.loads(r[3])}
+                for r in rows]
+
+    def finish(self, results):
+        """Records [(id, 'committed' | 'failed' | 'pending', error)]; 'pending' puts it back in the queue."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("UPDATE submissions SET state = ?, error = ?, finished_at = ? WHERE id = ?",
+                         [(state, error, time.time() if state != 'pending' else None, sid)
+                          for sid, state, error in results])
+        conn.execute("COMMIT")
+
+    def purge(self, older_than):
+        """Removes settled submissions finished more than older_than seconds ago."""
+        cur = self._conn().execute("DELETE FROM submissions WHERE state IN ('committed', 'failed') "
+                                   "AND finished_at < ?", (time.time() - older_than,))
+        return cur.rowcount
+
+    def counts(self):
+        return dict(self._conn().execute("SELECT state, COUNT(*) FROM submissions GROUP BY state").fetchall())
+
+def _insert_rows(submission):
+    # Student id order, like app.insert_attendance: the percentage triggers lock students rows
+    return sorted((sid, submission['subject_id'], date, status) for sid, date, status in submission['rows'])
+
+def _write_group(db, cursor, submissions, marked_dates):
+    results = []
+    db.start_transaction()
+    try:
+        for sub in submissions:
+            cursor.execute("SAVEPOINT submission")
+            already = marked_dates(cursor, sub['subject_id'], sub['dates'])
+            if already:
+                results.append((sub['id'], 'failed', f"Attendance already marked for this subject on "
+                                                     f"{', '.join(already)}. Modification not allowed."))
+                continue
+            try:
+                cursor.executemany(INSERT_ATTENDANCE, _insert_rows(sub))
+            except mysql.connector.IntegrityError as err:
+                cursor.execute("ROLLBACK TO SAVEPOINT submission")
+                results.append((sub['id'], 'failed', f"Error marking attendance: {err}"))
+                continue
+            results.append((sub['id'], 'committed', None))
+        db.commit()
+    except mysql.connector.Error:
+        db.rollback()
+        raise
+    return results
+
+def write_batch(db, cursor, submissions, marked_dates):
+    """
+    Writes the submissions in one transaction (a savepoint each) and returns
+    [(id, state, error)]. A rejected submission (already marked, integrity error)
+    only rolls back its own savepoint. If the transaction as a whole fails
+    (deadlock, lock wait timeout) the batch is split and retried, so one bad
+    submission ends up failed on its own. Connection errors propagate: the
+    caller puts the batch back in the queue.
+    """
+    try:
+        return _write_group(db, cursor, submissions, marked_dates)
+    except mysql.connector.Error as err:
+        if not db.is_connected():
+            raise
+        if len(submissions) == 1:
+            return [(submissions[0]['id'], 'failed', f"Error marking attendance: {err}")]
+    middle = len(submissions) // 2
+    return (write_batch(db, cursor, submissions[:middle], marked_dates)
+            + write_batch(db, cursor, submissions[middle:], marked_dates))
+
+def settle_interrupted(db, cursor, queue, marked_dates):
+    """Settles submissions a stopped writer left in 'writing'. Returns how many were committed."""
+    results = []
+    for sub in queue.writing():
+        # The transaction either committed as a whole or not at all: its sessions tell which
+        marked = marked_dates(cursor, sub['subject_id'], sub['dates'])
+        state = 'committed' if len(marked) == len(sub['dates']) else 'pending'
+        results.append((sub['id'], state, None))
+    if results:
+        queue.finish(results)
+    return sum(1 for _, state, _ in results if state == 'committed')